@@ -4,6 +4,7 @@ pragma solidity ^0.8.20;
 import "@openzeppelin/contracts/access/Ownable.sol"; // Для управления владельцем
 import "@openzeppelin/contracts/utils/cryptography/EIP712.sol"; // Для EIP-712 подписей (более безопасный способ)
 import "@openzeppelin/contracts/utils/cryptography/ECDSA.sol"; // Для проверки подписи
+import "@openzeppelin/contracts/utils/cryptography/MerkleProof.sol"; // Для пакетов цен (подписан только корень)
 import "./KYCWhitelist.sol"; // Импортируем интерфейс или контракт KYC
 
 /**
@@ -25,6 +26,8 @@ contract SimpleOracle is Ownable, EIP712 {
     // --- EIP-712 ---
     // Типы данных, которые мы будем подписывать
     // bytes32 constant PRICE_VALIDATION_TYPEHASH = keccak256("PriceValidation(bytes32 assetId,uint256 timestamp,uint256 price)");
+    // Пакет цен одного тика: подписывается только корень дерева Меркла по всем парам
+    bytes32 private constant PRICE_BUNDLE_TYPEHASH = keccak256("PriceBundle(bytes32 root)");
 
     // --- События ---
     event PriceValidationRequested(bytes32 indexed assetId, uint256 timestamp, address indexed requester);
@@ -38,6 +41,8 @@ contract SimpleOracle is Ownable, EIP712 {
     error AddressNotWhitelisted(address account);
     error InvalidSignerAddress();
     error NoValidatedPriceFound(bytes32 assetId, uint256 timestamp);
+    error InvalidMerkleProof();
+    error ArrayLengthMismatch();
 
     /**
      * @dev Конструктор
@@ -119,6 +124,82 @@ contract SimpleOracle is Ownable, EIP712 {
         uint256 price,
         bytes calldata signature
     ) public {
+        _fulfillPriceValidation(assetId, timestamp, price, signature);
+    }
+
+    /**
+     * @dev Предоставляет сразу несколько валидированных цен одной транзакцией.
+     * Каждый элемент проверяется так же, как в fulfillPriceValidation;
+     * невалидная подпись любого элемента откатывает весь пакет.
+     * @param assetIds Идентификаторы активов.
+     * @param timestamps Таймстемпы цен.
+     * @param prices Цены.
+     * @param signatures Подписи EIP-712 от _oracleSigner.
+     */
+    function fulfillPriceValidationBatch(
+        bytes32[] calldata assetIds,
+        uint256[] calldata timestamps,
+        uint256[] calldata prices,
+        bytes[] calldata signatures
+    ) public {
+        uint256 count = assetIds.length;
+        if (timestamps.length != count || prices.length != count || signatures.length != count) {
+            revert ArrayLengthMismatch();
+        }
+        for (uint256 i = 0; i < count; ++i) {
+            _fulfillPriceValidation(assetIds[i], timestamps[i], prices[i], signatures[i]);
+        }
+    }
+
+    /**
+     * @dev Предоставляет цену из подписанного пакета цен.
+     * Оракул подписывает (EIP-712 PriceBundle) только корень дерева Меркла по всем парам тика,
+     * для конкретной пары передаётся доказательство включения.
+     * Лист: keccak256(bytes.concat(keccak256(abi.encode(assetId, timestamp, price)))).
+     * @param assetId Идентификатор актива.
+     * @param timestamp Таймстемп цены.
+     * @param price Цена.
+     * @param root Корень дерева Меркла пакета.
+     * @param proof Доказательство включения листа в root.
+     * @param signature Подпись EIP-712 PriceBundle(root) от _oracleSigner.
+     */
+    function fulfillPriceValidationWithProof(
+        bytes32 assetId,
+        uint256 timestamp,
+        uint256 price,
+        bytes32 root,
+        bytes32[] calldata proof,
+        bytes calldata signature
+    ) public {
+        // 1. Проверить подпись корня пакета
+        bytes32 digest = _hashTypedDataV4(keccak256(abi.encode(PRICE_BUNDLE_TYPEHASH, root)));
+        address signer = ECDSA.recover(digest, signature);
+        if (signer != _oracleSigner) {
+            revert InvalidSignature();
+        }
+
+        // 2. Проверить, что (assetId, timestamp, price) входит в пакет
+        bytes32 leaf = keccak256(bytes.concat(keccak256(abi.encode(assetId, timestamp, price))));
+        if (!MerkleProof.verifyCalldata(proof, root, leaf)) {
+            revert InvalidMerkleProof();
+        }
+
+        // 3. Сохранить валидированную цену
+        _validatedPrices[assetId][timestamp] = price;
+        emit PriceValidationFulfilled(assetId, timestamp, price, signer);
+    }
+
+    // --- Внутренние Функции ---
+
+    /**
+     * @dev Проверяет подпись оракула и сохраняет цену.
+     */
+    function _fulfillPriceValidation(
+        bytes32 assetId,
+        uint256 timestamp,
+        uint256 price,
+        bytes calldata signature
+    ) internal {
         // 1. Построить хэш сообщения EIP-712
         bytes32 structHash = keccak256(abi.encode(
             keccak256("PriceValidation(bytes32 assetId,uint256 timestamp,uint256 price)"), // TYPEHASH
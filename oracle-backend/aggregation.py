@@ -0,0 +1,119 @@
+# --- START OF FILE aggregation.py ---
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Агрегация цен с нескольких площадок. Котировки тика складываются в матрицу
+# источники × пары (NaN — у источника нет цены), и медиана / усечённое среднее / VWAP
+# считаются для всех пар одним проходом NumPy, без циклов Python по парам.
+
+METHODS = ("median", "trimmed_mean", "vwap")
+
+
+class AggregationResult(NamedTuple):
+    prices: np.ndarray    # (P,) итоговая цена; NaN — пара не набрала min_sources
+    sources: np.ndarray   # (P,) сколько источников вошло в цену
+    rejected: np.ndarray  # (S, P) котировка отброшена как выброс
+
+
+def _sorted_columns(prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Сортирует каждый столбец (NaN уходят в конец) и считает непустые значения."""
+    return np.sort(prices, axis=0), np.count_nonzero(~np.isnan(prices), axis=0)
+
+
+def _median(sorted_prices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    cols = np.arange(sorted_prices.shape[1])
+    lo = np.maximum(counts - 1, 0) // 2
+    hi = counts // 2
+    median = (sorted_prices[lo, cols] + sorted_prices[hi, cols]) / 2
+    return np.where(counts > 0, median, np.nan)
+
+
+def _trimmed_mean(sorted_prices: np.ndarray, counts: np.ndarray, trim: float) -> np.ndarray:
+    """Среднее без floor(n * trim) крайних значений с каждой стороны."""
+    k = np.floor(counts * trim).astype(np.int64)
+    ranks = np.arange(sorted_prices.shape[0])[:, None]
+    keep = (ranks >= k) & (ranks < counts - k)
+    n = np.count_nonzero(keep, axis=0)
+    total = np.where(keep, sorted_prices, 0.0).sum(axis=0)
+    return np.where(n > 0, total / np.maximum(n, 1), np.nan)
+
+
+def aggregate(
+    prices: np.ndarray,
+    volumes: Optional[np.ndarray],
+    method: str = "median",
+    max_deviation: float = 0.02,
+    min_sources: int = 1,
+    trim: float = 0.2,
+) -> AggregationResult:
+    """
+    prices и volumes — матрицы (источники × пары). Котировки, отклоняющиеся от медианы
+    пары больше чем на max_deviation (доля), отбрасываются; по оставшимся считается method.
+    Две расходящиеся котировки отбрасываются обе: какая из них верная, неизвестно.
+    VWAP взвешивает по объёму; у пар без объёма — медиана.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    valid = ~np.isnan(prices) & (prices > 0)
+    prices = np.where(valid, prices, np.nan)
+
+    sorted_prices, counts = _sorted_columns(prices)
+    median = _median(sorted_prices, counts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviation = np.abs(prices - median) / median
+    rejected = valid & (deviation > max_deviation)
+    if rejected.any():
+        kept = np.where(rejected, np.nan, prices)
+        sorted_kept, counts = _sorted_columns(kept)
+    else:  # обычный тик без выбросов: вторая сортировка не нужна
+        kept, sorted_kept = prices, sorted_prices
+
+    if method == "median":
+        result = _median(sorted_kept, counts)
+    elif method == "trimmed_mean":
+        result = _trimmed_mean(sorted_kept, counts, min(max(trim, 0.0), 0.49))
+    elif method == "vwap":
+        result = _median(sorted_kept, counts)
+        if volumes is not None:
+            weights = np.where(np.isnan(kept), 0.0, np.nan_to_num(np.asarray(volumes, dtype=np.float64), nan=0.0))
+            weight_sum = weights.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                vwap = np.nansum(kept * weights, axis=0) / weight_sum
+            result = np.where(weight_sum > 0, vwap, result)
+    else:
+        raise ValueError(f"Unknown aggregation method '{method}', expected one of {METHODS}")
+
+    result = np.where(counts >= max(1, min_sources), result, np.nan)
+    return AggregationResult(result, counts, rejected)
+
+
+class PriceAggregator:
+    """Сводит котировки источников за тик в одну цену на пару."""
+
+    def __init__(self, method: str, max_deviation: float, min_sources: int, trim: float):
+        if method not in METHODS:
+            raise ValueError(f"Unknown aggregation method '{method}', expected one of {METHODS}")
+        self.method = method
+        self.max_deviation = max_deviation
+        self.min_sources = min_sources
+        self.trim = trim
+
+    def combine(
+        self, quotes: List[Optional[Dict[str, Tuple[float, float]]]], pairs: List[str]
+    ) -> Tuple[Dict[str, float], AggregationResult]:
+        """
+        quotes — по одному словарю {pair: (price, volume)} на источник (None — источник не ответил).
+        Возвращает цены пар, набравших min_sources, и полный результат (для учёта выбросов).
+        """
+        nan = (np.nan, np.nan)
+        prices = np.full((len(quotes), len(pairs)), np.nan)
+        volumes = np.full((len(quotes), len(pairs)), np.nan)
+        for row, source_quotes in enumerate(quotes):
+            if source_quotes and pairs:
+                prices[row], volumes[row] = zip(*[source_quotes.get(pair, nan) for pair in pairs])
+        result = aggregate(prices, volumes, self.method, self.max_deviation, self.min_sources, self.trim)
+        combined = {pair: float(price) for pair, price in zip(pairs, result.prices.tolist()) if price == price}
+        return combined, result
+
+# --- END OF FILE aggregation.py ---
@@ -0,0 +1,96 @@
+# --- START OF FILE broadcast.py ---
+
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+logger = logging.getLogger("broadcast")
+
+
+class Subscriber:
+    """Клиент потока цен: своя ограниченная очередь сообщений и набор пар (None — все пары)."""
+
+    __slots__ = ("pairs", "signed", "queue", "dropped")
+
+    def __init__(self, pairs: Optional[Set[str]], signed: bool, max_queue: int):
+        self.pairs = pairs
+        self.signed = signed
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.dropped = False
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Следующее сообщение; None — клиент отключён хабом как медленный. TimeoutError — тишина."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class BroadcastHub:
+    """
+    Раздаёт обновления цен всем подписчикам. Сообщение сериализуется один раз на тик,
+    подписчики пары находятся по индексу, publish не ждёт клиентов: у каждого своя очередь
+    на max_queue сообщений, и клиент, переполнивший её, отключается (slow consumer).
+    """
+
+    def __init__(self, max_queue: int, max_subscribers: int):
+        self._max_queue = max_queue
+        self._max_subscribers = max_subscribers
+        self._by_pair: Dict[str, Set[Subscriber]] = {}
+        self._all_pairs: Set[Subscriber] = set()  # подписчики на все пары
+        self._subscribers: Set[Subscriber] = set()
+        self.dropped_total = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, pairs: Optional[Iterable[str]] = None, signed: bool = False) -> Subscriber:
+        if len(self._subscribers) >= self._max_subscribers:
+            raise OverflowError("Too many stream subscribers")
+        sub = Subscriber(None, signed, self._max_queue)
+        self._subscribers.add(sub)
+        self.update(sub, pairs)
+        return sub
+
+    def update(self, sub: Subscriber, pairs: Optional[Iterable[str]]) -> None:
+        """Меняет набор пар подписчика (None — все пары)."""
+        self._unindex(sub)
+        sub.pairs = set(pairs) if pairs is not None else None
+        if sub.pairs is None:
+            self._all_pairs.add(sub)
+        else:
+            for pair in sub.pairs:
+                self._by_pair.setdefault(pair, set()).add(sub)
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._unindex(sub)
+        self._subscribers.discard(sub)
+
+    def _unindex(self, sub: Subscriber) -> None:
+        self._all_pairs.discard(sub)
+        for pair in sub.pairs or ():
+            subs = self._by_pair.get(pair)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_pair[pair]
+
+    def has_subscribers(self, pair: str) -> bool:
+        return bool(self._all_pairs) or pair in self._by_pair
+
+    def publish(self, pair: str, message: str, signed_message: Optional[str] = None) -> None:
+        """Ставит сообщение в очереди подписчиков пары. signed_message — вариант с подписью."""
+        for sub in list(self._all_pairs) + list(self._by_pair.get(pair, ())):
+            try:
+                sub.queue.put_nowait(signed_message if sub.signed and signed_message else message)
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: Subscriber) -> None:
+        self.unsubscribe(sub)
+        sub.dropped = True
+        self.dropped_total += 1
+        # Очередь освобождаем под маркер отключения, который клиентская задача получит следующим
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+        logger.warning("Dropped slow stream subscriber (queue of %d full)", self._max_queue)
+
+# --- END OF FILE broadcast.py ---
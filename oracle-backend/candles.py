@@ -0,0 +1,191 @@
+# --- START OF FILE candles.py ---
+
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+class CandleSeries:
+    """
+    Свечи одной пары с шагом resolution секунд в кольцевом буфере на массивах array.
+    Свечи идут подряд без пропусков (пустой интервал — свеча по последней цене), поэтому
+    свеча момента t находится за O(1) по номеру (t // resolution).
+
+    Цена считается ступенчатой: тик действует до следующего. Для каждой свечи хранится
+    накопленный интеграл цены по времени на её начало (как priceCumulative в Uniswap), и
+    TWAP за любое окно — это разность двух интегралов, делённая на длину окна: O(1) на запрос
+    и O(1) на тик, без пересчёта истории.
+    """
+
+    __slots__ = (
+        "resolution", "capacity", "_open", "_high", "_low", "_close", "_cum", "_ticks",
+        "_first", "_start", "_size", "_last_ts", "_last_price", "_last_cum",
+    )
+
+    def __init__(self, resolution: int, capacity: int):
+        if resolution <= 0 or capacity <= 0:
+            raise ValueError("CandleSeries resolution and capacity must be positive")
+        self.resolution = resolution
+        self.capacity = capacity
+        self._open = array("d", bytes(8 * capacity))
+        self._high = array("d", bytes(8 * capacity))
+        self._low = array("d", bytes(8 * capacity))
+        self._close = array("d", bytes(8 * capacity))
+        self._cum = array("d", bytes(8 * capacity))  # интеграл цены на начало свечи
+        self._ticks = array("q", bytes(8 * capacity))
+        self._first = 0  # номер самой старой свечи (ts // resolution)
+        self._start = 0  # её позиция в массивах
+        self._size = 0
+        self._last_ts = 0
+        self._last_price = 0.0
+        self._last_cum = 0.0  # интеграл цены на момент _last_ts
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _last_bucket(self) -> int:
+        return self._first + self._size - 1
+
+    def _pos(self, bucket: int) -> int:
+        return (self._start + bucket - self._first) % self.capacity
+
+    def _push(self, price: float, cum: float) -> None:
+        """Открывает следующую по номеру свечу с ценой price."""
+        if self._size < self.capacity:
+            pos = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:  # буфер полон — затираем самую старую свечу
+            pos = self._start
+            self._start = (self._start + 1) % self.capacity
+            self._first += 1
+        self._open[pos] = self._high[pos] = self._low[pos] = self._close[pos] = price
+        self._cum[pos] = cum
+        self._ticks[pos] = 0
+
+    def _cum_at(self, ts: int) -> float:
+        """Интеграл цены на момент ts >= _last_ts."""
+        return self._last_cum + self._last_price * (ts - self._last_ts)
+
+    def add(self, ts: int, price: float) -> bool:
+        """Учитывает тик. Тики старше последнего отбрасываются (как в PriceRing)."""
+        bucket = ts // self.resolution
+        if not self._size:
+            # Первая цена считается действующей с начала своей свечи
+            self._first = bucket
+            self._push(price, 0.0)
+            self._last_ts = bucket * self.resolution
+            self._last_price = price
+            self._last_cum = 0.0
+        elif ts < self._last_ts:
+            return False
+        elif bucket > self._last_bucket:
+            # Свечи интервалов без тиков — по последней цене; старше capacity всё равно вытеснятся
+            begin = max(self._last_bucket + 1, bucket - self.capacity + 1)
+            if begin > self._last_bucket + 1:
+                self._first, self._start, self._size = begin, 0, 0
+            for b in range(begin, bucket + 1):
+                self._push(self._last_price, self._cum_at(b * self.resolution))
+        self._last_cum = self._cum_at(ts)
+        self._last_ts = ts
+        self._last_price = price
+        pos = self._pos(bucket)
+        if price > self._high[pos]:
+            self._high[pos] = price
+        if price < self._low[pos]:
+            self._low[pos] = price
+        self._close[pos] = price
+        self._ticks[pos] += 1
+        return True
+
+    def _boundary_cum(self, bucket: int) -> Optional[float]:
+        """Интеграл цены на начало свечи bucket (или None, если она уже вытеснена)."""
+        if self._first <= bucket <= self._last_bucket:
+            return self._cum[self._pos(bucket)]
+        if bucket > self._last_bucket:
+            # После последнего тика цена держится, интеграл продолжается линейно
+            return self._cum_at(bucket * self.resolution)
+        return None
+
+    def twap(self, window: int, end: int) -> Optional[Tuple[int, int, float]]:
+        """
+        (start, end, TWAP) за окно window секунд до end. Начало окна выравнивается вниз по
+        границе свечи и не раньше самой старой свечи; end в прошлом — тоже по границе свечи.
+        """
+        if not self._size:
+            return None
+        if end >= self._last_ts:
+            end_cum = self._cum_at(end)
+        else:
+            end = end // self.resolution * self.resolution
+            end_cum = self._boundary_cum(end // self.resolution)
+            if end_cum is None:
+                return None
+        start_bucket = max((end - window) // self.resolution, self._first)
+        start = start_bucket * self.resolution
+        if end <= start:
+            return None
+        # Окно целиком после последнего тика (пара давно не обновлялась) начинается за _last_bucket
+        return start, end, (end_cum - self._boundary_cum(start_bucket)) / (end - start)
+
+    def candles(self, since: Optional[int], limit: int, now: int) -> List[dict]:
+        """Свечи с начала since (или последние limit), в хронологическом порядке."""
+        if not self._size:
+            return []
+        if since is None:
+            first = max(self._first, self._last_bucket - limit + 1)
+        else:
+            first = max(self._first, since // self.resolution)
+        last = min(self._last_bucket, first + limit - 1)
+        result = []
+        for bucket in range(first, last + 1):
+            pos = self._pos(bucket)
+            start = bucket * self.resolution
+            end = min(start + self.resolution, max(now, self._last_ts))
+            end_cum = self._boundary_cum(bucket + 1) if bucket < self._last_bucket else self._cum_at(end)
+            result.append({
+                "start": start,
+                "open": self._open[pos],
+                "high": self._high[pos],
+                "low": self._low[pos],
+                "close": self._close[pos],
+                "twap": (end_cum - self._cum[pos]) / (end - start) if end > start else self._close[pos],
+                "ticks": self._ticks[pos],
+            })
+        return result
+
+
+class CandleStore:
+    """Свечи всех пар на нескольких разрешениях; обновляются на каждом тике вместе с PriceHistory."""
+
+    def __init__(self, resolutions: List[int], capacity: int):
+        if not resolutions:
+            raise ValueError("CandleStore needs at least one resolution")
+        self.resolutions = sorted(set(resolutions))
+        self.capacity = capacity
+        self._series: Dict[str, Dict[int, CandleSeries]] = {}
+
+    def record(self, pair: str, ts: int, price: float) -> None:
+        series = self._series.get(pair)
+        if series is None:
+            series = self._series[pair] = {r: CandleSeries(r, self.capacity) for r in self.resolutions}
+        for s in series.values():
+            s.add(ts, price)
+
+    def drop(self, pair: str) -> None:
+        self._series.pop(pair, None)
+
+    def twap(self, pair: str, window: int, end: int) -> Optional[Tuple[int, int, float]]:
+        """TWAP по самому мелкому разрешению, чья история покрывает окно."""
+        series = self._series.get(pair)
+        if series is None:
+            return None
+        resolution = next((r for r in self.resolutions if r * self.capacity >= window), self.resolutions[-1])
+        return series[resolution].twap(window, end)
+
+    def candles(self, pair: str, resolution: int, since: Optional[int], limit: int, now: int) -> Optional[List[dict]]:
+        series = self._series.get(pair)
+        if series is None or resolution not in series:
+            return None
+        return series[resolution].candles(since, limit, now)
+
+# --- END OF FILE candles.py ---
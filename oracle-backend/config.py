@@ -26,6 +26,160 @@ except (json.JSONDecodeError, ValueError) as e:
     print(f"Error parsing ASSET_PAIRS from .env: {e}. Using default.")
     ASSET_PAIRS = ["BTC/USDT", "ETH/USDT"] # Значение по умолчанию
 
+# История цен: сколько последних тиков хранить на пару (8640 ≈ сутки при опросе раз в 10 с)
+PRICE_HISTORY_SIZE = int(os.getenv("PRICE_HISTORY_SIZE", "8640"))
+# Максимальное расхождение между запрошенным timestamp и ближайшим тиком из истории
+PRICE_LOOKUP_TOLERANCE_SECONDS = int(
+    os.getenv("PRICE_LOOKUP_TOLERANCE_SECONDS", str(ORACLE_POLL_INTERVAL_SECONDS * 2 + 5))
+)
+
+# Лента тиков на диске (mmap): переживает рестарт процесса и прогревает историю при старте
+PRICE_TAPE_ENABLED = os.getenv("PRICE_TAPE_ENABLED", "true").lower() in ("1", "true", "yes")
+PRICE_TAPE_DIR = os.getenv("PRICE_TAPE_DIR", "price_tape")
+# Записей в одном сегменте (16 байт на запись) и сколько сегментов хранить на пару
+PRICE_TAPE_SEGMENT_RECORDS = int(os.getenv("PRICE_TAPE_SEGMENT_RECORDS", "65536"))
+PRICE_TAPE_MAX_SEGMENTS = int(os.getenv("PRICE_TAPE_MAX_SEGMENTS", "8"))
+# Последний тик ленты отдаётся как текущая цена, только если он не старше этого (иначе — только в историю)
+PRICE_WARM_START_MAX_AGE_SECONDS = int(
+    os.getenv("PRICE_WARM_START_MAX_AGE_SECONDS", str(ORACLE_POLL_INTERVAL_SECONDS * 3))
+)
+
+# Подпись в пуле процессов (0 — подписывать прямо в event loop) и размер пачки на одну отправку в пул
+SIGNER_PROCESSES = int(os.getenv("SIGNER_PROCESSES", "2"))
+SIGNER_MAX_BATCH = int(os.getenv("SIGNER_MAX_BATCH", "64"))
+
+# Пакетная подпись: на каждый тик строится дерево Меркла по всем парам и подписывается только корень
+PRICE_BUNDLE_ENABLED = os.getenv("PRICE_BUNDLE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Конвейер транзакций фулфилмента: сколько транзакций одновременно в полёте,
+# как часто проверять квитанции и когда переотправлять зависшую транзакцию с повышенной ценой газа
+TX_MAX_IN_FLIGHT = int(os.getenv("TX_MAX_IN_FLIGHT", "16"))
+TX_RECEIPT_POLL_SECONDS = float(os.getenv("TX_RECEIPT_POLL_SECONDS", "3"))
+TX_STUCK_AFTER_SECONDS = float(os.getenv("TX_STUCK_AFTER_SECONDS", "90"))
+TX_FEE_BUMP_PERCENT = int(os.getenv("TX_FEE_BUMP_PERCENT", "15"))
+TX_MAX_BUMPS = int(os.getenv("TX_MAX_BUMPS", "3"))
+TX_FEE_REFRESH_SECONDS = float(os.getenv("TX_FEE_REFRESH_SECONDS", "15"))
+
+# Пакетный фулфилмент: запросы копятся до окна/лимита и уходят одной транзакцией
+# fulfillPriceValidationBatch (нужен контракт SimpleOracle с этой функцией, поэтому выключено по умолчанию)
+FULFILLMENT_BATCH_ENABLED = os.getenv("FULFILLMENT_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+FULFILLMENT_BATCH_WINDOW_SECONDS = float(os.getenv("FULFILLMENT_BATCH_WINDOW_SECONDS", "2"))
+FULFILLMENT_BATCH_MAX_SIZE = int(os.getenv("FULFILLMENT_BATCH_MAX_SIZE", "50"))
+# Лимит газа пакета: база + на каждый элемент (ecrecover, SSTORE, событие)
+FULFILLMENT_BATCH_BASE_GAS = int(os.getenv("FULFILLMENT_BATCH_BASE_GAS", "60000"))
+FULFILLMENT_BATCH_GAS_PER_ITEM = int(os.getenv("FULFILLMENT_BATCH_GAS_PER_ITEM", "45000"))
+
+# Слушатель событий: по WebSocket — подписка eth_subscribe("logs"), по HTTP — опрос eth_getLogs с этим интервалом
+LOG_POLL_INTERVAL_SECONDS = float(os.getenv("LOG_POLL_INTERVAL_SECONDS", "2"))
+# Чекпоинт последнего обработанного блока: после рестарта/реконнекта пропущенное догружается через eth_getLogs
+LOG_CHECKPOINT_PATH = os.getenv("LOG_CHECKPOINT_PATH", "event_checkpoint.json")
+# Стартовый размер чанка eth_getLogs (уменьшается, если провайдер отказывает) и число параллельных запросов
+LOG_BACKFILL_MAX_CHUNK_BLOCKS = int(os.getenv("LOG_BACKFILL_MAX_CHUNK_BLOCKS", "2000"))
+LOG_BACKFILL_CONCURRENCY = int(os.getenv("LOG_BACKFILL_CONCURRENCY", "4"))
+# Пока событий нет, чекпоинт сдвигается раз в интервал до head минус запас блоков
+LOG_CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("LOG_CHECKPOINT_INTERVAL_SECONDS", "30"))
+LOG_CHECKPOINT_LAG_BLOCKS = int(os.getenv("LOG_CHECKPOINT_LAG_BLOCKS", "3"))
+
+# Обработка запросов: пул воркеров и очередь перед ним; повторы (assetId, timestamp) схлопываются
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "8"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))
+# Уже исполненные запросы: восстанавливаются из логов PriceValidationFulfilled за столько блоков назад
+FULFILLED_LOOKBACK_BLOCKS = int(os.getenv("FULFILLED_LOOKBACK_BLOCKS", "50000"))
+FULFILLED_CACHE_SIZE = int(os.getenv("FULFILLED_CACHE_SIZE", "100000"))
+
+# Реестр пар: при заданном пути пары, добавленные/удалённые через /admin/pairs, сохраняются и переживают рестарт
+PAIR_REGISTRY_PATH = os.getenv("PAIR_REGISTRY_PATH", "")
+# Токен для /admin/* (заголовок X-Admin-Token); пустой — админ-эндпоинты выключены
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Снимок состояния для /status обновляется фоном с этим интервалом (запросы к /status не ходят в RPC)
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "5"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "3"))
+
+# Поток цен (/stream/prices, /ws/prices): очередь на клиента (переполнил — отключается),
+# лимит подписчиков и интервал keepalive, когда тиков нет
+STREAM_CLIENT_QUEUE_SIZE = int(os.getenv("STREAM_CLIENT_QUEUE_SIZE", "256"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "10000"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Режим развёртывания: "standalone" — один процесс делает всё (по умолчанию);
+# "ingest" — единственный процесс с опросом цен, слушателем и транзакциями, пишет цены в разделяемую память;
+# "api" — stateless HTTP-воркеры (uvicorn --workers N), читают цены и /status из этой памяти
+ORACLE_ROLE = os.getenv("ORACLE_ROLE", "standalone").lower()
+SHARED_PRICES_PATH = os.getenv("SHARED_PRICES_PATH", "/dev/shm/oracle_prices")
+SHARED_PRICES_CAPACITY = int(os.getenv("SHARED_PRICES_CAPACITY", "1024"))  # макс. число пар
+SHARED_STATUS_CAPACITY = int(os.getenv("SHARED_STATUS_CAPACITY", "262144"))  # байт под снимок /status
+# Как часто API-воркер проверяет таблицу (новые тики для потоков, реестр пар, рестарт ingest)
+SHARED_PRICES_POLL_SECONDS = float(os.getenv("SHARED_PRICES_POLL_SECONDS", "0.1"))
+SHARED_PRICES_WAIT_SECONDS = float(os.getenv("SHARED_PRICES_WAIT_SECONDS", "60"))
+
+# Горячие эндпоинты (/price, /signed_price) пишут DEBUG-лог только для каждого N-го запроса
+REQUEST_LOG_SAMPLE_EVERY = max(1, int(os.getenv("REQUEST_LOG_SAMPLE_EVERY", "100")))
+
+# Площадки для опроса цен (через запятую): binance, okx, bybit, coinbase; имена sim* — офлайн-заглушки
+PRICE_SOURCES = [s.strip().lower() for s in os.getenv("PRICE_SOURCES", "binance").split(",") if s.strip()]
+PRICE_SOURCE_TIMEOUT_SECONDS = float(os.getenv("PRICE_SOURCE_TIMEOUT_SECONDS", "5"))
+# Сведение котировок площадок: median, trimmed_mean или vwap (по объёму за 24 ч)
+PRICE_AGGREGATION = os.getenv("PRICE_AGGREGATION", "median").lower()
+# Котировка дальше этой доли от медианы пары считается выбросом и отбрасывается
+PRICE_MAX_DEVIATION = float(os.getenv("PRICE_MAX_DEVIATION", "0.02"))
+# Минимум согласных площадок, чтобы цена пары попала в тик
+PRICE_MIN_SOURCES = int(os.getenv("PRICE_MIN_SOURCES", "1"))
+PRICE_TRIM_FRACTION = float(os.getenv("PRICE_TRIM_FRACTION", "0.2"))  # для trimmed_mean, с каждой стороны
+# Для заглушек sim*: вероятность выброса в котировке и "падения" площадки за опрос
+SIM_WICK_PROBABILITY = float(os.getenv("SIM_WICK_PROBABILITY", "0"))
+SIM_OUTAGE_PROBABILITY = float(os.getenv("SIM_OUTAGE_PROBABILITY", "0"))
+
+# Свечи OHLC и TWAP: разрешения в секундах (через запятую) и сколько свечей хранить на разрешение
+CANDLE_RESOLUTIONS = sorted({int(r) for r in os.getenv("CANDLE_RESOLUTIONS", "60,300,3600").split(",") if r.strip()})
+CANDLE_HISTORY_SIZE = int(os.getenv("CANDLE_HISTORY_SIZE", "1440"))
+TWAP_MAX_WINDOW_SECONDS = int(os.getenv("TWAP_MAX_WINDOW_SECONDS", "86400"))
+# Если > 0, запросы контракта исполняются TWAP за это окно до запрошенного момента, а не ближайшим тиком
+FULFILLMENT_TWAP_WINDOW_SECONDS = int(os.getenv("FULFILLMENT_TWAP_WINDOW_SECONDS", "0"))
+
+# Push-режим: сервис сам публикует цены в контракт (fulfillPriceValidationBatch), когда цена пары
+# ушла от опубликованной дальше PUSH_DEVIATION_THRESHOLD (доля) или прошло PUSH_HEARTBEAT_SECONDS
+PUSH_ENABLED = os.getenv("PUSH_ENABLED", "false").lower() in ("1", "true", "yes")
+PUSH_DEVIATION_THRESHOLD = float(os.getenv("PUSH_DEVIATION_THRESHOLD", "0.005"))
+PUSH_HEARTBEAT_SECONDS = int(os.getenv("PUSH_HEARTBEAT_SECONDS", "3600"))
+PUSH_MAX_BATCH_SIZE = int(os.getenv("PUSH_MAX_BATCH_SIZE", "50"))  # пар в одной транзакции
+
+# Пул RPC-узлов: несколько URL через запятую (по умолчанию — один SEPOLIA_RPC_URL). С двумя и более
+# узлами сервис работает через пул HTTP-провайдеров: чтения хеджируются, записи закреплены за одним узлом
+RPC_URLS = [u.strip() for u in os.getenv("RPC_URLS", SEPOLIA_RPC_URL or "").split(",") if u.strip()]
+RPC_REQUEST_TIMEOUT_SECONDS = float(os.getenv("RPC_REQUEST_TIMEOUT_SECONDS", "10"))
+# Чтение, на которое узел не ответил за столько секунд, дублируется на следующий узел
+RPC_HEDGE_AFTER_SECONDS = float(os.getenv("RPC_HEDGE_AFTER_SECONDS", "0.75"))
+RPC_MAX_HEDGES = int(os.getenv("RPC_MAX_HEDGES", "1"))
+# Узел выводится из ротации после стольких ошибок подряд (с экспоненциальным бэкоффом до RPC_MAX_BACKOFF_SECONDS)
+RPC_ENDPOINT_MAX_ERRORS = int(os.getenv("RPC_ENDPOINT_MAX_ERRORS", "3"))
+RPC_MAX_BACKOFF_SECONDS = float(os.getenv("RPC_MAX_BACKOFF_SECONDS", "60"))
+RPC_MAX_LAG_BLOCKS = int(os.getenv("RPC_MAX_LAG_BLOCKS", "3"))  # узел, отставший по head больше, — в конец очереди
+RPC_HEALTH_CHECK_SECONDS = float(os.getenv("RPC_HEALTH_CHECK_SECONDS", "15"))
+
+# Надзор за подключением: раз в CONNECTION_CHECK_SECONDS ping сокета и head-блок. После
+# CONNECTION_MAX_FAILED_PROBES неудач подряд или head без изменений HEAD_STALL_SECONDS
+# подключение и слушатель пересоздаются (бэкофф до RECONNECT_MAX_BACKOFF_SECONDS)
+CONNECTION_CHECK_SECONDS = float(os.getenv("CONNECTION_CHECK_SECONDS", "5"))
+CONNECTION_PROBE_TIMEOUT_SECONDS = float(os.getenv("CONNECTION_PROBE_TIMEOUT_SECONDS", "10"))
+CONNECTION_MAX_FAILED_PROBES = int(os.getenv("CONNECTION_MAX_FAILED_PROBES", "2"))
+HEAD_STALL_SECONDS = float(os.getenv("HEAD_STALL_SECONDS", "90"))
+RECONNECT_MAX_BACKOFF_SECONDS = float(os.getenv("RECONNECT_MAX_BACKOFF_SECONDS", "60"))
+
+# Пакетный опрос Binance: один запрос ticker/price со списком symbols на цикл
+BINANCE_BATCH_FETCH = os.getenv("BINANCE_BATCH_FETCH", "true").lower() in ("1", "true", "yes")
+# Сколько символов помещаем в один запрос (длинный список режем на чанки)
+BINANCE_MAX_SYMBOLS_PER_REQUEST = int(os.getenv("BINANCE_MAX_SYMBOLS_PER_REQUEST", "100"))
+
+# Источник цен: "poll" (REST-опрос) или "stream" (WebSocket Binance, при обрыве — откат на опрос).
+# stream — одна площадка: медиана и отсев выбросов PRICE_SOURCES работают только в опросе
+PRICE_SOURCE_MODE = os.getenv("PRICE_SOURCE_MODE", "poll").lower()
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/stream")
+# Тип потока: "ticker" (последняя сделка) или "bookTicker" (середина между bid/ask)
+BINANCE_STREAM_TYPE = os.getenv("BINANCE_STREAM_TYPE", "ticker")
+# Максимальная пауза между попытками переподключения к потоку
+BINANCE_STREAM_MAX_BACKOFF_SECONDS = int(os.getenv("BINANCE_STREAM_MAX_BACKOFF_SECONDS", "60"))
+
 # Проверка наличия обязательных переменных
 required_vars = [
     "SEPOLIA_RPC_URL",
@@ -37,6 +191,10 @@ required_vars = [
 missing_vars = [var for var in required_vars if not globals().get(var)]
 if missing_vars:
     raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
+if PRICE_AGGREGATION not in ("median", "trimmed_mean", "vwap"):
+    raise EnvironmentError(f"PRICE_AGGREGATION must be median, trimmed_mean or vwap, got '{PRICE_AGGREGATION}'")
+if ORACLE_ROLE not in ("standalone", "ingest", "api"):
+    raise EnvironmentError(f"ORACLE_ROLE must be standalone, ingest or api, got '{ORACLE_ROLE}'")
 
 # Константы для ABI (пути к файлам) - мы их создадим позже
 # Обычно артефакты компиляции Hardhat лежат в папке artifacts
@@ -52,6 +210,27 @@ print(f"  KYC Whitelist: {KYC_WHITELIST_ADDRESS}")
 print(f"  Simple Oracle: {SIMPLE_ORACLE_ADDRESS}")
 print(f"  Poll Interval: {ORACLE_POLL_INTERVAL_SECONDS}s")
 print(f"  Asset Pairs: {ASSET_PAIRS}")
+print(f"  Price History: {PRICE_HISTORY_SIZE} ticks/pair (lookup tolerance {PRICE_LOOKUP_TOLERANCE_SECONDS}s)")
+print(f"  Price Tape: {PRICE_TAPE_DIR if PRICE_TAPE_ENABLED else 'disabled'}" + (f" (warm start prices up to {PRICE_WARM_START_MAX_AGE_SECONDS}s old)" if PRICE_TAPE_ENABLED else ""))
+print(f"  Signer Processes: {SIGNER_PROCESSES} (batch {SIGNER_MAX_BATCH})")
+print(f"  Price Bundle (Merkle root signing): {PRICE_BUNDLE_ENABLED}")
+print(f"  Tx Pipeline: {TX_MAX_IN_FLIGHT} in flight, bump {TX_FEE_BUMP_PERCENT}% after {TX_STUCK_AFTER_SECONDS:g}s")
+print(f"  Batched Fulfillment: {FULFILLMENT_BATCH_ENABLED}" + (f" (window {FULFILLMENT_BATCH_WINDOW_SECONDS:g}s, max {FULFILLMENT_BATCH_MAX_SIZE})" if FULFILLMENT_BATCH_ENABLED else ""))
+print(f"  Event Listener: eth_subscribe over WebSocket, log polling every {LOG_POLL_INTERVAL_SECONDS:g}s over HTTP")
+print(f"  Event Checkpoint: {LOG_CHECKPOINT_PATH} (backfill chunk {LOG_BACKFILL_MAX_CHUNK_BLOCKS} blocks x{LOG_BACKFILL_CONCURRENCY})")
+print(f"  Event Workers: {EVENT_WORKERS} (queue {EVENT_QUEUE_SIZE}, fulfilled lookback {FULFILLED_LOOKBACK_BLOCKS} blocks)")
+print(f"  Pair Registry: {PAIR_REGISTRY_PATH or 'in memory'} (admin API {'enabled' if ADMIN_API_TOKEN else 'disabled'})")
+print(f"  Health Snapshot: every {HEALTH_REFRESH_SECONDS:g}s")
+print(f"  Price Stream: up to {STREAM_MAX_SUBSCRIBERS} subscribers, queue {STREAM_CLIENT_QUEUE_SIZE}/client")
+print(f"  Role: {ORACLE_ROLE}" + (f" (shared prices: {SHARED_PRICES_PATH})" if ORACLE_ROLE != "standalone" else ""))
+print(f"  Request Log Sampling: 1/{REQUEST_LOG_SAMPLE_EVERY} (DEBUG)")
+print(f"  Price Sources: {', '.join(PRICE_SOURCES)} ({PRICE_AGGREGATION}, reject >{PRICE_MAX_DEVIATION:.2%} from median, min {PRICE_MIN_SOURCES})")
+print(f"  Candles: {CANDLE_RESOLUTIONS}s x {CANDLE_HISTORY_SIZE}" + (f" (fulfilling with {FULFILLMENT_TWAP_WINDOW_SECONDS}s TWAP)" if FULFILLMENT_TWAP_WINDOW_SECONDS > 0 else ""))
+print(f"  Push Updates: {PUSH_ENABLED}" + (f" (deviation {PUSH_DEVIATION_THRESHOLD:.2%}, heartbeat {PUSH_HEARTBEAT_SECONDS}s, max {PUSH_MAX_BATCH_SIZE}/tx)" if PUSH_ENABLED else ""))
+print(f"  RPC Pool: {len(RPC_URLS)} endpoints" + (f" (hedge after {RPC_HEDGE_AFTER_SECONDS:g}s, timeout {RPC_REQUEST_TIMEOUT_SECONDS:g}s)" if len(RPC_URLS) > 1 else " (single provider)"))
+print(f"  Connection Supervisor: probe every {CONNECTION_CHECK_SECONDS:g}s, reconnect after {CONNECTION_MAX_FAILED_PROBES} failures or {HEAD_STALL_SECONDS:g}s head stall")
+print(f"  Price Source: {PRICE_SOURCE_MODE}" + (f" ({BINANCE_STREAM_TYPE}, Binance only, no aggregation)" if PRICE_SOURCE_MODE == "stream" else ""))
+print(f"  Binance Batch Fetch: {BINANCE_BATCH_FETCH} (max {BINANCE_MAX_SYMBOLS_PER_REQUEST} symbols/request)")
 
 # Важно: Добавим простую функцию для получения ABI
 def get_contract_abi(contract_name: str) -> list:
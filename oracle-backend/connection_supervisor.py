@@ -0,0 +1,149 @@
+# --- START OF FILE connection_supervisor.py ---
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+import metrics
+
+logger = logging.getLogger("connection_supervisor")
+
+
+class ConnectionSupervisor:
+    """
+    Следит за подключением к узлу после старта. Раз в interval секунд вызывает probe()
+    (запрос head-блока) с таймаутом probe_timeout. Подключение считается мёртвым,
+    если probe не прошёл max_failed_probes раз подряд или head не менялся stall_seconds
+    (сокет жив, но узел завис). Тогда reconnect() пересоздаёт провайдер, контракт и
+    слушатель; неудачные попытки повторяются с экспоненциальным бэкоффом (с джиттером)
+    до max_backoff секунд.
+
+    Пока подключение живо, supervisor перезапускает упавший слушатель (listener_alive /
+    restart_listener) и, если задан upgrade, пробует вернуться с HTTP на WebSocket
+    (upgrade() возвращает True, если переходить уже не нужно).
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[int]],
+        reconnect: Callable[[], Awaitable[None]],
+        listener_alive: Callable[[], bool],
+        restart_listener: Callable[[], Awaitable[bool]],
+        upgrade: Optional[Callable[[], Awaitable[bool]]] = None,
+        interval: float = 5.0,
+        probe_timeout: float = 10.0,
+        max_failed_probes: int = 2,
+        stall_seconds: float = 90.0,
+        max_backoff: float = 60.0,
+    ):
+        self._probe = probe
+        self._reconnect = reconnect
+        self._listener_alive = listener_alive
+        self._restart_listener = restart_listener
+        self._upgrade = upgrade
+        self._interval = interval
+        self._probe_timeout = probe_timeout
+        self._max_failed_probes = max(1, max_failed_probes)
+        self._stall_seconds = stall_seconds
+        self._max_backoff = max_backoff
+        self._failed_probes = 0
+        self._head: Optional[int] = None
+        self._head_changed_at = 0.0
+        self._upgrade_backoff = 0.0
+        self._next_upgrade_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.reconnects = 0
+        self.last_reconnect_reason: Optional[str] = None
+
+    async def _check(self) -> Optional[str]:
+        """Причина переподключения или None, если подключение живо."""
+        try:
+            head = await asyncio.wait_for(self._probe(), timeout=self._probe_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failed_probes += 1
+            logger.warning("Connection probe failed (%d/%d): %s", self._failed_probes, self._max_failed_probes,
+                           e or type(e).__name__)
+            if self._failed_probes >= self._max_failed_probes:
+                return f"probe failed: {e or type(e).__name__}"
+            return None
+        self._failed_probes = 0
+        now = time.monotonic()
+        if head != self._head:
+            self._head, self._head_changed_at = head, now
+        elif now - self._head_changed_at >= self._stall_seconds:
+            return f"head stalled at block {head} for {now - self._head_changed_at:.0f}s"
+        return None
+
+    async def _recover(self, reason: str) -> None:
+        logger.warning("Connection lost (%s), reconnecting...", reason)
+        metrics.RECONNECTS.inc()
+        delay = 1.0
+        started = time.monotonic()
+        while True:
+            try:
+                await self._reconnect()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                sleep = delay * random.uniform(0.5, 1.0)
+                logger.error("Reconnect failed (%s), retrying in %.1fs", e or type(e).__name__, sleep)
+                await asyncio.sleep(sleep)
+                delay = min(self._max_backoff, delay * 2)
+        self.reconnects += 1
+        self.last_reconnect_reason = reason
+        self._failed_probes = 0
+        self._head = None
+        logger.info("Reconnected in %.1fs", time.monotonic() - started)
+
+    async def _maybe_upgrade(self) -> None:
+        now = time.monotonic()
+        if now < self._next_upgrade_at:
+            return
+        try:
+            upgraded = await self._upgrade()
+        except Exception as e:
+            logger.warning("Provider upgrade failed: %s", e)
+            upgraded = False
+        if upgraded:
+            self._upgrade_backoff = 0.0
+            return
+        self._upgrade_backoff = min(self._max_backoff, self._upgrade_backoff * 2 if self._upgrade_backoff else self._interval)
+        self._next_upgrade_at = now + self._upgrade_backoff
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                reason = await self._check()
+                if reason is not None:
+                    await self._recover(reason)
+                    continue
+                if not self._listener_alive():
+                    logger.warning("Event listener is not running, restarting it")
+                    await self._restart_listener()
+                if self._upgrade is not None:
+                    await self._maybe_upgrade()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Connection supervisor error: %s", e, exc_info=True)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+# --- END OF FILE connection_supervisor.py ---
@@ -0,0 +1,155 @@
+# --- START OF FILE event_dispatcher.py ---
+
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger("event_dispatcher")
+
+
+class EventDispatcher:
+    """
+    Раздаёт события запросов пулу из workers асинхронных воркеров. Запросы с одинаковым
+    ключом (assetId, timestamp) схлопываются: пока по ключу идёт фулфилмент, повторы
+    пропускаются (single-flight), а уже исполненные ончейн ключи не обрабатываются вовсе.
+
+    handler возвращает future квитанции (ключ занят до её получения) или None, если
+    фулфилмент не отправлен — тогда ключ сразу освобождается для повторной попытки.
+
+    Для чекпоинта блоков учитывается, какие блоки ещё не исполнены: событие блока считается
+    завершённым, когда handler вернул None или квитанция получена со status 1. Если handler упал,
+    а транзакция отброшена или откатилась — блок помечается неудачным, и чекпоинт до конца
+    жизни диспетчера не уходит дальше него: после рестарта догрузка повторит эти запросы.
+
+    stop()/start() останавливают и перезапускают только воркеров: очередь, ключи в полёте и
+    исполненные ключи сохраняются (переподключение не должно повторно отправлять фулфилменты).
+    Событие, чей handler прервала остановка, возвращается в очередь.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], Awaitable[Optional[asyncio.Future]]],
+        key_of: Callable[[dict], Optional[tuple]],
+        workers: int,
+        queue_size: int,
+        fulfilled_size: int,
+    ):
+        self._handler = handler
+        self._key_of = key_of
+        self._workers_count = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(0, queue_size))
+        self._workers: List[asyncio.Task] = []
+        self._in_flight: Set[tuple] = set()
+        self._fulfilled: Dict[tuple, None] = {}  # упорядочен по вставке: старые ключи вытесняются первыми
+        self._fulfilled_size = max(1, fulfilled_size)
+        self._unsettled: Dict[int, int] = {}  # блок → событий без итога
+        self._failed_block: Optional[int] = None  # самый ранний блок с неудачным фулфилментом
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    @property
+    def fulfilled(self) -> int:
+        return len(self._fulfilled)
+
+    def start(self) -> None:
+        while len(self._workers) < self._workers_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def checkpoint(self, block: int) -> int:
+        """Блок, до которого (включительно) чекпоинт можно сдвинуть, если события до block уже поставлены."""
+        for limit in (min(self._unsettled, default=None), self._failed_block):
+            if limit is not None:
+                block = min(block, limit - 1)
+        return block
+
+    def _track(self, block: Optional[int]) -> None:
+        if block is not None:
+            self._unsettled[block] = self._unsettled.get(block, 0) + 1
+
+    def _finish(self, block: Optional[int], ok: bool) -> None:
+        if block is None:
+            return
+        left = self._unsettled.get(block, 0) - 1
+        if left > 0:
+            self._unsettled[block] = left
+        else:
+            self._unsettled.pop(block, None)
+        if not ok and (self._failed_block is None or block < self._failed_block):
+            logger.warning("Request in block %s not fulfilled, holding the block checkpoint before it", block)
+            self._failed_block = block
+
+    def mark_fulfilled(self, key: tuple) -> None:
+        self._fulfilled[key] = None
+        if len(self._fulfilled) > self._fulfilled_size:
+            del self._fulfilled[next(iter(self._fulfilled))]
+
+    async def submit(self, ev) -> bool:
+        """Ставит событие в очередь воркеров (ждёт, если очередь полна). False — событие схлопнуто."""
+        key = self._key_of(ev)
+        if key is not None:
+            if key in self._fulfilled:
+                logger.info("Request %s @ %s already fulfilled on-chain, skipping", key[0].hex(), key[1])
+                return False
+            if key in self._in_flight:
+                logger.info("Request %s @ %s already in flight, collapsing duplicate", key[0].hex(), key[1])
+                return False
+            self._in_flight.add(key)
+        block = ev.get("blockNumber")
+        self._track(block)
+        await self._queue.put((key, block, ev))
+        return True
+
+    async def join(self) -> None:
+        """Ждёт, пока воркеры обработают всё, что уже поставлено в очередь."""
+        await self._queue.join()
+
+    async def _worker(self) -> None:
+        while True:
+            key, block, ev = await self._queue.get()
+            result = None
+            failed = False
+            try:
+                result = await self._handler(ev)
+            except asyncio.CancelledError:
+                self._requeue(key, block, ev)
+                raise
+            except Exception as exc:
+                failed = True
+                logger.error("Listener error: %s", exc, exc_info=True)
+            finally:
+                self._queue.task_done()
+            if isinstance(result, asyncio.Future):
+                result.add_done_callback(partial(self._settle, key, block))
+                continue
+            self._finish(block, not failed)
+            if key is not None:
+                self._in_flight.discard(key)
+
+    def _requeue(self, key: Optional[tuple], block: Optional[int], ev) -> None:
+        """Воркер остановлен посреди события: его возьмёт воркер после start()."""
+        try:
+            self._queue.put_nowait((key, block, ev))
+        except asyncio.QueueFull:
+            # Места нет — отпускаем ключ, а чекпоинт держим до блока: догрузка повторит запрос
+            self._finish(block, False)
+            if key is not None:
+                self._in_flight.discard(key)
+
+    def _settle(self, key: Optional[tuple], block: Optional[int], fut: asyncio.Future) -> None:
+        if key is not None:
+            self._in_flight.discard(key)
+        ok = not fut.cancelled() and fut.exception() is None and fut.result().get("status") == 1
+        self._finish(block, ok)
+        if ok and key is not None:
+            self.mark_fulfilled(key)
+
+# --- END OF FILE event_dispatcher.py ---
@@ -0,0 +1,220 @@
+# --- START OF FILE event_source.py ---
+
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from eth_utils import event_abi_to_log_topic
+from web3.exceptions import LogTopicError
+
+from metrics import rpc_call
+
+logger = logging.getLogger("event_source")
+
+# В очередь событий кроме самих событий кладутся отметки блоков (int): "все события
+# до этого блока включительно уже в очереди". Дойдя до отметки, потребитель сохраняет чекпоинт.
+
+
+class BlockCheckpoint:
+    """Последний полностью обработанный блок, хранится в JSON-файле (атомарная запись)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.block: Optional[int] = None
+        try:
+            with open(path, "r") as f:
+                self.block = int(json.load(f)["block"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable block checkpoint %s: %s", path, e)
+
+    def save(self, block: int) -> None:
+        if self.block is not None and block <= self.block:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"block": block}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error("Cannot save block checkpoint %s: %s", self.path, e)
+            return
+        self.block = block
+
+
+async def backfill_logs(
+    contract,
+    event_name: str,
+    from_block: int,
+    to_block: int,
+    queue: asyncio.Queue,
+    max_chunk: int,
+    concurrency: int,
+) -> None:
+    """
+    Догружает события за [from_block, to_block] через eth_getLogs. Диапазон режется на чанки,
+    до concurrency запросов идут параллельно; если провайдер отказывает (лимит на число логов
+    или ширину диапазона), чанк делится пополам, а следующие чанки берутся меньше.
+    События попадают в очередь по порядку блоков, после каждого чанка — отметка его последнего блока.
+    """
+    if to_block < from_block:
+        return
+    event = contract.events[event_name]
+    max_chunk = max(1, max_chunk)
+    chunk = max_chunk
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(lo: int, hi: int) -> list:
+        nonlocal chunk
+        async with slots:
+            try:
+                async with rpc_call("eth_getLogs"):
+                    logs = list(await event.get_logs(from_block=lo, to_block=hi))
+                if hi - lo + 1 >= chunk:
+                    chunk = min(max_chunk, chunk * 2)
+                return logs
+            except Exception as e:
+                if lo == hi:
+                    raise
+                chunk = max(1, (hi - lo + 1) // 2)
+                logger.info("get_logs %d-%d rejected (%s), splitting range", lo, hi, e)
+        mid = (lo + hi) // 2
+        left, right = await asyncio.gather(fetch(lo, mid), fetch(mid + 1, hi))
+        return left + right
+
+    logger.info("Backfilling %s logs for blocks %d-%d", event_name, from_block, to_block)
+    pending: deque = deque()  # [(последний блок чанка, задача)]
+    next_block = from_block
+    try:
+        while next_block <= to_block or pending:
+            while next_block <= to_block and len(pending) < max(1, concurrency):
+                hi = min(next_block + chunk - 1, to_block)
+                pending.append((hi, asyncio.create_task(fetch(next_block, hi))))
+                next_block = hi + 1
+            hi, task = pending.popleft()
+            for ev in await task:
+                queue.put_nowait(ev)
+            queue.put_nowait(hi)
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def subscribe_logs(
+    w3,
+    contract,
+    event_name: str,
+    queue: asyncio.Queue,
+    on_subscribed: Optional[Callable[[], Awaitable[int]]] = None,
+    checkpoint_interval: float = 30,
+    checkpoint_lag: int = 3,
+) -> None:
+    """
+    Подписка eth_subscribe("logs") на событие контракта через WebSocketProvider.
+    Узел сам присылает логи; декодированные события кладутся в queue.
+
+    on_subscribed вызывается сразу после подписки (догрузка пропущенного) и возвращает последний
+    догруженный блок — события из подписки до него включительно отбрасываются как дубли.
+    Пока событий нет, раз в checkpoint_interval в очередь ставится отметка head - checkpoint_lag,
+    но только если eth_getLogs подтверждает, что до неё нет событий, ещё не пришедших из подписки.
+    """
+    event = contract.events[event_name]()
+    topic = event_abi_to_log_topic(event.abi)
+    sub_id = await w3.eth.subscribe("logs", {"address": contract.address, "topics": [topic]})
+    logger.info("Subscribed to %s logs (subscription %s)", event_name, sub_id)
+    marker: Optional[asyncio.Task] = None
+    try:
+        last_block = await on_subscribed() if on_subscribed else -1
+        skip_through = last_block
+        # Первый блок, отсутствие событий в котором отметки ещё не подтвердили
+        unverified_from = last_block + 1 if on_subscribed else await w3.eth.block_number
+
+        async def _mark_idle_head() -> None:
+            nonlocal unverified_from
+            while True:
+                await asyncio.sleep(checkpoint_interval)
+                try:
+                    async with rpc_call("eth_blockNumber"):
+                        mark = await w3.eth.block_number - checkpoint_lag
+                    from_block = max(unverified_from, last_block + 1)
+                    if mark < from_block:
+                        continue
+                    # Логи подписки за эти блоки могут быть ещё в пути: отметка до них сдвинула бы
+                    # чекпоинт мимо недоставленных запросов
+                    async with rpc_call("eth_getLogs"):
+                        logs = await contract.events[event_name].get_logs(from_block=from_block, to_block=mark)
+                except Exception as e:
+                    logger.warning("Cannot verify idle blocks for checkpoint: %s", e)
+                    continue
+                undelivered = [log for log in logs if log["blockNumber"] > last_block]
+                if undelivered:
+                    logger.info("%d %s logs up to block %d not received from the subscription yet, holding the checkpoint",
+                                len(undelivered), event_name, mark)
+                    continue
+                if mark > last_block:
+                    queue.put_nowait(mark)
+                unverified_from = mark + 1
+
+        marker = asyncio.create_task(_mark_idle_head())
+        async for message in w3.socket.process_subscriptions():
+            if message.get("subscription") != sub_id:
+                continue
+            log = message["result"]
+            if log.get("removed"):  # лог отменён реорганизацией цепи
+                continue
+            try:
+                ev = event.process_log(log)
+            except LogTopicError as e:
+                logger.warning("LogTopicError: %s", e)
+                continue
+            block = ev["blockNumber"]
+            if block <= skip_through:
+                continue
+            if block > last_block:
+                queue.put_nowait(block - 1)  # логи предыдущих блоков уже пришли
+                last_block = block
+            queue.put_nowait(ev)
+        raise ConnectionError("Log subscription stream ended")
+    finally:
+        if marker is not None:
+            marker.cancel()
+        try:
+            await w3.eth.unsubscribe(sub_id)
+        except Exception:
+            pass  # соединение уже могло закрыться
+
+
+async def poll_logs(
+    w3,
+    contract,
+    event_name: str,
+    from_block: int,
+    queue: asyncio.Queue,
+    interval: float,
+    max_chunk: int,
+    concurrency: int,
+) -> None:
+    """
+    Опрос для HTTP-провайдера: раз в interval догружает eth_getLogs от последнего
+    просмотренного блока до текущего. В отличие от eth_newFilter, не теряет состояние
+    при перезапуске узла и продолжает ровно с чекпоинта.
+    """
+    next_block = from_block
+    while True:
+        try:
+            async with rpc_call("eth_blockNumber"):
+                head = await w3.eth.block_number
+            if head >= next_block:
+                await backfill_logs(contract, event_name, next_block, head, queue, max_chunk, concurrency)
+                next_block = head + 1
+        except LogTopicError as e:
+            logger.warning("LogTopicError: %s", e)
+        except Exception as exc:
+            logger.error("Listener error: %s", exc, exc_info=True)
+        await asyncio.sleep(interval)
+
+# --- END OF FILE event_source.py ---
@@ -0,0 +1,84 @@
+# --- START OF FILE fulfillment.py ---
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger("fulfillment")
+
+
+class FulfillmentBatcher:
+    """
+    Копит подписанные фулфилменты (assetId, timestamp, priceUint256, signature) и отправляет
+    их одной транзакцией: через window_seconds после первого элемента или сразу при max_size.
+    """
+
+    def __init__(
+        self,
+        submit_batch: Callable[[List[tuple]], Awaitable[asyncio.Future]],
+        window_seconds: float,
+        max_size: int,
+    ):
+        self._submit_batch = submit_batch  # получает элементы, возвращает future квитанции
+        self._window_seconds = window_seconds
+        self._max_size = max(1, max_size)
+        self._pending: List[tuple] = []  # [(item, future)]
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def add(self, asset_id: bytes, ts: int, price_uint: int, signature: bytes) -> asyncio.Future:
+        """Ставит фулфилмент в пакет. Возвращает future с квитанцией пакетной транзакции."""
+        key = (asset_id, ts)
+        for (item, fut) in self._pending:
+            if (item[0], item[1]) == key:
+                return fut  # тот же (assetId, timestamp) уже в пакете
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append(((asset_id, ts, price_uint, signature), fut))
+        if len(self._pending) >= self._max_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        return fut
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._window_seconds)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Batched fulfillment failed: %s", e, exc_info=True)
+
+    async def flush(self) -> None:
+        """Отправляет всё накопленное одной транзакцией."""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        logger.info("Submitting batched fulfillment of %d requests", len(batch))
+        try:
+            receipt_future = await self._submit_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            raise
+
+        def _propagate(done: asyncio.Future) -> None:
+            for _, fut in batch:
+                if fut.done():
+                    continue
+                if done.cancelled():
+                    fut.cancel()
+                elif done.exception() is not None:
+                    fut.set_exception(done.exception())
+                else:
+                    fut.set_result(done.result())
+
+        receipt_future.add_done_callback(_propagate)
+
+# --- END OF FILE fulfillment.py ---
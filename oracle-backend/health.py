@@ -0,0 +1,72 @@
+# --- START OF FILE health.py ---
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from response_cache import dumps
+
+logger = logging.getLogger("health")
+
+
+class HealthMonitor:
+    """
+    Раз в interval собирает состояние сервиса (probe) в снимок и сразу сериализует его.
+    /status отдаёт готовые байты: ни одного RPC-запроса и ни одной модели на запрос,
+    а зависший провайдер ограничен timeout и не задерживает ответ.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[dict]],
+        interval: float,
+        timeout: float,
+        on_refresh: Optional[Callable[[bytes], None]] = None,
+    ):
+        self._probe = probe
+        self._on_refresh = on_refresh  # например, публикация снимка для API-воркеров
+        self._interval = interval
+        self._timeout = timeout
+        self.snapshot: Optional[dict] = None
+        self.body: Optional[bytes] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        try:
+            snapshot = await asyncio.wait_for(self._probe(), timeout=self._timeout)
+        except Exception as e:
+            logger.warning("Health probe failed: %s", e)
+            if self.snapshot is None:
+                return
+            # Оставляем последние данные, но помечаем подключение как потерянное
+            snapshot = dict(self.snapshot)
+            snapshot["event_listener"] = dict(snapshot["event_listener"], web3_connected=False)
+        snapshot["updated_at"] = int(time.time())
+        self.snapshot = snapshot
+        self.body = dumps(snapshot)
+        if self._on_refresh is not None:
+            try:
+                self._on_refresh(self.body)
+            except Exception as e:
+                logger.error("Publishing health snapshot failed: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.refresh()
+
+    async def start(self) -> None:
+        await self.refresh()  # первый снимок готов до того, как сервис начнёт принимать запросы
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+# --- END OF FILE health.py ---
@@ -2,15 +2,23 @@
 
 # --- START OF FILE main.py ---
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import asyncio
+import hmac
+import itertools
+import json
 import logging
+import time
 from pydantic import BaseModel
-from typing import Optional, Union
+from typing import Optional
 
 import config # Наша конфигурация
+import metrics
 import oracle_service # Наш сервис получения цен
+from pair_registry import normalize_pair
+from response_cache import CachedBody, etag_matches
 
 # Настройка базового логгирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -36,6 +44,32 @@ class EventListenerStatus(BaseModel):
      chain_id: Optional[int] # Chain ID can be None if not connected
      contract_address: Optional[str] # Address from config
      signer_address: Optional[str] # Signer address can be None if init failed
+     head_block: Optional[int] = None # Latest block seen by the health monitor
+     checkpoint_block: Optional[int] = None # Last fully processed block
+     lag_blocks: Optional[int] = None # head_block - checkpoint_block
+     requests_in_flight: int = 0 # Price requests with a fulfillment in progress
+     reconnects: int = 0 # Connections rebuilt by the connection supervisor since startup
+     last_reconnect_reason: Optional[str] = None
+
+class StageTiming(BaseModel):
+    """Latency summary of one pipeline stage since startup."""
+    count: int
+    avg_ms: float
+    p50_ms: float # Estimated from histogram buckets
+    p95_ms: float
+    max_ms: float
+
+class RpcEndpointStatus(BaseModel):
+    """Health of one endpoint of the RPC pool (in the order the pool currently prefers them)."""
+    endpoint: str # "<index>:<host>", the URL path is omitted since it may carry an API key
+    up: bool # False while taken out of rotation after consecutive errors
+    latency_ms: float # Moving average
+    consecutive_errors: int
+    requests: int
+    failures: int
+    head_block: Optional[int] = None
+    lag_blocks: Optional[int] = None # Behind the best head seen across the pool
+    pinned: bool = False # Transactions are sent through this endpoint
 
 class StatusResponse(BaseModel):
     """Response model for the /status endpoint."""
@@ -43,6 +77,12 @@ class StatusResponse(BaseModel):
     latest_prices: dict[str, Optional[PriceData]] # Use Optional[PriceData] for values
     binance_polling_interval_seconds: int
     event_listener: EventListenerStatus # Use the nested model
+    price_staleness_seconds: dict[str, Optional[int]] = {} # Age of the latest price per pair
+    tx_in_flight: int = 0 # Sent transactions waiting for a receipt
+    rpc_endpoints: Optional[list[RpcEndpointStatus]] = None # Only with several RPC_URLS
+    push_published: Optional[dict[str, PriceData]] = None # Last price pushed on-chain per pair (PUSH_ENABLED)
+    stage_timings: dict[str, StageTiming] = {} # e.g. "price_fetch", "signing:price", "rpc:eth_getLogs"
+    updated_at: int # When the health monitor took this snapshot
 
 # --- ИЗМЕНЕНО ЗДЕСЬ: Added new Pydantic model ---
 class SignedPriceResponse(BaseModel):
@@ -54,6 +94,69 @@ class SignedPriceResponse(BaseModel):
     signature: str # hex string
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
 
+class SignedPricesRequest(BaseModel):
+    """Request body for POST /signed_prices."""
+    pairs: list[str] # e.g. ["BTC-USDT", "ETH/USDT"]
+    at: Optional[int] = None # Optional unix timestamp, same as ?at= on /signed_price
+
+class SignedPricesResponse(BaseModel):
+    """Response model for the /signed_prices batch endpoint."""
+    prices: list[SignedPriceResponse]
+    missing: list[str] # Tracked pairs without price data (or failed signing)
+
+class BundlePriceProof(BaseModel):
+    """A single pair's price from a signed bundle, with its Merkle inclusion proof."""
+    assetPair: str
+    assetId: str # hex string
+    price: str   # float as string
+    priceUint256: str # uint256 as string
+    timestamp: int
+    proof: list[str] # hex sibling hashes, leaf to root
+
+class PriceBundleResponse(BaseModel):
+    """Response model for /price_bundle: one EIP-712 signature over the Merkle root of all prices."""
+    root: str # hex string
+    signature: str # hex string, EIP-712 PriceBundle(bytes32 root)
+    createdAt: int
+    prices: list[BundlePriceProof]
+
+class TwapResponse(BaseModel):
+    """Response model for /twap/{asset_pair}."""
+    assetPair: str
+    window: int # requested window, seconds
+    start: int # actual window start (aligned to a candle boundary)
+    end: int
+    price: str # TWAP as string float
+    priceUint256: str
+    signedPair: Optional[str] = None # e.g. "BTC/USDT@TWAP300", the 'pair' field of the signed Price struct
+    signature: Optional[str] = None # hex string, EIP-712 Price(pair, price, timestamp=end)
+
+class Candle(BaseModel):
+    """One OHLC candle; price holds between ticks, so empty intervals repeat the last price."""
+    start: int
+    open: float
+    high: float
+    low: float
+    close: float
+    twap: float # time-weighted average within the candle
+    ticks: int
+
+class OhlcResponse(BaseModel):
+    """Response model for /ohlc/{asset_pair}."""
+    assetPair: str
+    resolution: int
+    candles: list[Candle]
+
+class PairRequest(BaseModel):
+    """Request body for POST /admin/pairs."""
+    pair: str # e.g. "SOL-USDT", "SOL/USDT" or "SOLUSDT"
+
+class PairsResponse(BaseModel):
+    """Response model for the /admin/pairs endpoints."""
+    pair: str # canonical form, e.g. "SOL/USDT"
+    assetId: Optional[str] # hex string, None once removed
+    tracked_pairs: list[str]
+
 # --- Жизненный цикл FastAPI приложения ---
 
 price_poller_task: Optional[asyncio.Task] = None # Added type hint
@@ -64,6 +167,15 @@ async def lifespan(app: FastAPI):
     global price_poller_task, event_listener_active
     logger.info("Application startup...")
 
+    if config.ORACLE_ROLE == "api":
+        # Stateless-воркер: ни опроса Binance, ни слушателя, ни транзакций — только чтение общей таблицы
+        logger.info(f"API worker: attaching to shared price table {config.SHARED_PRICES_PATH}...")
+        await oracle_service.attach_shared_prices()
+        yield
+        oracle_service.close_shared_prices()
+        oracle_service.shutdown_signing_service()
+        return
+
     # Инициализация Web3 и контракта (асинхронно)
     logger.info("Initializing Web3 and Contract...")
     try:
@@ -78,11 +190,22 @@ async def lifespan(app: FastAPI):
         # App might not be able to function, consider raising or exiting
         # For now, log the error and let it continue (listener won't start)
 
-    # Запускаем фоновую задачу опроса цен Binance
-    logger.info("Starting price polling task...")
-    price_poller_task = asyncio.create_task(oracle_service.price_polling_loop())
+    if config.ORACLE_ROLE == "ingest":
+        oracle_service.open_shared_prices()
+
+    # Прогреваем историю и последние цены из ленты на диске, чтобы /price не отдавал 404 до первого опроса
+    try:
+        started = time.perf_counter()
+        loaded = oracle_service.warm_start_from_tape()
+        logger.info(f"Warm start: restored {loaded} ticks from price tape in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    except Exception as tape_e:
+        logger.error(f"Failed to warm start from price tape: {tape_e}", exc_info=True)
+
+    # Запускаем фоновую задачу получения цен Binance (опрос или поток)
+    logger.info(f"Starting price source task (mode: {config.PRICE_SOURCE_MODE})...")
+    price_poller_task = asyncio.create_task(oracle_service.price_source_loop())
     app.state.price_poller_task = price_poller_task # Store if needed elsewhere
-    logger.info("Price polling task started.")
+    logger.info("Price source task started.")
 
     # Запускаем прослушивание событий контракта
     # Only if Web3 init was successful and contract object exists
@@ -103,6 +226,16 @@ async def lifespan(app: FastAPI):
          logger.warning("Skipping event listener startup (Web3/Contract init failed or objects missing).")
          event_listener_active = False
 
+    # Надзор за подключением: реконнект при обрыве, перезапуск упавшего слушателя, возврат с HTTP на WebSocket.
+    # Запускается и после неудачной инициализации — тогда подключение поднимет он сам.
+    oracle_service.connection_supervisor.start()
+
+    # Снимок состояния для /status: первый собирается здесь, дальше — фоном
+    try:
+        await oracle_service.health_monitor.start()
+    except Exception as e:
+        logger.error(f"Failed to start health monitor: {e}", exc_info=True)
+
     yield # Application runs here
 
     # Shutdown logic
@@ -117,15 +250,25 @@ async def lifespan(app: FastAPI):
         except asyncio.TimeoutError: logger.warning("Price polling task did not finish cancellation in time.")
         except Exception as e: logger.error(f"Error during price poller task shutdown: {e}", exc_info=True)
 
+    await oracle_service.connection_supervisor.stop()
+
     # Shutdown event listener
-    if event_listener_active: # Only shutdown if it was successfully started
-        logger.info("Attempting to shut down event listener...")
-        try:
-            await oracle_service.event_listener_shutdown() # This is async now
-            logger.info("Event listener shutdown completed.")
-        except Exception as e:
-            logger.error(f"Error during event listener shutdown: {e}", exc_info=True)
+    # (unconditionally: the supervisor may have started it after a failed startup)
+    logger.info("Attempting to shut down event listener...")
+    try:
+        await oracle_service.event_listener_shutdown() # This is async now
+        logger.info("Event listener shutdown completed.")
+    except Exception as e:
+        logger.error(f"Error during event listener shutdown: {e}", exc_info=True)
 
+    await oracle_service.health_monitor.stop()
+    try:
+        await oracle_service.shutdown_tx_pipeline()
+    except Exception as e:
+        logger.error(f"Error during tx pipeline shutdown: {e}", exc_info=True)
+    oracle_service.close_price_tape()
+    oracle_service.close_shared_prices()
+    oracle_service.shutdown_signing_service()
     logger.info("Shutdown complete.")
 
 # Create FastAPI app instance
@@ -138,32 +281,74 @@ async def read_root():
     """Returns a welcome message."""
     return {"message": "Simple Oracle Backend is running"}
 
+def _require_ingest(feature: str) -> None:
+    """API workers only see the latest prices; history, bundles and admin live in the ingest process."""
+    if config.ORACLE_ROLE == "api":
+        raise HTTPException(status_code=501, detail=f"{feature} is not available on API workers (ORACLE_ROLE=api).")
+
+
+_request_log_counter = itertools.count()
+
+
+def _log_request(msg: str, *args) -> None:
+    """Sampled DEBUG log for hot endpoints: one request in REQUEST_LOG_SAMPLE_EVERY, nothing when DEBUG is off."""
+    if logger.isEnabledFor(logging.DEBUG) and next(_request_log_counter) % config.REQUEST_LOG_SAMPLE_EVERY == 0:
+        logger.debug(msg, *args)
+
+
+def _cached_response(body: CachedBody, accept: Optional[str], if_none_match: Optional[str]) -> Response:
+    """Serves pre-serialized bytes (JSON or msgpack by Accept) with an ETag; 304 if the client has this tick."""
+    content, media_type, etag = body.render(accept)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def _resolve_pair(asset_pair: str) -> str:
+    """Maps any accepted spelling (BTC-USDT, BTC/USDT, BTCUSDT) to the tracked pair, or 404."""
+    formatted_pair = oracle_service.pair_registry.resolve(asset_pair)
+    if formatted_pair is None:
+        logger.warning(f"Asset pair '{normalize_pair(asset_pair)}' not tracked.")
+        raise HTTPException(status_code=404, detail=f"Asset pair '{normalize_pair(asset_pair)}' is not tracked.")
+    return formatted_pair
+
+
 @app.get("/price/{asset_pair}", summary="Get Asset Price", tags=["Price Data"], response_model=PriceResponse)
-async def get_price(asset_pair: str):
+async def get_price(
+    asset_pair: str,
+    at: Optional[int] = Query(None, description="Unix timestamp; returns the nearest recorded price instead of the latest"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Returns the latest price data for the specified asset pair.
+    With ?at=<unix timestamp> returns the recorded price closest to that moment.
     Use '-' as separator, e.g., /price/BTC-USDT
+    The body is serialized once per tick; send If-None-Match to get 304 until the price changes,
+    or Accept: application/msgpack for msgpack (when installed).
     """
-    formatted_pair = asset_pair.upper().replace('-', '/')
-    logger.info(f"Received price request for {asset_pair} (formatted: {formatted_pair})")
-
-    if formatted_pair not in config.ASSET_PAIRS:
-         logger.warning(f"Asset pair '{formatted_pair}' not tracked.")
-         raise HTTPException(status_code=404, detail=f"Asset pair '{formatted_pair}' is not tracked.")
+    formatted_pair = _resolve_pair(asset_pair)
+    _log_request("Price request for %s (formatted: %s, at: %s)", asset_pair, formatted_pair, at)
 
-    price_data = oracle_service.get_latest_price_data(formatted_pair)
-
-    if price_data is None:
+    if at is None:
+        body = oracle_service.get_price_body(formatted_pair)
+    else:
+        _require_ingest("Historical lookups (?at=)")
+        price_data = oracle_service.get_price_data_at(formatted_pair, at)
+        if price_data is None:
+            logger.warning(f"No price history for '{formatted_pair}' near timestamp {at}.")
+            raise HTTPException(status_code=404, detail=f"No price data for '{formatted_pair}' near timestamp {at}.")
+        body = CachedBody({
+            "assetPair": formatted_pair,
+            "price": str(price_data["price"]),
+            "timestamp": price_data["timestamp"],
+        })
+
+    if body is None:
         logger.warning(f"Price data for '{formatted_pair}' not available yet.")
         raise HTTPException(status_code=404, detail=f"Price data for '{formatted_pair}' not available yet.")
-
-    response_data = {
-        "assetPair": formatted_pair,
-        "price": str(price_data["price"]),
-        "timestamp": price_data["timestamp"],
-    }
-    logger.info(f"Returning price data for {formatted_pair}: {response_data}")
-    return response_data
+    return _cached_response(body, accept, if_none_match)
 
 
 # --- ИЗМЕНЕНО ЗДЕСЬ: Added new endpoint ---
@@ -173,88 +358,374 @@ async def get_price(asset_pair: str):
     tags=["Price Data"],
     response_model=SignedPriceResponse # Используем новую модель
 )
-async def get_signed_price(asset_pair: str):
+async def get_signed_price(
+    asset_pair: str,
+    at: Optional[int] = Query(None, description="Unix timestamp; signs the nearest recorded price instead of the latest"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Returns the latest price data for the specified asset pair,
     along with an EIP-712 signature from the oracle signer.
+    With ?at=<unix timestamp> the recorded price closest to that moment is signed.
     Use '-' as separator, e.g., /signed_price/BTC-USDT
+    Supports If-None-Match and Accept: application/msgpack like /price.
     """
-    formatted_pair = asset_pair.upper().replace('-', '/')
-    logger.info(f"Received signed price request for {asset_pair} (formatted: {formatted_pair})")
-
-    if formatted_pair not in config.ASSET_PAIRS:
-         logger.warning(f"Asset pair '{formatted_pair}' not tracked.")
-         raise HTTPException(status_code=404, detail=f"Asset pair '{formatted_pair}' not tracked.")
+    formatted_pair = _resolve_pair(asset_pair)
+    _log_request("Signed price request for %s (formatted: %s, at: %s)", asset_pair, formatted_pair, at)
 
-    # Вызываем новую функцию сервиса (она async)
-    signed_data = await oracle_service.get_signed_price_data(formatted_pair)
+    if at is None:
+        # Подпись и байты ответа готовятся один раз на тик
+        body = await oracle_service.get_signed_price_body(formatted_pair)
+    else:
+        _require_ingest("Historical lookups (?at=)")
+        signed_data = await oracle_service.get_signed_price_data(formatted_pair, at=at)
+        body = CachedBody(signed_data) if signed_data is not None else None
 
-    if signed_data is None:
+    if body is None:
         # Log details if possible from service layer, here just report failure
         logger.error(f"Failed to get signed price data for {formatted_pair}.")
         # Use 500 for server-side issue (like signing failure), or 404 if price simply wasn't found?
         # Let's assume 500 if the function was called but failed.
         raise HTTPException(status_code=500, detail=f"Could not retrieve or sign price data for {formatted_pair}.")
 
-    logger.info(f"Returning signed price data for {formatted_pair}")
-    # FastAPI/Pydantic преобразует dict в SignedPriceResponse
-    return signed_data
+    return _cached_response(body, accept, if_none_match)
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
 
 
+async def _signed_prices_response(requested_pairs: list[str], at: Optional[int]) -> dict:
+    """Validates the requested pairs and signs all of them in one batch."""
+    formatted_pairs = []
+    untracked = []
+    for asset_pair in requested_pairs:
+        if not asset_pair.strip():
+            continue
+        formatted_pair = oracle_service.pair_registry.resolve(asset_pair)
+        if formatted_pair is None:
+            untracked.append(normalize_pair(asset_pair))
+        elif formatted_pair not in formatted_pairs:
+            formatted_pairs.append(formatted_pair)
+    if not formatted_pairs and not untracked:
+        raise HTTPException(status_code=400, detail="No asset pairs requested.")
+
+    if untracked:
+        logger.warning(f"Untracked asset pairs requested: {untracked}")
+        raise HTTPException(status_code=404, detail=f"Asset pairs not tracked: {', '.join(untracked)}")
+    if at is not None:
+        _require_ingest("Historical lookups (at)")
+
+    signed = await oracle_service.get_signed_prices_data(formatted_pairs, at=at)
+    return {
+        "prices": [data for data in signed.values() if data is not None],
+        "missing": [pair for pair, data in signed.items() if data is None],
+    }
+
+
+@app.get(
+    "/signed_prices",
+    summary="Get Signed Prices (batch)",
+    tags=["Price Data"],
+    response_model=SignedPricesResponse
+)
+async def get_signed_prices(
+    pairs: str = Query(..., description="Comma-separated asset pairs, e.g. BTC-USDT,ETH-USDT"),
+    at: Optional[int] = Query(None, description="Unix timestamp; signs the nearest recorded prices instead of the latest"),
+):
+    """
+    Returns EIP-712 signed prices for several asset pairs in one response.
+    Pairs without price data are listed in 'missing'.
+    """
+    logger.info(f"Received batch signed price request for {pairs} (at: {at})")
+    return await _signed_prices_response(pairs.split(','), at)
+
+
+@app.post(
+    "/signed_prices",
+    summary="Get Signed Prices (batch, POST)",
+    tags=["Price Data"],
+    response_model=SignedPricesResponse
+)
+async def post_signed_prices(request: SignedPricesRequest):
+    """Same as GET /signed_prices, with the pair list in the request body."""
+    logger.info(f"Received batch signed price request for {len(request.pairs)} pairs (at: {request.at})")
+    return await _signed_prices_response(request.pairs, request.at)
+
+
+@app.get(
+    "/price_bundle",
+    summary="Get Signed Price Bundle",
+    tags=["Price Data"],
+    response_model=PriceBundleResponse
+)
+async def get_price_bundle(
+    pairs: Optional[str] = Query(None, description="Comma-separated asset pairs to include proofs for (default: all)"),
+):
+    """
+    Returns the latest signed price bundle: the Merkle root of all tracked prices,
+    its EIP-712 signature and per-pair inclusion proofs.
+    Verify on-chain with SimpleOracle.fulfillPriceValidationWithProof.
+    """
+    if not config.PRICE_BUNDLE_ENABLED:
+        raise HTTPException(status_code=404, detail="Price bundles are disabled (set PRICE_BUNDLE_ENABLED=true).")
+    _require_ingest("Price bundles")
+    requested = None
+    if pairs:
+        requested = [oracle_service.pair_registry.resolve(p) or normalize_pair(p) for p in pairs.split(',') if p.strip()]
+    bundle = oracle_service.get_price_bundle(requested)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Price bundle not available yet.")
+    return bundle
+
+
+@app.get("/twap/{asset_pair}", summary="Get Time-Weighted Average Price", tags=["Price Data"], response_model=TwapResponse)
+async def get_twap(
+    asset_pair: str,
+    window: int = Query(300, gt=0, description="Averaging window in seconds"),
+    at: Optional[int] = Query(None, description="Unix timestamp the window ends at (default: now)"),
+    signed: bool = Query(False, description="Also return an EIP-712 signature over the TWAP"),
+):
+    """
+    Returns the TWAP of the asset pair over the last `window` seconds (or ending at `at`).
+    Computed in O(1) from incrementally maintained candles; the window start is aligned
+    to the finest candle resolution that covers it.
+    """
+    _require_ingest("TWAP")
+    formatted_pair = _resolve_pair(asset_pair)
+    if window > config.TWAP_MAX_WINDOW_SECONDS:
+        raise HTTPException(status_code=400, detail=f"window must not exceed {config.TWAP_MAX_WINDOW_SECONDS} seconds.")
+    if at is not None and at > time.time():
+        raise HTTPException(status_code=400, detail="at must not be in the future.")
+    if signed:
+        data = await oracle_service.get_signed_twap_data(formatted_pair, window, at)
+    else:
+        data = oracle_service.get_twap_data(formatted_pair, window, at)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"No price data for '{formatted_pair}' in the requested window.")
+    return data
+
+
+@app.get("/ohlc/{asset_pair}", summary="Get OHLC Candles", tags=["Price Data"], response_model=OhlcResponse)
+async def get_ohlc(
+    asset_pair: str,
+    resolution: Optional[int] = Query(None, description="Candle size in seconds (default: the finest configured)"),
+    since: Optional[int] = Query(None, description="Unix timestamp of the first candle (default: the latest candles)"),
+    limit: int = Query(100, gt=0, le=1000, description="Maximum number of candles"),
+):
+    """Returns OHLC candles for the asset pair, maintained incrementally as ticks arrive."""
+    _require_ingest("OHLC candles")
+    formatted_pair = _resolve_pair(asset_pair)
+    resolution = resolution or config.CANDLE_RESOLUTIONS[0]
+    if resolution not in config.CANDLE_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {config.CANDLE_RESOLUTIONS}.")
+    candles = oracle_service.get_candles(formatted_pair, resolution, since, limit)
+    if not candles:
+        raise HTTPException(status_code=404, detail=f"No candles for '{formatted_pair}' yet.")
+    return {"assetPair": formatted_pair, "resolution": resolution, "candles": candles}
+
+
 @app.get("/status", summary="Get Oracle Status", tags=["General"], response_model=StatusResponse)
 async def get_status():
-    """Returns the current status of the oracle backend."""
-    global event_listener_active
-    web3_connected = False
-    chain_id = None
-    signer_address = None
-    contract_address = config.SIMPLE_ORACLE_ADDRESS # Get from config
-
-    # Check connection status safely using await
-    if oracle_service.w3:
+    """
+    Returns the current status of the oracle backend.
+    Served from the health monitor's snapshot (refreshed every HEALTH_REFRESH_SECONDS),
+    so polling this endpoint never reaches the RPC provider.
+    """
+    body = oracle_service.status_body()
+    if body is None:
+        raise HTTPException(status_code=503, detail="Status not available yet.")
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/metrics", summary="Prometheus Metrics", tags=["General"])
+async def get_metrics():
+    """
+    Pipeline counters and latency histograms in the Prometheus text format:
+    Binance fetches, tick staleness, signing, event-to-fulfillment, tx confirmation and RPC calls.
+    """
+    _require_ingest("Pipeline metrics")
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# --- Поток цен: SSE и WebSocket ---
+
+def _resolve_stream_pairs(requested: list[str]) -> tuple[list[str], list[str]]:
+    """Splits requested pair names into (tracked canonical pairs, untracked names)."""
+    tracked, untracked = [], []
+    for asset_pair in requested:
+        if not asset_pair.strip():
+            continue
+        pair = oracle_service.pair_registry.resolve(asset_pair)
+        if pair is None:
+            untracked.append(normalize_pair(asset_pair))
+        elif pair not in tracked:
+            tracked.append(pair)
+    return tracked, untracked
+
+
+async def _snapshot_messages(pairs: list[str], signed: bool) -> list[str]:
+    """Current price of each pair, sent to a new subscriber before live updates."""
+    messages = []
+    for pair in pairs:
+        signed_data = await oracle_service.get_signed_price_data(pair) if signed else None
+        message = oracle_service.price_message(pair, signed_data)
+        if message:
+            messages.append(message)
+    return messages
+
+
+@app.get("/stream/prices", summary="Stream Prices (SSE)", tags=["Streaming"])
+async def stream_prices(
+    pairs: Optional[str] = Query(None, description="Comma-separated asset pairs, e.g. BTC-USDT,ETH-USDT (default: all)"),
+    signed: bool = Query(False, description="Include the EIP-712 signature with every price"),
+):
+    """
+    Server-Sent Events stream of price updates: one 'price' event per tick with the same
+    JSON as /price (or /signed_price with signed=true). Starts with the current prices.
+    A client that falls STREAM_CLIENT_QUEUE_SIZE messages behind gets a 'dropped' event and is disconnected.
+    """
+    selected = None
+    if pairs:
+        selected, untracked = _resolve_stream_pairs(pairs.split(','))
+        if untracked:
+            raise HTTPException(status_code=404, detail=f"Asset pairs not tracked: {', '.join(untracked)}")
+    hub = oracle_service.price_hub
+    try:
+        sub = hub.subscribe(selected, signed)
+    except OverflowError:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers.")
+
+    async def events():
         try:
-            # w3.is_connected() is async with AsyncWeb3
-            web3_connected = await oracle_service.w3.is_connected()
-            if web3_connected:
-                 # w3.eth.chain_id is async
-                 chain_id = await oracle_service.w3.eth.chain_id
-            else: # Ensure chain_id is None if not connected
-                 chain_id = None
-        except Exception as conn_err:
-            logger.error(f"Error checking Web3 connection status: {conn_err}", exc_info=False)
-            web3_connected = False
-            chain_id = None # Ensure chain_id is None on error
-
-    if oracle_service.oracle_signer_account:
-        signer_address = oracle_service.oracle_signer_account.address
-
-    # Prepare latest_prices dictionary for Pydantic validation
-    latest_prices_prepared = {}
-    for pair, data in oracle_service.latest_prices.items():
-        if data:
+            for message in await _snapshot_messages(selected or oracle_service.pair_registry.pairs, signed):
+                yield f"event: price\ndata: {message}\n\n"
+            while True:
+                try:
+                    message = await sub.next(config.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield f"event: price\ndata: {message}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/prices")
+async def ws_prices(websocket: WebSocket):
+    """
+    WebSocket price stream with per-pair subscriptions. Client messages:
+      {"action": "subscribe", "pairs": ["BTC-USDT"], "signed": false}  (no "pairs" key = all pairs)
+      {"action": "unsubscribe", "pairs": ["BTC-USDT"]}  (no "pairs" key = all pairs)
+    "pairs", when present, must be a list of strings; anything else is answered with an error.
+    Server messages are the same price JSON objects as /stream/prices, or {"error": "..."}.
+    """
+    hub = oracle_service.price_hub
+    try:
+        sub = hub.subscribe([], signed=False)  # ничего не шлём, пока клиент не подпишется
+    except OverflowError:
+        await websocket.close(code=1013)  # Try Again Later
+        return
+    await websocket.accept()
+
+    async def _read_commands() -> None:
+        while True:
             try:
-                # Validate and convert data using the PriceData model
-                latest_prices_prepared[pair] = PriceData(price=float(data['price']), timestamp=int(data['timestamp']))
-            except (ValueError, TypeError, KeyError) as e:
-                 logger.error(f"Error processing status price data for {pair}: {data}. Error: {e}")
-                 latest_prices_prepared[pair] = None # Mark as None if invalid
-        else:
-            latest_prices_prepared[pair] = None
-
-    status_data = {
-        "tracked_pairs": config.ASSET_PAIRS,
-        "latest_prices": latest_prices_prepared,
-        "binance_polling_interval_seconds": config.ORACLE_POLL_INTERVAL_SECONDS,
-        "event_listener": {
-             "active": event_listener_active,
-             "web3_connected": web3_connected,
-             "chain_id": chain_id,
-             "contract_address": contract_address, # Use address from config
-             "signer_address": signer_address
-        }
-    }
-    return status_data # Return dict, FastAPI converts using response_model
+                command = json.loads(await websocket.receive_text())
+                action = command["action"]
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_text(json.dumps({"error": "Expected {\"action\": ..., \"pairs\": [...]}"}))
+                continue
+            requested = command.get("pairs")
+            if "pairs" in command and not (isinstance(requested, list) and all(isinstance(p, str) for p in requested)):
+                # Только отсутствие ключа означает "все пары": "BTCUSDT" или null — ошибка клиента
+                await websocket.send_text(json.dumps({"error": "\"pairs\" must be a list of strings"}))
+                continue
+            tracked, untracked = _resolve_stream_pairs(requested) if requested is not None else (None, [])
+            if untracked:
+                await websocket.send_text(json.dumps({"error": f"Asset pairs not tracked: {', '.join(untracked)}"}))
+            if action == "subscribe":
+                sub.signed = bool(command.get("signed", sub.signed))
+                if tracked is None:  # без списка — все пары
+                    new_pairs = oracle_service.pair_registry.pairs if sub.pairs is not None else []
+                    hub.update(sub, None)
+                elif sub.pairs is None:
+                    new_pairs = []  # уже подписан на все пары
+                else:
+                    new_pairs = [p for p in tracked if p not in sub.pairs]
+                    hub.update(sub, sub.pairs | set(tracked))
+                for message in await _snapshot_messages(new_pairs, sub.signed):
+                    try:
+                        sub.queue.put_nowait(message)
+                    except asyncio.QueueFull:
+                        break
+            elif action == "unsubscribe":
+                remaining = set(oracle_service.pair_registry.pairs if sub.pairs is None else sub.pairs)
+                hub.update(sub, set() if tracked is None else remaining - set(tracked))
+            else:
+                await websocket.send_text(json.dumps({"error": f"Unknown action '{action}'"}))
+
+    reader = asyncio.create_task(_read_commands())
+    try:
+        while True:
+            getter = asyncio.ensure_future(sub.next())
+            done, _ = await asyncio.wait({reader, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                reader.result()  # клиент отключился (WebSocketDisconnect) или ошибка чтения
+                return
+            message = getter.result()
+            if message is None:
+                await websocket.close(code=1008, reason="Slow consumer")
+                return
+            await websocket.send_text(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        hub.unsubscribe(sub)
+
+
+def _require_admin(token: Optional[str]) -> None:
+    _require_ingest("Admin API")
+    if not config.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (set ADMIN_API_TOKEN).")
+    if not hmac.compare_digest(token or "", config.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@app.post("/admin/pairs", summary="Track Asset Pair", tags=["Admin"], response_model=PairsResponse)
+async def add_pair(request: PairRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Starts tracking an asset pair without a restart: the pollers pick it up on their next
+    cycle and the Binance stream subscribes to it on the open connection.
+    """
+    _require_admin(x_admin_token)
+    registry = oracle_service.pair_registry
+    try:
+        pair = registry.add(request.pair)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"pair": pair, "assetId": registry.asset_id(pair).hex(), "tracked_pairs": registry.pairs}
+
+
+@app.delete("/admin/pairs/{asset_pair}", summary="Stop Tracking Asset Pair", tags=["Admin"], response_model=PairsResponse)
+async def remove_pair(asset_pair: str, x_admin_token: Optional[str] = Header(None)):
+    """Stops tracking an asset pair and drops its cached prices. Use '-' as separator, e.g. /admin/pairs/SOL-USDT"""
+    _require_admin(x_admin_token)
+    registry = oracle_service.pair_registry
+    pair = registry.remove(asset_pair)
+    if pair is None:
+        raise HTTPException(status_code=404, detail=f"Asset pair '{normalize_pair(asset_pair)}' is not tracked.")
+    return {"pair": pair, "assetId": None, "tracked_pairs": registry.pairs}
+
 
 # --- Запуск сервера (если файл запускается напрямую) ---
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+# --- START OF FILE merkle.py ---
+
+from typing import List
+
+from eth_abi import encode
+from eth_utils import keccak
+
+
+def leaf_hash(asset_id: bytes, ts: int, price_uint: int) -> bytes:
+    """
+    Лист дерева цен, как в SimpleOracle.fulfillPriceValidationWithProof:
+    keccak256(bytes.concat(keccak256(abi.encode(assetId, timestamp, price)))).
+    """
+    return keccak(keccak(encode(["bytes32", "uint256", "uint256"], [asset_id, ts, price_uint])))
+
+
+def _hash_pair(a: bytes, b: bytes) -> bytes:
+    """Коммутативный хэш пары узлов (как Hashes.commutativeKeccak256 в OpenZeppelin)."""
+    return keccak(a + b) if a < b else keccak(b + a)
+
+
+class MerkleTree:
+    """Дерево Меркла, совместимое с OpenZeppelin MerkleProof (сортированные пары)."""
+
+    def __init__(self, leaves: List[bytes]):
+        if not leaves:
+            raise ValueError("MerkleTree needs at least one leaf")
+        self.layers: List[List[bytes]] = [list(leaves)]
+        while len(self.layers[-1]) > 1:
+            level = self.layers[-1]
+            parents = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])  # узел без пары поднимается на уровень выше как есть
+            self.layers.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        return self.layers[-1][0]
+
+    def proof(self, index: int) -> List[bytes]:
+        """Соседние узлы от листа до корня."""
+        proof = []
+        for level in self.layers[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+            index //= 2
+        return proof
+
+
+def verify(proof: List[bytes], root: bytes, leaf: bytes) -> bool:
+    computed = leaf
+    for node in proof:
+        computed = _hash_pair(computed, node)
+    return computed == root
+
+# --- END OF FILE merkle.py ---
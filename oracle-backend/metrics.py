@@ -0,0 +1,265 @@
+# --- START OF FILE metrics.py ---
+
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Метрики конвейера в формате Prometheus без внешних зависимостей. Всё живёт в одном
+# event loop, поэтому обновление — это инкремент в словаре без блокировок;
+# текст для /metrics собирается только при скрейпе.
+
+# Секунды: от миллисекунд (подпись, кэш) до минут (подтверждение транзакции)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Значение, которое задаётся set() или считается функцией в момент скрейпа."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+        self._collect: Optional[Callable[[], Dict[tuple, float]]] = None
+
+    def set(self, value: float, *label_values) -> None:
+        self._values[label_values] = value
+
+    def set_collector(self, collect: Callable[[], Dict[tuple, float]]) -> None:
+        self._collect = collect
+
+    def _samples(self) -> List[str]:
+        values = self._collect() if self._collect is not None else self._values
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+            if value is not None
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)  # последняя ячейка — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, _HistogramSeries] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = _HistogramSeries(len(self.buckets))
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+        if value > series.max:
+            series.max = value
+
+    def since(self, started: float, *label_values) -> None:
+        """observe() для интервала от started (time.perf_counter()) до текущего момента."""
+        self.observe(time.perf_counter() - started, *label_values)
+
+    def quantile(self, q: float, *label_values) -> Optional[float]:
+        """Оценка квантиля по корзинам (линейная интерполяция, как histogram_quantile в Prometheus)."""
+        series = self._series.get(label_values)
+        if series is None or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        lower = 0.0
+        for index, count in enumerate(series.counts):
+            upper = self.buckets[index] if index < len(self.buckets) else series.max
+            if count and seen + count >= rank:
+                return min(series.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = upper
+        return series.max
+
+    def summary(self, *label_values) -> Optional[dict]:
+        """Сводка в миллисекундах для /status."""
+        series = self._series.get(label_values)
+        if series is None or not series.count:
+            return None
+        return {
+            "count": series.count,
+            "avg_ms": round(series.sum / series.count * 1000, 3),
+            "p50_ms": round(self.quantile(0.5, *label_values) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95, *label_values) * 1000, 3),
+            "max_ms": round(series.max * 1000, 3),
+        }
+
+    def label_sets(self) -> List[tuple]:
+        return list(self._series)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0
+            for index, count in enumerate(series.counts):
+                cumulative += count
+                le = _format_value(self.buckets[index]) if index < len(self.buckets) else "+Inf"
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        """Текстовый формат Prometheus 0.0.4."""
+        return ("\n".join(metric.render() for metric in self._metrics) + "\n").encode()
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+# --- Метрики конвейера оракула ---
+
+PRICE_FETCH_SECONDS = histogram("oracle_price_fetch_seconds", "Latency of one price poll across all sources and pairs")
+PRICE_FETCH_ERRORS = counter("oracle_price_fetch_errors_total", "Failed price polls")
+TICKS = counter("oracle_ticks_total", "Price ticks ingested")
+TICK_STALENESS = gauge("oracle_tick_staleness_seconds", "Age of the latest price per pair", ["pair"])
+SOURCE_FETCH_SECONDS = histogram("oracle_source_fetch_seconds", "Latency of one price source fetch", ["source"])
+SOURCE_ERRORS = counter("oracle_source_errors_total", "Failed or timed out price source fetches", ["source"])
+SOURCE_OUTLIERS = counter("oracle_source_outliers_total", "Quotes rejected as outliers", ["source"])
+AGGREGATION_SECONDS = histogram("oracle_aggregation_seconds", "Aggregating all sources and pairs of one tick")
+SIGNING_SECONDS = histogram("oracle_signing_seconds", "EIP-712 signing latency", ["kind"])
+EVENTS = counter("oracle_events_total", "Price request events by outcome", ["outcome"])
+EVENT_HANDLING_SECONDS = histogram("oracle_event_handling_seconds", "From a price request event to its fulfillment tx being sent")
+EVENT_TO_FULFILLMENT_SECONDS = histogram("oracle_event_to_fulfillment_seconds", "From a price request event to the fulfillment receipt")
+TX_CONFIRMATION_SECONDS = histogram("oracle_tx_confirmation_seconds", "From sending a transaction to its receipt")
+TXS = counter("oracle_transactions_total", "Transactions by outcome", ["outcome"])
+RPC_SECONDS = histogram("oracle_rpc_seconds", "JSON-RPC call latency", ["method"])
+RPC_ERRORS = counter("oracle_rpc_errors_total", "Failed JSON-RPC calls", ["method"])
+RPC_ENDPOINT_SECONDS = histogram("oracle_rpc_endpoint_seconds", "JSON-RPC latency per pool endpoint", ["endpoint"])
+RPC_ENDPOINT_ERRORS = counter("oracle_rpc_endpoint_errors_total", "Failed JSON-RPC calls per pool endpoint", ["endpoint"])
+RPC_HEDGES = counter("oracle_rpc_hedges_total", "Reads re-sent to a second endpoint after RPC_HEDGE_AFTER_SECONDS", ["method"])
+RECONNECTS = counter("oracle_reconnects_total", "Web3 connections rebuilt by the connection supervisor")
+PUSH_UPDATES = counter("oracle_push_updates_total", "Prices pushed on-chain by trigger", ["reason"])
+PUSH_AGE = gauge("oracle_push_age_seconds", "Age of the latest price pushed on-chain per pair", ["pair"])
+
+# Стадии, которые попадают в /status (имя → гистограмма)
+STAGES = {
+    "price_fetch": PRICE_FETCH_SECONDS,
+    "source_fetch": SOURCE_FETCH_SECONDS,
+    "aggregation": AGGREGATION_SECONDS,
+    "signing": SIGNING_SECONDS,
+    "event_handling": EVENT_HANDLING_SECONDS,
+    "event_to_fulfillment": EVENT_TO_FULFILLMENT_SECONDS,
+    "tx_confirmation": TX_CONFIRMATION_SECONDS,
+    "rpc": RPC_SECONDS,
+}
+
+
+def stage_timings() -> Dict[str, dict]:
+    """Сводки всех стадий: 'stage' или 'stage:label' → count/avg/p50/p95/max в мс."""
+    timings = {}
+    for stage, histogram_ in STAGES.items():
+        for labels in histogram_.label_sets():
+            summary = histogram_.summary(*labels)
+            if summary is not None:
+                timings[":".join((stage,) + tuple(str(v) for v in labels))] = summary
+    return timings
+
+
+@asynccontextmanager
+async def rpc_call(method: str, expected: Tuple[type, ...] = ()):
+    """
+    Замеряет RPC-вызов: латентность в oracle_rpc_seconds, исключения — в oracle_rpc_errors_total.
+    expected — исключения, которые означают штатный ответ (например, TransactionNotFound).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except expected:
+        raise
+    except Exception:
+        RPC_ERRORS.inc(method)
+        raise
+    finally:
+        RPC_SECONDS.since(started, method)
+
+# --- END OF FILE metrics.py ---
@@ -8,29 +8,36 @@ import json # Added for ABI loading resilience
 import logging # Added for better logging
 
 # --- Imports for web3.py v7 ---
-from web3 import AsyncWeb3
-# --- ИЗМЕНЕНО ЗДЕСЬ: Added AsyncHTTPProvider import ---
-from web3 import AsyncWeb3, AsyncHTTPProvider            # <- ✔ правильный импорт
-
-# --- КОНЕЦ ИЗМЕНЕНИЯ ---
+from web3 import AsyncWeb3, AsyncHTTPProvider
 from web3.providers.persistent import WebSocketProvider # Already present in user's file for WS
 from web3.middleware import ExtraDataToPOAMiddleware   # renamed PoA helper
 
-# --- ИЗМЕНЕНО ЗДЕСЬ: SyncWeb3 for static helpers, AsyncWeb3 is aliased as Web3 by user further down ---
-from web3 import Web3 as SyncWeb3 # Import the synchronous Web3 for static helpers
-# --- КОНЕЦ ИЗМЕНЕНИЯ ---
-
-from web3.exceptions import LogTopicError, MismatchedABI, ContractLogicError
 from eth_account import Account # Для работы с приватным ключом
-# --- ИЗМЕНЕНО ЗДЕСЬ: encode_typed_data import was present in user's new file ---
-from eth_account.messages import encode_typed_data      # eth-account ≥ 0.13
-# --- КОНЕЦ ИЗМЕНЕНИЯ ---
 
 
-from binance import AsyncClient # Будем использовать асинхронный клиент
-from binance.exceptions import BinanceAPIException
+import websockets # Поток цен Binance (PRICE_SOURCE_MODE=stream)
 import config # Импортируем нашу конфигурацию
-from typing import Union, Optional, Dict # Added Dict for type hint
+import signing
+import merkle
+from price_history import OVERWRITTEN, PriceHistory
+from candles import CandleStore
+from price_tape import PriceTape
+from tx_pipeline import TxPipeline
+from fulfillment import FulfillmentBatcher
+from push_publisher import PushPublisher
+from rpc_pool import RpcPoolProvider
+from connection_supervisor import ConnectionSupervisor
+from pair_registry import PairRegistry
+from health import HealthMonitor
+from broadcast import BroadcastHub
+import shared_prices
+import event_source
+import price_sources
+from aggregation import PriceAggregator
+import metrics
+from event_dispatcher import EventDispatcher
+from response_cache import CachedBody, dumps
+from typing import Optional, Dict # Added Dict for type hint
 
 # Setup logger
 # --- ИЗМЕНЕНО ЗДЕСЬ: Logger name matches user's new file ---
@@ -43,75 +50,177 @@ if not logger.hasHandlers():
 # --- ИЗМЕНЕНО ЗДЕСЬ: Type hint for latest_prices matches user's new file ---
 latest_prices: Dict[str, Optional[dict]] = {}
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+# История тиков по парам для запросов цены на прошлый момент
+price_history = PriceHistory(config.PRICE_HISTORY_SIZE)
+# Свечи OHLC и интеграл цены для TWAP, обновляются на каждом тике
+candle_store = CandleStore(config.CANDLE_RESOLUTIONS, config.CANDLE_HISTORY_SIZE)
+# Лента тиков на диске; None, если отключена или каталог недоступен
+price_tape: Optional[PriceTape] = None
+if config.PRICE_TAPE_ENABLED:
+    try:
+        price_tape = PriceTape(
+            config.PRICE_TAPE_DIR,
+            config.PRICE_TAPE_SEGMENT_RECORDS,
+            config.PRICE_TAPE_MAX_SEGMENTS,
+        )
+    except OSError as e:
+        logger.error("Price tape disabled, cannot open %s: %s", config.PRICE_TAPE_DIR, e)
 w3: Optional[AsyncWeb3] = None # Explicitly AsyncWeb3
 simple_oracle_contract = None
+# Пул RPC-узлов (если в RPC_URLS больше одного URL); иначе w3 работает через один провайдер
+rpc_pool: Optional[RpcPoolProvider] = None
 # --- ИЗМЕНЕНО ЗДЕСЬ: Renamed variable to match instructions (already done in user file) ---
 # oracle_contract = None -> simple_oracle_contract
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
 # event_filter = None # Not used in the new file from user, can be removed if not needed
 oracle_signer_account: Optional[Account] = None
+signing_service: Optional[signing.SigningService] = None
+tx_pipeline: Optional[TxPipeline] = None
+fulfillment_batcher: Optional[FulfillmentBatcher] = None
+# Режим push (PUSH_ENABLED): публикация цен в контракт по отклонению/heartbeat без запросов
+push_publisher: Optional[PushPublisher] = None
+# Кэш EIP-712: chain_id и domain separator считаются при (пере)подключении, а не на каждую подпись
+_chain_id: Optional[int] = None
+_domain_separator: Optional[bytes] = None
+# Подписи, готовые к выдаче в /signed_price: pair → ((timestamp, price), CachedBody). Новый тик вытесняет старый
+_signed_price_cache: Dict[str, tuple] = {}
+# Готовые байты ответа /price: pair → ((timestamp, price), CachedBody)
+_price_body_cache: Dict[str, tuple] = {}
+# Последний подписанный пакет цен (PRICE_BUNDLE_ENABLED): корень дерева Меркла, подпись, доказательства
+_price_bundle: Optional[dict] = None
+_price_bundle_task: Optional[asyncio.Task] = None
+_price_bundle_dirty = False
 _log_loop_task: Optional[asyncio.Task] = None
+# Сведение котировок нескольких площадок в одну цену на пару (PRICE_SOURCES, PRICE_AGGREGATION)
+price_aggregator = PriceAggregator(
+    config.PRICE_AGGREGATION, config.PRICE_MAX_DEVIATION, config.PRICE_MIN_SOURCES, config.PRICE_TRIM_FRACTION
+)
+# Поток цен для SSE/WebSocket: каждый тик раздаётся всем подписчикам пары
+price_hub = BroadcastHub(config.STREAM_CLIENT_QUEUE_SIZE, config.STREAM_MAX_SUBSCRIBERS)
+# Таблица цен в разделяемой памяти: ORACLE_ROLE=ingest пишет в неё, ORACLE_ROLE=api читает из неё
+shared_table: Optional[shared_prices.SharedPriceTable] = None
+_shared_follow_task: Optional[asyncio.Task] = None
+event_dispatcher: Optional[EventDispatcher] = None
+# Последний блок, события которого полностью обработаны: с него слушатель продолжает после рестарта
+log_checkpoint = event_source.BlockCheckpoint(config.LOG_CHECKPOINT_PATH)
 
 # --- ИЗМЕНЕНО ЗДЕСЬ: Function signature matches user's new file ---
 def get_latest_price_data(asset_pair: str) -> Optional[dict]:
 # --- КОНЕЦ ИЗМЕНЕНИЯ ---
     """Возвращает последние данные о цене для API."""
+    if shared_table is not None and not shared_table.writer:
+        entry = shared_table.read(asset_pair)  # API-воркер: цена из таблицы ingest-процесса
+        return {"price": entry[1], "timestamp": entry[0]} if entry else None
     return latest_prices.get(asset_pair)
 
-async def init_web3_and_contract() -> None: # Added return type hint for clarity
-    """Асинхронная инициализация Web3 подключения и экземпляра контракта SimpleOracle (v7 compatible)."""
-    global w3, simple_oracle_contract, oracle_signer_account
+def get_price_body(asset_pair: str) -> Optional[CachedBody]:
+    """Сериализованный ответ /price для последней цены: собирается один раз на тик."""
+    data = get_latest_price_data(asset_pair)
+    if data is None:
+        return None
+    tick_key = (data["timestamp"], data["price"])
+    cached = _price_body_cache.get(asset_pair)
+    if cached and cached[0] == tick_key:
+        return cached[1]
+    body = CachedBody({"assetPair": asset_pair, "price": str(data["price"]), "timestamp": data["timestamp"]})
+    _price_body_cache[asset_pair] = (tick_key, body)
+    return body
 
+def get_price_data_at(asset_pair: str, timestamp: int) -> Optional[dict]:
+    """Возвращает ближайшую к timestamp цену из истории (в пределах PRICE_LOOKUP_TOLERANCE_SECONDS)."""
+    return price_history.nearest(asset_pair, timestamp, config.PRICE_LOOKUP_TOLERANCE_SECONDS)
 
-    logger.info("Initializing Web3 connection...")
-    if not config.SEPOLIA_RPC_URL:
-        # --- ИЗМЕНЕНО ЗДЕСЬ: Error message matches user's new file ---
-        # logger.error("SEPOLIA_RPC_URL is not set in the environment variables.")
-        # raise ValueError("SEPOLIA_RPC_URL is not configured.")
-        raise ValueError("SEPOLIA_RPC_URL missing in .env")
-        # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+def twap_label(asset_pair: str, window: int) -> str:
+    """Строка pair в подписи TWAP: 'BTC/USDT@TWAP300' — не спутать со спотовой ценой пары."""
+    return f"{asset_pair}@TWAP{window}"
 
-    # --- ИЗМЕНЕНО ЗДЕСЬ: ws_rpc_url defined and used correctly ---
-    ws_rpc_url = (
+def get_twap_data(asset_pair: str, window: int, at: Optional[int] = None) -> Optional[dict]:
+    """TWAP за window секунд до at (по умолчанию — до текущего момента), O(1) по свечам."""
+    twap = candle_store.twap(asset_pair, window, int(time.time()) if at is None else at)
+    if twap is None:
+        return None
+    start, end, price = twap
+    return {
+        "assetPair": asset_pair,
+        "window": window,
+        "start": start,
+        "end": end,
+        "price": str(price),
+        "priceUint256": str(signing.price_to_uint(price)),
+    }
+
+async def get_signed_twap_data(asset_pair: str, window: int, at: Optional[int] = None) -> Optional[dict]:
+    """
+    TWAP с подписью EIP-712 того же типа Price(pair, price, timestamp), что и в _sign_price:
+    pair — twap_label(пара, окно), timestamp — конец окна.
+    """
+    data = get_twap_data(asset_pair, window, at)
+    if data is None:
+        return None
+    if not oracle_signer_account or not signing_service or (_domain_separator is None and not w3):
+        logger.error("Web3 or Signer Account not initialized, cannot sign TWAP.")
+        return None
+    label = twap_label(asset_pair, window)
+    try:
+        signature = await _sign_price(label, float(data["price"]), data["end"])
+    except Exception as e:
+        logger.error(f"Failed to sign TWAP for {asset_pair}: {e}", exc_info=True)
+        return None
+    return dict(data, signedPair=label, signature=signature.hex())
+
+def get_candles(asset_pair: str, resolution: int, since: Optional[int], limit: int) -> Optional[list]:
+    """Свечи OHLC (с TWAP каждой свечи); None — разрешение не настроено или по паре нет данных."""
+    return candle_store.candles(asset_pair, resolution, since, limit, int(time.time()))
+
+def _ws_rpc_url() -> str:
+    return (
         config.SEPOLIA_RPC_URL.replace("https://", "wss://", 1)
         .replace("http://", "ws://", 1)
     )
+
+async def _connect_websocket(ws_rpc_url: str) -> AsyncWeb3:
+    """Подключение WebSocketProvider (нужен для eth_subscribe)."""
+    # --- ИЗМЕНЕНО ЗДЕСЬ: Explicitly call provider.connect() for WebSocketProvider in v7 ---
+    logger.info("Attempting WS provider %s", ws_rpc_url)
+    provider = WebSocketProvider(
+        ws_rpc_url,
+        request_timeout=120, 
+        websocket_kwargs={
+            "open_timeout": 120, 
+            "close_timeout": 60,
+            "ping_interval": 30, 
+            "ping_timeout": 60, 
+        },
+    )
+    logger.info("WebSocketProvider instance created. Explicitly connecting...")
+    await provider.connect() # <--- ЭТА СТРОКА УСТРАНЯЕТ ОШИБКУ ProviderConnectionError
+
+    w3 = AsyncWeb3(provider)
+    logger.info("Web3 instance created with WebSocketProvider.")
+    
+    # Теперь проверка is_connected() должна быть более надежной, или chain_id
+    if not await w3.is_connected(): # Проверяем после connect()
+         # Если connect() не вызвал ошибку, но is_connected все равно False, это странно
+         logger.warning("WS provider.connect() succeeded but w3.is_connected() is False. Attempting chain_id.")
+         chain_id_val = await w3.eth.chain_id
+         logger.info("WebSocket chain_id check successful. Chain ID: %s", chain_id_val)
+    else:
+        chain_id_val = await w3.eth.chain_id
+        logger.info("WebSocket connected successfully. Chain ID: %s", chain_id_val)
+
+    # Инъекция PoA middleware
+    logger.info("Injecting PoA middleware...") 
+    w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    logger.info("PoA middleware injected.")
     # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+    return w3
+
+async def _connect_single_provider() -> AsyncWeb3:
+    """Одиночный узел SEPOLIA_RPC_URL: сначала WebSocket, при неудаче — HTTP."""
     # --- Connection logic matches user's new file (WS preferred, HTTP fallback) ---
+    ws_rpc_url = _ws_rpc_url()
     try:
-        # --- ИЗМЕНЕНО ЗДЕСЬ: Explicitly call provider.connect() for WebSocketProvider in v7 ---
-        logger.info("Attempting WS provider %s", ws_rpc_url)
-        provider = WebSocketProvider(
-            ws_rpc_url,
-            request_timeout=120, 
-            websocket_kwargs={
-                "open_timeout": 120, 
-                "close_timeout": 60,
-                "ping_interval": 30, 
-                "ping_timeout": 60, 
-            },
-        )
-        logger.info("WebSocketProvider instance created. Explicitly connecting...")
-        await provider.connect() # <--- ЭТА СТРОКА УСТРАНЯЕТ ОШИБКУ ProviderConnectionError
-
-        w3 = AsyncWeb3(provider)
-        logger.info("Web3 instance created with WebSocketProvider.")
-        
-        # Теперь проверка is_connected() должна быть более надежной, или chain_id
-        if not await w3.is_connected(): # Проверяем после connect()
-             # Если connect() не вызвал ошибку, но is_connected все равно False, это странно
-             logger.warning("WS provider.connect() succeeded but w3.is_connected() is False. Attempting chain_id.")
-             chain_id_val = await w3.eth.chain_id
-             logger.info("WebSocket chain_id check successful. Chain ID: %s", chain_id_val)
-        else:
-            chain_id_val = await w3.eth.chain_id
-            logger.info("WebSocket connected successfully. Chain ID: %s", chain_id_val)
-
-        # Инъекция PoA middleware
-        logger.info("Injecting PoA middleware...") 
-        w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
-        logger.info("PoA middleware injected.")
-        # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+        w3 = await _connect_websocket(ws_rpc_url)
     except asyncio.TimeoutError: # This specific exception for timeouts
          logger.error(f"Timeout connecting to WebSocket: {ws_rpc_url}", exc_info=True)
          logger.warning("WS failed due to Timeout. Falling back to AsyncHTTPProvider…")
@@ -135,8 +244,55 @@ async def init_web3_and_contract() -> None: # Added return type hint for clarity
             raise ConnectionError(f"Both WS ({type(e).__name__}) and HTTP endpoints unreachable")
         logger.info("HTTP connected (no event subscriptions after WS Error).")
         w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    return w3
+
+async def _connect_rpc_pool() -> AsyncWeb3:
+    """Пул узлов RPC_URLS за одним провайдером (HTTP; слушатель событий работает опросом eth_getLogs)."""
+    global rpc_pool
+    if rpc_pool is None:
+        rpc_pool = RpcPoolProvider(
+            config.RPC_URLS,
+            timeout=config.RPC_REQUEST_TIMEOUT_SECONDS,
+            hedge_after=config.RPC_HEDGE_AFTER_SECONDS,
+            max_hedges=config.RPC_MAX_HEDGES,
+            max_errors=config.RPC_ENDPOINT_MAX_ERRORS,
+            max_backoff=config.RPC_MAX_BACKOFF_SECONDS,
+            max_lag=config.RPC_MAX_LAG_BLOCKS,
+            health_interval=config.RPC_HEALTH_CHECK_SECONDS,
+        )
+    logger.info("Connecting to %s...", rpc_pool)
+    pool_w3 = AsyncWeb3(rpc_pool)
+    if not await pool_w3.is_connected():
+        raise ConnectionError(f"None of {len(rpc_pool.endpoints)} RPC endpoints is reachable")
+    pool_w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    rpc_pool.start()
+    for endpoint in rpc_pool.snapshot():
+        logger.info("  RPC endpoint %s: %s, head %s", endpoint["endpoint"], "up" if endpoint["up"] else "down", endpoint["head_block"])
+    return pool_w3
+
+async def init_web3_and_contract(connected: Optional[AsyncWeb3] = None) -> None: # Added return type hint for clarity
+    """
+    Асинхронная инициализация Web3 подключения и экземпляра контракта SimpleOracle (v7 compatible).
+    connected — уже подключённый w3 (переход на WebSocket), иначе подключение создаётся заново.
+    """
+    global w3, simple_oracle_contract, oracle_signer_account, signing_service, tx_pipeline, fulfillment_batcher, push_publisher
 
 
+    logger.info("Initializing Web3 connection...")
+    if not config.SEPOLIA_RPC_URL:
+        # --- ИЗМЕНЕНО ЗДЕСЬ: Error message matches user's new file ---
+        # logger.error("SEPOLIA_RPC_URL is not set in the environment variables.")
+        # raise ValueError("SEPOLIA_RPC_URL is not configured.")
+        raise ValueError("SEPOLIA_RPC_URL missing in .env")
+        # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+
+    if connected is not None:
+        w3 = connected
+    elif len(config.RPC_URLS) > 1:
+        w3 = await _connect_rpc_pool()
+    else:
+        w3 = await _connect_single_provider()
+
     # Contract and signer setup matches user's new file
     # This part only runs if w3 was successfully initialized by either WS or HTTP
     abi = config.get_contract_abi("SimpleOracle")
@@ -145,256 +301,809 @@ async def init_web3_and_contract() -> None: # Added return type hint for clarity
         abi=abi,
     )
     oracle_signer_account = Account.from_key(config.TESTNET_PRIVATE_KEY)
+    if signing_service is None:
+        signing_service = signing.SigningService(
+            oracle_signer_account.key, config.SIGNER_PROCESSES, config.SIGNER_MAX_BATCH
+        )
     logger.info("Signer ready: %s", oracle_signer_account.address)
+    await _refresh_eip712_domain()
+
+    if tx_pipeline is None:
+        tx_pipeline = TxPipeline(
+            w3,
+            oracle_signer_account.address,
+            signing_service,
+            chain_id=_chain_id,
+            max_in_flight=config.TX_MAX_IN_FLIGHT,
+            receipt_poll_seconds=config.TX_RECEIPT_POLL_SECONDS,
+            stuck_after_seconds=config.TX_STUCK_AFTER_SECONDS,
+            fee_bump_percent=config.TX_FEE_BUMP_PERCENT,
+            max_bumps=config.TX_MAX_BUMPS,
+            fee_refresh_seconds=config.TX_FEE_REFRESH_SECONDS,
+        )
+    else:
+        tx_pipeline.rebind(w3, _chain_id)
+    await tx_pipeline.start()
 
+    # Артефакт собирается Hardhat из contracts/SimpleOracle.sol; старый артефакт — старый контракт без пакетов
+    batch_supported = any(entry.get("name") == "fulfillPriceValidationBatch" for entry in abi)
+    if (config.FULFILLMENT_BATCH_ENABLED or config.PUSH_ENABLED) and not batch_supported:
+        logger.error("SimpleOracle ABI has no fulfillPriceValidationBatch: batched fulfillment and push are disabled. "
+                     "Rebuild the artifacts (npx hardhat compile) and redeploy the contract.")
 
-# --- Binance Functions ---
+    if config.FULFILLMENT_BATCH_ENABLED and batch_supported and fulfillment_batcher is None:
+        fulfillment_batcher = FulfillmentBatcher(
+            _submit_fulfillment_batch,
+            window_seconds=config.FULFILLMENT_BATCH_WINDOW_SECONDS,
+            max_size=config.FULFILLMENT_BATCH_MAX_SIZE,
+        )
+
+    if config.PUSH_ENABLED and batch_supported and push_publisher is None:
+        push_publisher = PushPublisher(
+            _prepare_push_item,
+            _submit_fulfillment_batch,
+            deviation=config.PUSH_DEVIATION_THRESHOLD,
+            heartbeat=config.PUSH_HEARTBEAT_SECONDS,
+            max_batch=config.PUSH_MAX_BATCH_SIZE,
+            on_published=lambda pair, reason: metrics.PUSH_UPDATES.inc(reason),
+        )
+
+
+async def _refresh_eip712_domain() -> None:
+    """Запрашивает chain_id и пересчитывает EIP-712 domain separator (при каждом подключении)."""
+    global _chain_id, _domain_separator
+    _chain_id = await w3.eth.chain_id
+    _domain_separator = signing.domain_separator(_chain_id, config.SIMPLE_ORACLE_ADDRESS)
+    logger.info("EIP-712 domain cached: chainId=%s, separator=%s", _chain_id, _domain_separator.hex())
+    if shared_table is not None and shared_table.writer:
+        shared_table.set_chain_id(_chain_id)
+
+
+# --- Price Sources (Binance и другие площадки) ---
 def _sym(pair: str) -> str: # Helper _sym matches user's new file
     return pair.replace("/", "")
 
-async def _fetch_price(client: AsyncClient, pair: str) -> Optional[float]: # Signature and content matches user's new file
+async def _fetch_source(source: price_sources.PriceSource, pairs: list) -> Optional[dict]:
+    """Котировки одной площадки; None, если она не ответила за PRICE_SOURCE_TIMEOUT_SECONDS."""
+    started = time.perf_counter()
     try:
-        ticker = await client.get_symbol_ticker(symbol=_sym(pair))
-        return float(ticker["price"])
-    except BinanceAPIException as e:
-        logger.warning("Binance error for %s: %s", pair, e)
+        quotes = await asyncio.wait_for(source.fetch(pairs), timeout=config.PRICE_SOURCE_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        metrics.SOURCE_ERRORS.inc(source.name)
+        logger.warning("Price source %s failed: %s", source.name, e or type(e).__name__)
         return None
+    metrics.SOURCE_FETCH_SECONDS.since(started, source.name)
+    return quotes
+
+async def _fetch_prices(sources: list, pairs: list) -> Dict[str, float]:
+    """Опрашивает все площадки параллельно и сводит котировки в одну цену на пару."""
+    quotes = await asyncio.gather(*[_fetch_source(source, pairs) for source in sources])
+    started = time.perf_counter()
+    prices, result = price_aggregator.combine(quotes, pairs)
+    metrics.AGGREGATION_SECONDS.since(started)
+    if result.rejected.any():
+        for row, col in zip(*result.rejected.nonzero()):
+            metrics.SOURCE_OUTLIERS.inc(sources[row].name)
+            logger.warning("Rejected outlier %s %s = %f", sources[row].name, pairs[col], quotes[row][pairs[col]][0])
+    return prices
+
+def _record_tick(pair: str, price: float, ts: int) -> bool:
+    """Сохраняет новый тик цены для пары. False — тик старше последнего и отброшен."""
+    recorded = price_history.record(pair, ts, price)
+    if not recorded:
+        return False  # опоздавший тик не должен откатывать /price и общую таблицу
+    latest_prices[pair] = {"price": price, "timestamp": ts}
+    _price_body_cache.pop(pair, None)
+    if shared_table is not None and shared_table.writer:
+        shared_table.write(pair, ts, price)
+    candle_store.record(pair, ts, price)
+    if price_tape is not None:
+        try:
+            # Тики одной секунды (bookTicker) заменяют запись, а не съедают ретеншн ленты
+            price_tape.append(pair, ts, price, overwrite=recorded == OVERWRITTEN)
+        except (OSError, ValueError) as e:
+            logger.error("Price tape write failed for %s: %s", pair, e)
+    return True
+
+async def _ingest_ticks(ticks: list) -> None:
+    """Записывает пачку тиков (pair, price, ts) и сразу подписывает новые цены для /signed_price."""
+    ticks = [tick for tick in ticks if _record_tick(*tick)]
+    metrics.TICKS.inc(amount=len(ticks))
+    if not ticks:
+        return
+    if push_publisher is not None:
+        push_publisher.on_ticks(ticks)
+    pairs = list(dict.fromkeys(pair for pair, _, _ in ticks))
+    signed: Dict[str, Optional[dict]] = {}
+    if signing_service is None or _domain_separator is None:
+        pass  # Web3 ещё не готов — подпишем по первому запросу
+    elif config.PRICE_BUNDLE_ENABLED:
+        _schedule_price_bundle()  # одна подпись корня на тик вместо подписи каждой пары
+    else:
+        # Все подписи тика запускаются разом и уходят в пул подписи одной пачкой
+        signed = dict(zip(pairs, await asyncio.gather(*[get_signed_price_data(pair) for pair in pairs])))
+    for pair in pairs:
+        if price_hub.has_subscribers(pair):
+            signed_data = signed.get(pair)
+            price_hub.publish(pair, price_message(pair), price_message(pair, signed_data) if signed_data else None)
+
+def price_message(asset_pair: str, signed_data: Optional[dict] = None) -> Optional[str]:
+    """JSON-сообщение потока цен: последняя цена пары, с подписью — если передан signed_data."""
+    if signed_data is not None:
+        return dumps(signed_data).decode()
+    body = get_price_body(asset_pair)  # те же байты, что отдаёт /price
+    return body.json.decode() if body is not None else None
+
+def warm_start_from_tape() -> int:
+    """
+    Восстанавливает историю и последние цены из ленты на диске. Возвращает число тиков.
+    Тик старше PRICE_WARM_START_MAX_AGE_SECONDS (процесс долго лежал) попадает только в историю
+    для ?at=, а не в /price и /signed_price как текущая цена.
+    """
+    if price_tape is None:
+        return 0
+    loaded = 0
+    now = int(time.time())
+    for pair in pair_registry.pairs:
+        for ts, price in price_tape.load(pair, config.PRICE_HISTORY_SIZE):
+            if price_history.record(pair, ts, price):
+                candle_store.record(pair, ts, price)
+            loaded += 1
+        latest = price_history.latest(pair)
+        if latest and now - latest["timestamp"] > config.PRICE_WARM_START_MAX_AGE_SECONDS:
+            logger.info(f"Warm start: last {pair} tick is {now - latest['timestamp']}s old, not serving it as current.")
+        elif latest:
+            latest_prices[pair] = latest
+            if shared_table is not None and shared_table.writer:
+                shared_table.write(pair, latest["timestamp"], latest["price"])
+    return loaded
+
+def close_price_tape() -> None:
+    if price_tape is not None:
+        price_tape.close()
+
+async def shutdown_tx_pipeline() -> None:
+    if push_publisher is not None:
+        await push_publisher.stop()
+    if fulfillment_batcher is not None:
+        try:
+            await fulfillment_batcher.flush()  # не теряем накопленные фулфилменты
+        except Exception as e:
+            logger.error("Failed to flush pending fulfillments: %s", e)
+    if tx_pipeline is not None:
+        await tx_pipeline.stop()
+    if rpc_pool is not None:
+        await rpc_pool.stop()
+
+def shutdown_signing_service() -> None:
+    if signing_service is not None:
+        signing_service.shutdown()
 
 async def price_polling_loop(): # Price polling logic matches user's new file
-    client = await AsyncClient.create()
-    while True:
-        ts = int(time.time())
-        prices = await asyncio.gather(
-            *[_fetch_price(client, p) for p in config.ASSET_PAIRS]
-        )
-        for pair, price in zip(config.ASSET_PAIRS, prices):
-            if price is not None:
-                latest_prices[pair] = {"price": price, "timestamp": ts}
+    sources = price_sources.build_sources(
+        config.PRICE_SOURCES,
+        config.PRICE_SOURCE_TIMEOUT_SECONDS,
+        config.BINANCE_BATCH_FETCH,
+        config.BINANCE_MAX_SYMBOLS_PER_REQUEST,
+        with_volume=config.PRICE_AGGREGATION == "vwap",
+        anchor=lambda pair: (latest_prices.get(pair) or {}).get("price"),
+        sim_wick_probability=config.SIM_WICK_PROBABILITY,
+        sim_outage_probability=config.SIM_OUTAGE_PROBABILITY,
+    )
+    try:
+        while True:
+            ts = int(time.time())
+            started = time.perf_counter()
+            try:
+                prices = await _fetch_prices(sources, pair_registry.pairs)
+                metrics.PRICE_FETCH_SECONDS.since(started)
+            except Exception as e:
+                metrics.PRICE_FETCH_ERRORS.inc()
+                logger.error("Price fetch failed: %s", e, exc_info=True)
+                prices = {}
+            for pair, price in prices.items():
                 logger.info("Price %s → %f", pair, price)
-        await asyncio.sleep(config.ORACLE_POLL_INTERVAL_SECONDS)
+            await _ingest_ticks([(pair, price, ts) for pair, price in prices.items()])
+            await asyncio.sleep(config.ORACLE_POLL_INTERVAL_SECONDS)
+    finally:
+        for source in sources:
+            await source.close()
+
+
+# --- Binance WebSocket Stream ---
+def _parse_stream_tick(data: dict) -> Optional[tuple]:
+    """Разбирает сообщение ticker/bookTicker в (symbol, price, ts)."""
+    symbol = data.get("s")
+    if not symbol:
+        return None
+    if "c" in data:  # 24hrTicker: цена последней сделки
+        price = float(data["c"])
+    elif "b" in data and "a" in data:  # bookTicker: середина спреда
+        price = (float(data["b"]) + float(data["a"])) / 2
+    else:
+        return None
+    ts = int(data["E"]) // 1000 if "E" in data else int(time.time())
+    return symbol, price, ts
+
+async def _stream_prices(on_connected) -> None:
+    """
+    Подписывается на combined stream Binance и пишет тики, пока соединение живо.
+    Пары, добавленные в реестр или убранные из него, (от)подписываются на том же соединении.
+    Тики одной площадки идут мимо агрегатора: сводить не с чем.
+    """
+    def _wanted_streams() -> set:
+        return {f"{_sym(p).lower()}@{config.BINANCE_STREAM_TYPE}" for p in pair_registry.pairs}
+
+    changed = asyncio.Event()
+    unsubscribe = pair_registry.on_change(changed.set)
+    try:
+        async with websockets.connect(config.BINANCE_WS_URL, ping_interval=20, ping_timeout=20) as ws:
+            # Подписка отправляется заново на каждом соединении
+            streams = _wanted_streams()
+            if streams:
+                await ws.send(json.dumps({"method": "SUBSCRIBE", "params": sorted(streams), "id": 1}))
+            logger.info("Subscribed to %d Binance streams", len(streams))
+            on_connected()
+
+            async def _follow_registry() -> None:
+                nonlocal streams
+                request_id = 1
+                while True:
+                    await changed.wait()
+                    changed.clear()
+                    wanted = _wanted_streams()
+                    for method, params in (("SUBSCRIBE", wanted - streams), ("UNSUBSCRIBE", streams - wanted)):
+                        if params:
+                            request_id += 1
+                            await ws.send(json.dumps({"method": method, "params": sorted(params), "id": request_id}))
+                            logger.info("%s Binance streams: %s", method, sorted(params))
+                    streams = wanted
+
+            follower = asyncio.create_task(_follow_registry())
+            try:
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    data = msg.get("data")
+                    if data is None:  # ответ на SUBSCRIBE: {"result": null, "id": 1}
+                        if msg.get("error"):
+                            raise ConnectionError(f"Binance subscription error: {msg['error']}")
+                        continue
+                    tick = _parse_stream_tick(data)
+                    if tick is None:
+                        continue
+                    symbol, price, ts = tick
+                    pair = pair_registry.pair_for_symbol(symbol)
+                    if pair:
+                        await _ingest_ticks([(pair, price, ts)])
+                        logger.debug("Stream price %s → %f", pair, price)
+            finally:
+                follower.cancel()
+    finally:
+        unsubscribe()
+
+async def price_stream_loop():
+    """Поток цен Binance с переподключением; пока потока нет, работает REST-опрос."""
+    fallback_task: Optional[asyncio.Task] = None
+    backoff = 1
+
+    def _on_connected():
+        nonlocal fallback_task, backoff
+        backoff = 1
+        if fallback_task and not fallback_task.done():
+            logger.info("Binance stream restored, stopping REST polling fallback.")
+            fallback_task.cancel()
+        fallback_task = None
+
+    try:
+        while True:
+            try:
+                await _stream_prices(_on_connected)
+                logger.warning("Binance stream closed by server.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Binance stream error: %s", e)
+            if fallback_task is None or fallback_task.done():
+                logger.info("Falling back to REST polling until the stream reconnects.")
+                fallback_task = asyncio.create_task(price_polling_loop())
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, config.BINANCE_STREAM_MAX_BACKOFF_SECONDS)
+    finally:
+        if fallback_task and not fallback_task.done():
+            fallback_task.cancel()
+
+async def price_source_loop():
+    """Запускает источник цен согласно PRICE_SOURCE_MODE."""
+    if config.PRICE_SOURCE_MODE == "stream":
+        if config.PRICE_SOURCES != ["binance"] or config.PRICE_MIN_SOURCES > 1:
+            logger.warning("PRICE_SOURCE_MODE=stream is single-venue (Binance): PRICE_SOURCES=%s and "
+                           "PRICE_MIN_SOURCES=%d apply only to the REST polling fallback.",
+                           ",".join(config.PRICE_SOURCES), config.PRICE_MIN_SOURCES)
+        await price_stream_loop()
+    else:
+        await price_polling_loop()
 
 
 # --- Event Handling Logic ---
 
-async def _eip712(pair: str, price: float, ts: int) -> dict: # _eip712 function structure and content matches user's new file AND apply chainId fix
-    """Готовит структуру данных EIP-712 для подписи."""
-    if not w3:
-        raise ValueError("Web3 not initialized.")
-
-    current_chain_id = await w3.eth.chain_id # Get current chain_id
-
-    typed_data = {
-        "types": {
-            "EIP712Domain": [
-                {"name": "name", "type": "string"},
-                {"name": "version", "type": "string"},
-                {"name": "chainId", "type": "uint256"},
-                {"name": "verifyingContract", "type": "address"},
-            ],
-            "Price": [
-                {"name": "pair", "type": "string"},
-                {"name": "price", "type": "uint256"},
-                {"name": "timestamp", "type": "uint256"},
-            ],
-        },
-        "primaryType": "Price",
-        "domain": {
-            "name": "SimpleOracle",
-            "version": "1",
-            "chainId": current_chain_id,
-            "verifyingContract": SyncWeb3.to_checksum_address(config.SIMPLE_ORACLE_ADDRESS),
-        },
-        "message": {"pair": pair, "price": int(price * 1e6), "timestamp": ts},
-    }
-    return typed_data
+async def _sign_price(pair: str, price: float, ts: int) -> bytes:
+    """Подписывает Price(pair, price, timestamp) по закэшированному domain separator — без RPC."""
+    if _domain_separator is None:
+        await _refresh_eip712_domain()
+    started = time.perf_counter()
+    struct_hash = signing.price_struct_hash(pair, signing.price_to_uint(price), ts)
+    digest = signing.typed_data_digest(_domain_separator, struct_hash)
+    signature = await signing_service.sign_digest(digest)
+    metrics.SIGNING_SECONDS.since(started, "price")
+    return signature
+
+async def _sign_price_validation(asset_id: bytes, price: float, ts: int) -> bytes:
+    """Подписывает PriceValidation(assetId, timestamp, price) — формат, который проверяет контракт."""
+    if _domain_separator is None:
+        await _refresh_eip712_domain()
+    started = time.perf_counter()
+    struct_hash = signing.price_validation_struct_hash(asset_id, ts, signing.price_to_uint(price))
+    digest = signing.typed_data_digest(_domain_separator, struct_hash)
+    signature = await signing_service.sign_digest(digest)
+    metrics.SIGNING_SECONDS.since(started, "price_validation")
+    return signature
+
+async def _send_fulfillment_tx(pair: str, price: float, ts: int) -> asyncio.Future:
+    """
+    Отправляет транзакцию fulfillPriceValidation в контракт через tx_pipeline.
+    Возвращает future квитанции, не дожидаясь включения транзакции в блок.
+    """
+    asset_id = pair_registry.asset_id(pair)
+    sig = await _sign_price_validation(asset_id, price, ts)
 
-# _sign_eip712_data is NOT present in user's new file, removed to match.
+    if fulfillment_batcher is not None:
+        # Попадёт в общую транзакцию fulfillPriceValidationBatch
+        return await fulfillment_batcher.add(asset_id, ts, signing.price_to_uint(price), sig)
 
-async def _send_fulfillment_tx(pair: str, price: float, ts: int) -> None:
-    """Отправляет транзакцию fulfillPriceRequest в контракт."""
-    typed = await _eip712(pair, price, ts)                # <-- NEW
-    msg   = encode_typed_data(full_message=typed)         # <-- NEW
-    sig   = oracle_signer_account.sign_message(msg).signature
+    func = simple_oracle_contract.functions.fulfillPriceValidation(
+        asset_id, ts, signing.price_to_uint(price), sig
+    )
+    return await tx_pipeline.submit(func, gas=300_000)
 
-    func = simple_oracle_contract.functions.fulfillPriceRequest(
-        pair, int(price * 1e6), ts, sig
+async def _submit_fulfillment_batch(items: list) -> asyncio.Future:
+    """Отправляет накопленные фулфилменты одной транзакцией fulfillPriceValidationBatch."""
+    asset_ids, timestamps, prices, signatures = (list(column) for column in zip(*items))
+    func = simple_oracle_contract.functions.fulfillPriceValidationBatch(
+        asset_ids, timestamps, prices, signatures
     )
-    nonce      = await w3.eth.get_transaction_count(oracle_signer_account.address)
-    gas_price  = await w3.eth.gas_price
-    tx_params  = {
-        "from": oracle_signer_account.address,
-        "nonce": nonce,
-        "gas": 300_000,
-        "maxFeePerGas": gas_price,
-        "maxPriorityFeePerGas": gas_price,
-    }
+    gas = config.FULFILLMENT_BATCH_BASE_GAS + config.FULFILLMENT_BATCH_GAS_PER_ITEM * len(items)
+    return await tx_pipeline.submit(func, gas=gas)
 
-    tx      = await func.build_transaction(tx_params)
-    signed  = oracle_signer_account.sign_transaction(tx)
-    tx_hash = await w3.eth.send_raw_transaction(signed.rawTransaction)
-    logger.info("Tx sent %s", tx_hash.hex())
-    await w3.eth.wait_for_transaction_receipt(tx_hash)
+async def _prepare_push_item(pair: str, price: float, ts: int) -> tuple:
+    """Элемент fulfillPriceValidationBatch для push-публикации: цена тика под подписью PriceValidation."""
+    asset_id = pair_registry.asset_id(pair)
+    sig = await _sign_price_validation(asset_id, price, ts)
+    return asset_id, ts, signing.price_to_uint(price), sig
+
+def _log_fulfillment_result(pair: str, ts: int):
+    """Колбэк future фулфилмента: логирует итог (и забирает исключение, чтобы оно не потерялось)."""
+    def _done(fut: asyncio.Future) -> None:
+        if fut.cancelled():
+            return
+        if fut.exception() is not None:
+            logger.error("Fulfillment for %s @ %s failed: %s", pair, ts, fut.exception())
+        elif fut.result().get("status") != 1:
+            logger.error("Fulfillment tx for %s @ %s reverted: %s", pair, ts, fut.result()["transactionHash"].hex())
+    return _done
 
 # Separate handle_event removed as logic is in _log_loop in user's new file.
 
-async def get_signed_price_data(asset_pair: str) -> Optional[dict]:
+def _signed_price_response(asset_pair: str, asset_id: bytes, price: float, ts: int, signature: bytes) -> dict:
+    return {
+        "assetPair": asset_pair,
+        "assetId": asset_id.hex(),                          # assetId в hex
+        "price": str(price),                                # Price as string float
+        "priceUint256": str(signing.price_to_uint(price)),  # Price as string uint256 (with 6 decimals)
+        "timestamp": ts,
+        "signature": signature.hex(),                       # Signature in hex format
+    }
+
+async def get_signed_price_data(asset_pair: str, at: Optional[int] = None) -> Optional[dict]:
     """
     Возвращает последние данные о цене для asset_pair вместе с подписью EIP-712.
+    Если задан at — подписывается ближайшая к этому моменту цена из истории.
     """
-    global ASSET_ID_MAP, w3, oracle_signer_account # Убедимся, что глобальные переменные доступны
-    price_data = get_latest_price_data(asset_pair)
+    global w3, oracle_signer_account # Убедимся, что глобальные переменные доступны
+    if at is None and shared_table is not None and not shared_table.writer:
+        entry = shared_table.read(asset_pair)
+        if entry and entry[2]:  # подпись уже сделана ingest-процессом
+            ts, price, signature = entry
+            cached = _signed_price_cache.get(asset_pair)
+            if cached and cached[0] == (ts, price):
+                return cached[1].data
+            return _cache_signed_price(asset_pair, (ts, price), _signed_price_response(
+                asset_pair, pair_registry.asset_id(asset_pair), price, ts, signature
+            )).data
+    price_data = get_latest_price_data(asset_pair) if at is None else get_price_data_at(asset_pair, at)
     if not price_data:
-        logger.warning(f"No price data available for {asset_pair} to sign.")
+        logger.warning(f"No price data available for {asset_pair} to sign (at={at}).")
         return None
 
     # Проверяем инициализацию Web3 и аккаунта
-    if not w3 or not oracle_signer_account:
+    if not oracle_signer_account or not signing_service or (_domain_separator is None and not w3):
          logger.error("Web3 or Signer Account not initialized, cannot sign price.")
          return None
 
-    asset_id_bytes = ASSET_ID_MAP.get(asset_pair) # Get bytes32 ID for the pair
-    if not asset_id_bytes: # If asset_pair is not in ASSET_ID_MAP (e.g. not tracked)
-        logger.error(f"Asset pair {asset_pair} not found in ASSET_ID_MAP for signing or its ID is None.")
+    asset_id_bytes = pair_registry.asset_id(asset_pair) # Get bytes32 ID for the pair
+    if not asset_id_bytes: # If asset_pair is not in the registry (e.g. not tracked)
+        logger.error(f"Asset pair {asset_pair} not found in pair registry for signing.")
         return None
 
     # Get price and timestamp from stored data
     price_float = price_data['price']
     timestamp = price_data['timestamp']
+    tick_key = (timestamp, price_float)
+
+    # Эта цена уже подписана при получении тика — отдаём готовый ответ
+    cached = _signed_price_cache.get(asset_pair)
+    if cached and cached[0] == tick_key:
+        return cached[1].data
 
-    # Convert price to uint256
-    # Based on _eip712 in the user's file, it uses int(price * 1e6) -> 6 decimals.
-    PRICE_DECIMALS = 6 # Match the decimals used in _eip712
+    # Convert price to uint256 (signing.PRICE_DECIMALS = 6, same as _sign_price)
     try:
-        price_uint256 = int(price_float * (10**PRICE_DECIMALS))
+        price_uint256 = signing.price_to_uint(price_float)
     except (ValueError, TypeError):
-        logger.error(f"Cannot convert price {price_float} to uint{PRICE_DECIMALS} for signing {asset_pair}.")
+        logger.error(f"Cannot convert price {price_float} to uint{signing.PRICE_DECIMALS} for signing {asset_pair}.")
         return None
 
     try:
-        # Готовим данные EIP-712 (используя _eip712)
-        # _eip712 function expects (pair: str, price: float, ts: int)
-        logger.debug(f"Preparing EIP-712 for off-chain API: {asset_pair}")
-        typed_data = await _eip712(asset_pair, price_float, timestamp) # Use _eip712 as defined in user's file
-
-        # Подписываем данные (logic from user's _send_fulfillment_tx)
-        msg_hash = encode_typed_data(full_message=typed_data) # Используем encode_typed_data
-        signature = oracle_signer_account.sign_message(msg_hash).signature # Подписываем хэш
+        # Подписываем EIP-712 digest от закэшированного domain separator (без RPC)
+        signature = await _sign_price(asset_pair, price_float, timestamp)
         logger.debug(f"Signed off-chain price for {asset_pair}")
 
         # Return data package including signature
-        return {
-            "assetPair": asset_pair,
-            "assetId": asset_id_bytes.hex(),    # <--- ВОЗВРАЩАЕМ assetId в hex
-            "price": str(price_float),          # Price as string float
-            "priceUint256": str(price_uint256), # Price as string uint256 (with 6 decimals)
-            "timestamp": timestamp,
-            "signature": signature.hex()        # Signature in hex format
-        }
+        signed_data = _signed_price_response(asset_pair, asset_id_bytes, price_float, timestamp, signature)
+        latest = get_latest_price_data(asset_pair)
+        if latest and (latest['timestamp'], latest['price']) == tick_key:
+            _cache_signed_price(asset_pair, tick_key, signed_data)
+            if shared_table is not None and shared_table.writer:
+                shared_table.write(asset_pair, timestamp, price_float, signature)
+        return signed_data
     except Exception as e:
         logger.error(f"Failed to get signed price data for {asset_pair}: {e}", exc_info=True)
         return None
 
 
-async def _log_loop():
-    """Обрабатывает событие PriceRequested."""
-    # --- ИЗМЕНЕНО ЗДЕСЬ: Step 2 & 3 - Listen for PriceValidationRequested and adjust fromBlock ---
-    event_to_listen = "PriceValidationRequested" # Assuming this is the correct event from contract
-    
-    if not hasattr(simple_oracle_contract.events, event_to_listen):
-        logger.error(f"Event '{event_to_listen}' not found in contract ABI. Available events: {[e.event_name for e in simple_oracle_contract.events if hasattr(e, 'event_name')]}")
-        # If the event is critical and not found, we should not proceed with creating a filter for it.
-        # Consider how the application should behave. For now, just log and return to prevent crashing the loop.
-        logger.info("Cannot start log loop without a valid event to listen to.")
-        return # Exit _log_loop if the event is not available
+def _cache_signed_price(asset_pair: str, tick_key: tuple, signed_data: dict) -> CachedBody:
+    body = CachedBody(signed_data)
+    _signed_price_cache[asset_pair] = (tick_key, body)
+    return body
 
-    current_block = await w3.eth.block_number
-    # Start listening from current_block - 1 to catch events in the same block as startup
-    # or simply current_block. Using current_block might be safer if node has slight delays.
-    # Using current_block to be safe, adjust to current_block - 1 if events are missed.
-    filter_from_block = current_block 
-    logger.info(f"Creating event filter for '{event_to_listen}' from block {filter_from_block}.")
 
-    flt = await simple_oracle_contract.events[event_to_listen].create_filter(
-        from_block=filter_from_block 
-    )
-    # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+async def get_signed_price_body(asset_pair: str) -> Optional[CachedBody]:
+    """Сериализованный ответ /signed_price для последней цены (из кэша подписей, если тик уже подписан)."""
+    signed_data = await get_signed_price_data(asset_pair)
+    if signed_data is None:
+        return None
+    cached = _signed_price_cache.get(asset_pair)
+    if cached and cached[1].data is signed_data:
+        return cached[1]
+    return CachedBody(signed_data)  # тик сменился во время подписи — отдаём без кэширования
+
+
+async def get_signed_prices_data(asset_pairs: list, at: Optional[int] = None) -> Dict[str, Optional[dict]]:
+    """
+    Подписанные цены для нескольких пар. Промахи кэша подписываются одной пачкой
+    (все запросы к SigningService уходят в одной итерации event loop).
+    """
+    results = await asyncio.gather(*[get_signed_price_data(pair, at=at) for pair in asset_pairs])
+    return dict(zip(asset_pairs, results))
+
+
+# --- Price Bundle (Merkle root signing) ---
+
+def _schedule_price_bundle() -> None:
+    """Запускает пересборку пакета; тики, пришедшие во время сборки, схлопываются в одну следующую."""
+    global _price_bundle_task, _price_bundle_dirty
+    if _price_bundle_task and not _price_bundle_task.done():
+        _price_bundle_dirty = True
+        return
+    _price_bundle_task = asyncio.create_task(_price_bundle_loop())
+
+async def _price_bundle_loop() -> None:
+    global _price_bundle_dirty
     while True:
+        _price_bundle_dirty = False
         try:
-            for ev in await flt.get_new_entries():
-                # --- ИЗМЕНЕНО ЗДЕСЬ: Step 4 - Add debug log for received event ---
-                logger.info("⚡ New event: %s", ev) 
-                # --- КОНЕЦ ИЗМЕНЕНИЯ ---
-                tx_hash_hex = ev.get('transactionHash', b'').hex()
-                block_num = ev.get('blockNumber', 'N/A')
-                logger.info(f"\n--- Received event {event_to_listen} (Tx: {tx_hash_hex[:10]}..., Blk: {block_num}) ---")
+            await _build_price_bundle()
+        except Exception as e:
+            logger.error("Failed to build price bundle: %s", e, exc_info=True)
+        if not _price_bundle_dirty:
+            return
 
-                try:
-                    args = ev['args']
-                    # Adapt to 'assetId' (bytes32) from PriceValidationRequested event
-                    if 'assetId' in args:
-                        asset_id_from_event_bytes = args['assetId']
-                        pair_from_event = next((p for p, b_id in ASSET_ID_MAP.items() if b_id == asset_id_from_event_bytes), None)
-                        if not pair_from_event:
-                            logger.error(f"  Cannot map assetId {asset_id_from_event_bytes.hex()} from event to known pair.")
-                            continue
-                        logger.info(f"  AssetId from Event: {asset_id_from_event_bytes.hex()} (Mapped to: {pair_from_event})")
-                    # Fallback or alternative if event uses 'pair' string (less likely for PriceValidationRequested)
-                    elif 'pair' in args: 
-                        pair_from_event = args['pair']
-                        logger.warning(f"  Event uses 'pair' string: {pair_from_event}. Ensure this matches contract and EIP712 logic if PriceValidationRequested is used.")
-                    else:
-                        logger.error("  Event args do not contain 'assetId' or 'pair'.")
-                        continue
-                        
-                    timestamp_requested = args['timestamp']
-                    requester = args['requester']
-                    logger.info(f"  Timestamp Requested: {timestamp_requested}, Requester: {requester}")
-                except KeyError as ke: logger.error(f"  Event parse err: {ke}."); continue
-                except Exception as parse_e: logger.error(f"  Event parse err: {parse_e}.", exc_info=True); continue
-
-                price_data = get_latest_price_data(pair_from_event)
-                if not price_data:
-                     logger.warning(f"  No price data found locally for {pair_from_event} to fulfill request.")
-                     continue
-
-                last_price_timestamp = price_data['timestamp']
-                MAX_TIMESTAMP_DIFF = config.ORACLE_POLL_INTERVAL_SECONDS * 2 + 5
-
-                if abs(last_price_timestamp - timestamp_requested) > MAX_TIMESTAMP_DIFF:
-                    logger.warning(f"  Timestamp difference too large for {pair_from_event}. Requested: {timestamp_requested}, Last Available: {last_price_timestamp}. Max diff: {MAX_TIMESTAMP_DIFF}. Skipping fulfillment.")
-                    continue
+async def _build_price_bundle() -> None:
+    """Строит дерево Меркла по текущим ценам всех пар и подписывает EIP-712 PriceBundle(root)."""
+    global _price_bundle
+    entries = {}
+    for pair in pair_registry.pairs:
+        data = latest_prices.get(pair)
+        if data:
+            entries[pair] = (data["timestamp"], data["price"])
+    if not entries:
+        return
 
-                price_float = price_data['price']
-                timestamp_to_fulfill = timestamp_requested
-                PRICE_DECIMALS = 6 
-                
-                logger.info(f"  Fulfilling request for {pair_from_event}")
-                logger.info(f"  Using price: {price_float} (uint256 for EIP712: {int(price_float * (10**PRICE_DECIMALS))})")
-                logger.info(f"  Using timestamp: {timestamp_to_fulfill} (from request)")
-                
-                # _send_fulfillment_tx expects 'pair' (string), price (float), ts (int)
-                # This matches the current signature of _send_fulfillment_tx
-                await _send_fulfillment_tx(
-                    pair=pair_from_event, 
-                    price=price_float,
-                    ts=timestamp_to_fulfill
-                )
-                logger.info(f"--- Event processing finished for {pair_from_event} (Tx: {tx_hash_hex[:10]}...) ---")
-        except LogTopicError as e:
-            logger.warning("LogTopicError: %s", e)
-        except Exception as exc:
-            logger.error("Listener error: %s", exc, exc_info=True)
-        await asyncio.sleep(2)
+    pairs = list(entries)
+    tree = merkle.MerkleTree([
+        merkle.leaf_hash(pair_registry.asset_id(pair), entries[pair][0], signing.price_to_uint(entries[pair][1]))
+        for pair in pairs
+    ])
+    digest = signing.typed_data_digest(_domain_separator, signing.bundle_struct_hash(tree.root))
+    signature = await signing_service.sign_digest(digest)
+    _price_bundle = {
+        "root": tree.root,
+        "signature": signature,
+        "createdAt": int(time.time()),
+        "tree": tree,
+        "index": {pair: i for i, pair in enumerate(pairs)},
+        "entries": entries,
+    }
+    logger.debug("Price bundle signed: %d pairs, root %s", len(pairs), tree.root.hex())
+
+def get_price_bundle_proof(asset_pair: str) -> Optional[dict]:
+    """Цена пары из последнего подписанного пакета с доказательством включения в корень."""
+    bundle = _price_bundle
+    if not bundle or asset_pair not in bundle["index"]:
+        return None
+    timestamp, price = bundle["entries"][asset_pair]
+    return {
+        "assetPair": asset_pair,
+        "assetId": pair_registry.asset_id(asset_pair).hex(),
+        "price": str(price),
+        "priceUint256": str(signing.price_to_uint(price)),
+        "timestamp": timestamp,
+        "proof": [node.hex() for node in bundle["tree"].proof(bundle["index"][asset_pair])],
+    }
+
+def get_price_bundle(asset_pairs: Optional[list] = None) -> Optional[dict]:
+    """Корень, подпись и доказательства для всех (или выбранных) пар последнего пакета."""
+    bundle = _price_bundle
+    if not bundle:
+        return None
+    pairs = asset_pairs if asset_pairs is not None else list(bundle["index"])
+    return {
+        "root": bundle["root"].hex(),
+        "signature": bundle["signature"].hex(),
+        "createdAt": bundle["createdAt"],
+        "prices": [p for p in (get_price_bundle_proof(pair) for pair in pairs) if p is not None],
+    }
+
+
+PRICE_REQUEST_EVENT = "PriceValidationRequested"
+PRICE_FULFILLED_EVENT = "PriceValidationFulfilled"
+
+
+async def _handle_price_request(ev) -> Optional[asyncio.Future]:
+    """
+    Обрабатывает одно событие PriceValidationRequested: ищет цену и отправляет фулфилмент.
+    Возвращает future квитанции или None, если фулфилмент не отправлен.
+    """
+    # --- ИЗМЕНЕНО ЗДЕСЬ: Step 4 - Add debug log for received event ---
+    logger.info("⚡ New event: %s", ev) 
+    # --- КОНЕЦ ИЗМЕНЕНИЯ ---
+    tx_hash_hex = ev.get('transactionHash', b'').hex()
+    block_num = ev.get('blockNumber', 'N/A')
+    logger.info(f"\n--- Received event {PRICE_REQUEST_EVENT} (Tx: {tx_hash_hex[:10]}..., Blk: {block_num}) ---")
+
+    try:
+        args = ev['args']
+        # Adapt to 'assetId' (bytes32) from PriceValidationRequested event
+        if 'assetId' in args:
+            asset_id_from_event_bytes = args['assetId']
+            pair_from_event = pair_registry.pair_for_asset_id(asset_id_from_event_bytes)
+            if not pair_from_event:
+                logger.error(f"  Cannot map assetId {asset_id_from_event_bytes.hex()} from event to known pair.")
+                return
+            logger.info(f"  AssetId from Event: {asset_id_from_event_bytes.hex()} (Mapped to: {pair_from_event})")
+        # Fallback or alternative if event uses 'pair' string (less likely for PriceValidationRequested)
+        elif 'pair' in args: 
+            pair_from_event = args['pair']
+            logger.warning(f"  Event uses 'pair' string: {pair_from_event}. Ensure this matches contract and EIP712 logic if PriceValidationRequested is used.")
+        else:
+            logger.error("  Event args do not contain 'assetId' or 'pair'.")
+            return
+
+        timestamp_requested = args['timestamp']
+        requester = args['requester']
+        logger.info(f"  Timestamp Requested: {timestamp_requested}, Requester: {requester}")
+    except KeyError as ke: logger.error(f"  Event parse err: {ke}."); return
+    except Exception as parse_e: logger.error(f"  Event parse err: {parse_e}.", exc_info=True); return
+
+    # Ищем в истории тик, ближайший к запрошенному моменту (не только последний)
+    price_data = price_history.nearest(pair_from_event, timestamp_requested)
+    if not price_data:
+         logger.warning(f"  No price data found locally for {pair_from_event} to fulfill request.")
+         return
+
+    nearest_price_timestamp = price_data['timestamp']
+    MAX_TIMESTAMP_DIFF = config.PRICE_LOOKUP_TOLERANCE_SECONDS
+
+    if abs(nearest_price_timestamp - timestamp_requested) > MAX_TIMESTAMP_DIFF:
+        logger.warning(f"  Timestamp difference too large for {pair_from_event}. Requested: {timestamp_requested}, Nearest Available: {nearest_price_timestamp}. Max diff: {MAX_TIMESTAMP_DIFF}. Skipping fulfillment.")
+        return
+
+    price_float = price_data['price']
+    timestamp_to_fulfill = timestamp_requested
+    if config.FULFILLMENT_TWAP_WINDOW_SECONDS > 0:
+        # TWAP до запрошенного момента вместо одного тика: короткая шпилька почти не сдвигает цену
+        twap = candle_store.twap(pair_from_event, config.FULFILLMENT_TWAP_WINDOW_SECONDS, timestamp_requested)
+        if twap is not None:
+            price_float = twap[2]
+            logger.info(f"  Using {twap[1] - twap[0]}s TWAP ({twap[0]}-{twap[1]}) instead of the nearest tick")
+
+    logger.info(f"  Fulfilling request for {pair_from_event}")
+    logger.info(f"  Using price: {price_float} (uint256 for EIP712: {signing.price_to_uint(price_float)})")
+    logger.info(f"  Using timestamp: {timestamp_to_fulfill} (from request)")
+
+    # _send_fulfillment_tx expects 'pair' (string), price (float), ts (int)
+    # This matches the current signature of _send_fulfillment_tx
+    receipt_future = await _send_fulfillment_tx(
+        pair=pair_from_event, 
+        price=price_float,
+        ts=timestamp_to_fulfill
+    )
+    receipt_future.add_done_callback(_log_fulfillment_result(pair_from_event, timestamp_to_fulfill))
+    logger.info(f"--- Event processing finished for {pair_from_event} (Tx: {tx_hash_hex[:10]}...) ---")
+    return receipt_future
+
+async def _timed_price_request(ev) -> Optional[asyncio.Future]:
+    """_handle_price_request с замерами: до отправки транзакции и до получения квитанции."""
+    started = time.perf_counter()
+    try:
+        receipt_future = await _handle_price_request(ev)
+    except Exception:
+        metrics.EVENTS.inc("error")
+        raise
+    if receipt_future is None:
+        metrics.EVENTS.inc("skipped")
+        return None
+    metrics.EVENT_HANDLING_SECONDS.since(started)
+
+    def _fulfilled(fut: asyncio.Future) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            metrics.EVENTS.inc("failed")
+            return
+        metrics.EVENT_TO_FULFILLMENT_SECONDS.since(started)
+        metrics.EVENTS.inc("fulfilled" if fut.result().get("status") == 1 else "reverted")
+
+    receipt_future.add_done_callback(_fulfilled)
+    return receipt_future
+
+def _price_request_key(ev) -> Optional[tuple]:
+    """Ключ single-flight для события запроса: (assetId, timestamp)."""
+    args = ev.get("args") or {}
+    if "assetId" not in args or "timestamp" not in args:
+        return None
+    return (bytes(args["assetId"]), args["timestamp"])
+
+
+async def _load_fulfilled_requests(dispatcher: EventDispatcher) -> None:
+    """Восстанавливает множество исполненных (assetId, timestamp) по логам PriceValidationFulfilled."""
+    async with metrics.rpc_call("eth_blockNumber"):
+        head = await w3.eth.block_number
+    from_block = max(0, head - config.FULFILLED_LOOKBACK_BLOCKS)
+    logs: asyncio.Queue = asyncio.Queue()
+    await event_source.backfill_logs(
+        simple_oracle_contract, PRICE_FULFILLED_EVENT, from_block, head, logs,
+        config.LOG_BACKFILL_MAX_CHUNK_BLOCKS, config.LOG_BACKFILL_CONCURRENCY,
+    )
+    while not logs.empty():
+        item = logs.get_nowait()
+        if not isinstance(item, int):
+            args = item["args"]
+            dispatcher.mark_fulfilled((bytes(args["assetId"]), args["timestamp"]))
+            pair = pair_registry.pair_for_asset_id(bytes(args["assetId"]))
+            if push_publisher is not None and pair is not None:
+                # Последняя опубликованная цена пары — точка отсчёта для отклонения и heartbeat
+                push_publisher.seed(pair, args["price"] / 10**signing.PRICE_DECIMALS, args["timestamp"])
+    logger.info(f"Loaded {dispatcher.fulfilled} fulfilled requests from blocks {from_block}-{head}.")
+
+
+async def _produce_price_requests(queue: asyncio.Queue) -> None:
+    """
+    Поставляет события в очередь: сначала догружает через eth_getLogs всё, что пришло после
+    чекпоинта (пока сервис был выключен или переподключался), затем слушает новые — через
+    eth_subscribe("logs") по WebSocket, а если провайдер HTTP или подписка не удалась —
+    опросом eth_getLogs раз в LOG_POLL_INTERVAL_SECONDS.
+    """
+    head = await w3.eth.block_number
+    # Без чекпоинта (первый запуск) слушаем с текущего блока, как раньше
+    start = head if log_checkpoint.block is None else log_checkpoint.block + 1
+    if start <= head:
+        logger.info(f"Event listener resuming from block {start} (head {head}).")
+
+    if isinstance(w3.provider, WebSocketProvider):
+        async def _backfill_to_head() -> int:
+            # Подписка уже активна: всё до текущего head догружаем, новее — придёт из подписки
+            backfill_head = await w3.eth.block_number
+            await event_source.backfill_logs(
+                simple_oracle_contract, PRICE_REQUEST_EVENT, start, backfill_head, queue,
+                config.LOG_BACKFILL_MAX_CHUNK_BLOCKS, config.LOG_BACKFILL_CONCURRENCY,
+            )
+            return backfill_head
+
+        try:
+            await event_source.subscribe_logs(
+                w3, simple_oracle_contract, PRICE_REQUEST_EVENT, queue,
+                on_subscribed=_backfill_to_head,
+                checkpoint_interval=config.LOG_CHECKPOINT_INTERVAL_SECONDS,
+                checkpoint_lag=config.LOG_CHECKPOINT_LAG_BLOCKS,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Log subscription failed ({e}); falling back to log polling.")
+        if log_checkpoint.block is not None:
+            start = max(start, log_checkpoint.block + 1)
+
+    await event_source.poll_logs(
+        w3, simple_oracle_contract, PRICE_REQUEST_EVENT, start, queue,
+        config.LOG_POLL_INTERVAL_SECONDS, config.LOG_BACKFILL_MAX_CHUNK_BLOCKS, config.LOG_BACKFILL_CONCURRENCY,
+    )
+
+
+async def _log_loop():
+    """Обрабатывает событие PriceValidationRequested."""
+    if not hasattr(simple_oracle_contract.events, PRICE_REQUEST_EVENT):
+        logger.error(f"Event '{PRICE_REQUEST_EVENT}' not found in contract ABI. Available events: {[e.event_name for e in simple_oracle_contract.events if hasattr(e, 'event_name')]}")
+        logger.info("Cannot start log loop without a valid event to listen to.")
+        return # Exit _log_loop if the event is not available
+
+    global event_dispatcher
+    if event_dispatcher is None:
+        # Один диспетчер на всё время работы: после переподключения догрузка с чекпоинта
+        # не должна повторно отправлять запросы, чьи фулфилменты ещё в полёте
+        event_dispatcher = EventDispatcher(
+            _timed_price_request,
+            _price_request_key,
+            workers=config.EVENT_WORKERS,
+            queue_size=config.EVENT_QUEUE_SIZE,
+            fulfilled_size=config.FULFILLED_CACHE_SIZE,
+        )
+    try:
+        await _load_fulfilled_requests(event_dispatcher)
+    except Exception as e:
+        logger.warning(f"Cannot load fulfilled requests, duplicates will be caught on-chain: {e}")
+    event_dispatcher.start()
+
+    queue: asyncio.Queue = asyncio.Queue()
+    producer = asyncio.create_task(_produce_price_requests(queue))
+    try:
+        while True:
+            get_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({get_event, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if get_event not in done:
+                get_event.cancel()
+                producer.result()  # поставщик событий упал — пробрасываем ошибку
+                return
+            item = get_event.result()
+            if isinstance(item, int):
+                await event_dispatcher.join()  # воркеры должны взять в работу события до отметки
+                # Чекпоинт — только до блока, все запросы которого исполнены ончейн
+                log_checkpoint.save(event_dispatcher.checkpoint(item))
+                continue
+            if not await event_dispatcher.submit(item):
+                metrics.EVENTS.inc("duplicate")
+    finally:
+        producer.cancel()
+        await event_dispatcher.stop()
 
 
 # --- ИЗМЕНЕНО ЗДЕСЬ: Added type hint and robust return logic ---
 async def event_listener_startup() -> bool: 
     global _log_loop_task
     try:
-        # Ensure WebSocket connection for event listening
-        if not (w3 and w3.provider and isinstance(w3.provider, WebSocketProvider) and await w3.is_connected()):
-             logger.warning("Cannot start event listener: Web3 not connected via WebSocket.")
+        if not (w3 and w3.provider and await w3.is_connected()):
+             logger.warning("Cannot start event listener: Web3 not connected.")
              return False
+        if not isinstance(w3.provider, WebSocketProvider):
+             logger.info("Event listener: HTTP provider, using filter polling instead of eth_subscribe.")
 
         if _log_loop_task is None or _log_loop_task.done():
             logger.info("Creating and starting new event listener task (_log_loop).")
@@ -429,23 +1138,239 @@ async def event_listener_shutdown():
         logger.info("Event listener stopped")
 
 
-# --- Asset ID Map ---
-ASSET_ID_MAP = {}
-try:
-    if not config.ASSET_PAIRS or not isinstance(config.ASSET_PAIRS, list):
-         logger.warning("ASSET_PAIRS empty/invalid.")
-    else:
-        ASSET_ID_MAP = {pair: SyncWeb3.keccak(text=pair) for pair in config.ASSET_PAIRS}
-        logger.info("Asset ID Map created:")
-        for pair, id_bytes in ASSET_ID_MAP.items(): logger.info(f"  '{pair}': {id_bytes.hex()}")
-except Exception as e: logger.error(f"Err creating ASSET_ID_MAP: {e}", exc_info=True)
+# --- Connection Supervisor ---
+async def _close_web3(old_w3: Optional[AsyncWeb3]) -> None:
+    """Закрывает сокет прежнего WebSocketProvider (пул и HTTP-провайдер переиспользуются)."""
+    if old_w3 is None or old_w3 is w3 or not isinstance(old_w3.provider, WebSocketProvider):
+        return
+    try:
+        await asyncio.wait_for(old_w3.provider.disconnect(), timeout=config.CONNECTION_PROBE_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.debug("Closing previous WebSocket provider failed: %s", e)
+
+async def _switch_web3(connected: Optional[AsyncWeb3] = None) -> None:
+    """
+    Останавливает слушатель, пересоздаёт подключение, контракт и конвейер транзакций
+    (без потери транзакций в полёте) и запускает слушатель снова: он продолжит с чекпоинта.
+    """
+    old_w3 = w3
+    await event_listener_shutdown()
+    await init_web3_and_contract(connected)
+    await _close_web3(old_w3)
+    if not await event_listener_startup():
+        raise ConnectionError("event listener did not start after reconnect")
+
+async def _probe_connection() -> int:
+    """
+    Текущий head-блок через обычный запрос; исключение — подключение не отвечает. Мёртвый сокет
+    не ответит за probe_timeout (таймаут даёт supervisor), отдельный ping не нужен.
+    """
+    if w3 is None or simple_oracle_contract is None:
+        raise ConnectionError("Web3 is not initialized")
+    async with metrics.rpc_call("eth_blockNumber"):
+        return await w3.eth.block_number
+
+async def _try_websocket_upgrade() -> bool:
+    """Если после сбоя WebSocket сервис остался на HTTP — пробует вернуть подписку eth_subscribe."""
+    if len(config.RPC_URLS) > 1 or w3 is None or isinstance(w3.provider, WebSocketProvider):
+        return True
+    try:
+        ws_w3 = await asyncio.wait_for(_connect_websocket(_ws_rpc_url()), timeout=config.CONNECTION_PROBE_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.debug("WebSocket still unavailable: %s", e)
+        return False
+    logger.info("WebSocket available again, switching from HTTP")
+    await _switch_web3(ws_w3)
+    return True
+
+def _listener_alive() -> bool:
+    return _log_loop_task is not None and not _log_loop_task.done()
+
+connection_supervisor = ConnectionSupervisor(
+    _probe_connection,
+    _switch_web3,
+    _listener_alive,
+    event_listener_startup,
+    upgrade=_try_websocket_upgrade,
+    interval=config.CONNECTION_CHECK_SECONDS,
+    probe_timeout=config.CONNECTION_PROBE_TIMEOUT_SECONDS,
+    max_failed_probes=config.CONNECTION_MAX_FAILED_PROBES,
+    stall_seconds=config.HEAD_STALL_SECONDS,
+    max_backoff=config.RECONNECT_MAX_BACKOFF_SECONDS,
+)
+
+
+# --- Pair Registry ---
+def _on_pairs_changed() -> None:
+    """Убирает данные пар, удалённых из реестра, чтобы они не отдавались и не подписывались."""
+    for pair in [p for p in {**latest_prices, **_signed_price_cache, **_price_body_cache} if p not in pair_registry]:
+        latest_prices.pop(pair, None)
+        _signed_price_cache.pop(pair, None)
+        _price_body_cache.pop(pair, None)
+        price_history.drop(pair)
+        candle_store.drop(pair)
+        if push_publisher is not None:
+            push_publisher.forget(pair)
+    if shared_table is not None and shared_table.writer:
+        shared_table.ensure_pairs(pair_registry.pairs)
+    if config.PRICE_BUNDLE_ENABLED and (shared_table is None or shared_table.writer):
+        _schedule_price_bundle()
+
+pair_registry = PairRegistry(config.ASSET_PAIRS, config.PAIR_REGISTRY_PATH or None)
+pair_registry.on_change(_on_pairs_changed)
+if not len(pair_registry):
+    logger.warning("ASSET_PAIRS empty/invalid.")
+logger.info("Pair registry created:")
+for _pair in pair_registry.pairs:
+    logger.info(f"  '{_pair}': {pair_registry.asset_id(_pair).hex()}")
+
+
+# --- Health Snapshot ---
+async def collect_health() -> dict:
+    """
+    Снимок состояния для /status: подключение, chain id, head-блок, отставание слушателя
+    и свежесть цен. Один RPC-запрос (block_number) на снимок; chain id берётся из кэша EIP-712.
+    """
+    now = int(time.time())
+    head_block = None
+    if w3 is not None:
+        try:
+            async with metrics.rpc_call("eth_blockNumber"):
+                head_block = await w3.eth.block_number
+        except Exception as e:
+            logger.warning("Health probe: RPC unavailable: %s", e)
+    checkpoint_block = log_checkpoint.block
+    pairs = pair_registry.pairs
+    return {
+        "tracked_pairs": pairs,
+        "latest_prices": {pair: latest_prices.get(pair) for pair in pairs},
+        "price_staleness_seconds": {
+            pair: now - latest_prices[pair]["timestamp"] if pair in latest_prices else None for pair in pairs
+        },
+        "binance_polling_interval_seconds": config.ORACLE_POLL_INTERVAL_SECONDS,
+        "event_listener": {
+            "active": _log_loop_task is not None and not _log_loop_task.done(),
+            "web3_connected": head_block is not None,
+            "chain_id": _chain_id if head_block is not None else None,
+            "contract_address": config.SIMPLE_ORACLE_ADDRESS,
+            "signer_address": oracle_signer_account.address if oracle_signer_account else None,
+            "head_block": head_block,
+            "checkpoint_block": checkpoint_block,
+            "lag_blocks": head_block - checkpoint_block if head_block is not None and checkpoint_block is not None else None,
+            "requests_in_flight": event_dispatcher.in_flight if event_dispatcher else 0,
+            "reconnects": connection_supervisor.reconnects,
+            "last_reconnect_reason": connection_supervisor.last_reconnect_reason,
+        },
+        "tx_in_flight": tx_pipeline.in_flight if tx_pipeline else 0,
+        "rpc_endpoints": rpc_pool.snapshot() if rpc_pool is not None else None,
+        "push_published": {
+            pair: {"price": price, "timestamp": ts} for pair, (price, ts) in push_publisher.published.items()
+        } if push_publisher is not None else None,
+        "stage_timings": metrics.stage_timings(),
+    }
+
+def _tick_staleness() -> Dict[tuple, float]:
+    now = time.time()
+    return {(pair,): now - data["timestamp"] for pair, data in latest_prices.items() if data}
+
+metrics.TICK_STALENESS.set_collector(_tick_staleness)
+
+def _push_age() -> Dict[tuple, float]:
+    if push_publisher is None:
+        return {}
+    now = time.time()
+    return {(pair,): now - ts for pair, (_, ts) in push_publisher.published.items()}
+
+metrics.PUSH_AGE.set_collector(_push_age)
+
+def _publish_status(body: bytes) -> None:
+    if shared_table is not None and shared_table.writer:
+        shared_table.write_status(body)
+
+health_monitor = HealthMonitor(
+    collect_health, config.HEALTH_REFRESH_SECONDS, config.HEALTH_PROBE_TIMEOUT_SECONDS, on_refresh=_publish_status
+)
+
+def status_body() -> Optional[bytes]:
+    """Готовый JSON для /status: свой снимок или, на API-воркере, снимок ingest-процесса."""
+    if shared_table is not None and not shared_table.writer:
+        return shared_table.read_status()
+    return health_monitor.body
+
+
+# --- Shared Price Table (ORACLE_ROLE=ingest / api) ---
+def open_shared_prices() -> None:
+    """Ingest-процесс: создаёт таблицу цен в разделяемой памяти для API-воркеров."""
+    global shared_table
+    shared_table = shared_prices.SharedPriceTable.create(
+        config.SHARED_PRICES_PATH, config.SHARED_PRICES_CAPACITY, config.SHARED_STATUS_CAPACITY
+    )
+    shared_table.ensure_pairs(pair_registry.pairs)
+    logger.info("Shared price table created at %s (%d slots)", config.SHARED_PRICES_PATH, shared_table.capacity)
+
+async def attach_shared_prices() -> None:
+    """
+    API-воркер: открывает таблицу ingest-процесса и следит за ней. Ничего не опрашивает
+    и не слушает сам; подписывает локально только если ingest ещё не выложил подпись.
+    """
+    global shared_table, oracle_signer_account, signing_service, _shared_follow_task
+    shared_table = await shared_prices.wait_for_table(config.SHARED_PRICES_PATH, config.SHARED_PRICES_WAIT_SECONDS)
+    pair_registry.path = None  # реестр пар ведёт ingest-процесс
+    oracle_signer_account = Account.from_key(config.TESTNET_PRIVATE_KEY)
+    signing_service = signing.SigningService(oracle_signer_account.key, processes=0, max_batch=config.SIGNER_MAX_BATCH)
+    _sync_from_shared_prices()
+    _shared_follow_task = asyncio.create_task(_follow_shared_prices())
+    logger.info("Attached to shared price table %s (%d pairs)", config.SHARED_PRICES_PATH, len(pair_registry))
+
+def _sync_from_shared_prices() -> None:
+    global _chain_id, _domain_separator
+    pair_registry.sync(shared_table.pairs())
+    chain_id = shared_table.chain_id
+    if chain_id and chain_id != _chain_id:
+        _chain_id = chain_id
+        _domain_separator = signing.domain_separator(chain_id, config.SIMPLE_ORACLE_ADDRESS)
+
+async def _follow_shared_prices() -> None:
+    """Переоткрывает таблицу после рестарта ingest, повторяет его реестр пар и раздаёт новые тики в поток цен."""
+    global shared_table
+    seen: Dict[str, tuple] = {}
+    while True:
+        await asyncio.sleep(config.SHARED_PRICES_POLL_SECONDS)
+        try:
+            if shared_table.stale():
+                logger.info("Shared price table was recreated, reopening.")
+                old, shared_table = shared_table, shared_prices.SharedPriceTable.open(config.SHARED_PRICES_PATH)
+                old.close()
+            _sync_from_shared_prices()
+            for pair in pair_registry.pairs:
+                if not price_hub.has_subscribers(pair):
+                    continue
+                entry = shared_table.read(pair)
+                if entry is None or seen.get(pair) == entry[:2]:
+                    continue
+                seen[pair] = entry[:2]
+                ts, price, signature = entry
+                signed_data = _signed_price_response(pair, pair_registry.asset_id(pair), price, ts, signature) if signature else None
+                price_hub.publish(pair, price_message(pair), price_message(pair, signed_data) if signed_data else None)
+        except Exception as e:
+            logger.error("Shared price table follow error: %s", e)
+
+def close_shared_prices() -> None:
+    global shared_table
+    if _shared_follow_task and not _shared_follow_task.done():
+        _shared_follow_task.cancel()
+    if shared_table is not None:
+        shared_table.close()
+        shared_table = None
 
 
 # --- Test Loop (Matches user's new file) ---
 async def _main():
     await init_web3_and_contract()
     await event_listener_startup()
-    await price_polling_loop()
+    await price_source_loop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,155 @@
+# --- START OF FILE pair_registry.py ---
+
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from eth_utils import keccak
+
+logger = logging.getLogger("pair_registry")
+
+
+def normalize_pair(name: str) -> str:
+    """'btc-usdt', 'BTC_USDT', ' BTC/USDT ' → 'BTC/USDT'. Слитное 'BTCUSDT' не меняется."""
+    return name.strip().upper().replace("-", "/").replace("_", "/")
+
+
+def pair_symbol(pair: str) -> str:
+    """Символ Binance: 'BTC/USDT' → 'BTCUSDT'."""
+    return pair.replace("/", "")
+
+
+class PairRegistry:
+    """
+    Отслеживаемые пары с индексами в обе стороны: пара → assetId (keccak256 строки пары,
+    как в контракте), assetId → пара и символ Binance → пара. Все поиски O(1).
+    Пары можно добавлять и удалять на лету; подписчики on_change узнают об изменениях.
+    Если задан path, список пар сохраняется в файл и переживает рестарт.
+    """
+
+    def __init__(self, pairs: List[str], path: Optional[str] = None):
+        self.path = path
+        self._asset_ids: Dict[str, bytes] = {}  # порядок вставки = порядок пар
+        self._by_asset_id: Dict[bytes, str] = {}
+        self._by_symbol: Dict[str, str] = {}
+        self._listeners: List[Callable[[], None]] = []
+        for pair in self._load(pairs):
+            try:
+                self._index(pair)
+            except (ValueError, AttributeError) as e:
+                logger.warning("Skipping asset pair %r: %s", pair, e)
+
+    def _load(self, default: List[str]) -> List[str]:
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    pairs = json.load(f)
+                if isinstance(pairs, list):
+                    return pairs
+                logger.warning("Pair registry %s is not a list, using configured pairs", self.path)
+            except (OSError, ValueError) as e:
+                logger.warning("Cannot read pair registry %s, using configured pairs: %s", self.path, e)
+        return default
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.pairs, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error("Cannot save pair registry %s: %s", self.path, e)
+
+    def _index(self, pair: str) -> str:
+        pair = normalize_pair(pair)
+        base, sep, quote = pair.partition("/")
+        if not (base and sep and quote) or "/" in quote:
+            raise ValueError(f"Invalid asset pair '{pair}', expected BASE/QUOTE")
+        if pair not in self._asset_ids:
+            asset_id = keccak(text=pair)
+            self._asset_ids[pair] = asset_id
+            self._by_asset_id[asset_id] = pair
+            self._by_symbol[pair_symbol(pair)] = pair
+        return pair
+
+    @property
+    def pairs(self) -> List[str]:
+        return list(self._asset_ids)
+
+    def __contains__(self, pair: str) -> bool:
+        return pair in self._asset_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.pairs)
+
+    def __len__(self) -> int:
+        return len(self._asset_ids)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Отслеживаемая пара по любой записи ('BTC-USDT', 'BTC/USDT', 'BTCUSDT') или None."""
+        pair = normalize_pair(name)
+        if pair in self._asset_ids:
+            return pair
+        return self._by_symbol.get(pair)
+
+    def asset_id(self, pair: str) -> Optional[bytes]:
+        return self._asset_ids.get(pair)
+
+    def pair_for_asset_id(self, asset_id: bytes) -> Optional[str]:
+        return self._by_asset_id.get(bytes(asset_id))
+
+    def pair_for_symbol(self, symbol: str) -> Optional[str]:
+        return self._by_symbol.get(symbol.upper())
+
+    def on_change(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Регистрирует колбэк изменения списка пар. Возвращает функцию отписки."""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    def _changed(self) -> None:
+        self._save()
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Pair registry listener failed: %s", e, exc_info=True)
+
+    def add(self, name: str) -> str:
+        """Добавляет пару (ValueError, если запись некорректна). Возвращает каноническую форму."""
+        existing = self.resolve(name)
+        if existing is not None:
+            return existing
+        before = len(self._asset_ids)
+        pair = self._index(name)
+        if len(self._asset_ids) != before:
+            logger.info("Pair %s added (assetId %s)", pair, self._asset_ids[pair].hex())
+            self._changed()
+        return pair
+
+    def sync(self, pairs: List[str]) -> None:
+        """Приводит реестр к заданному списку (API-воркер повторяет реестр ingest-процесса)."""
+        if pairs == self.pairs:
+            return
+        self._asset_ids.clear()
+        self._by_asset_id.clear()
+        self._by_symbol.clear()
+        for pair in pairs:
+            self._index(pair)
+        self._changed()
+
+    def remove(self, name: str) -> Optional[str]:
+        """Убирает пару. Возвращает каноническую форму или None, если пара не отслеживалась."""
+        pair = self.resolve(name)
+        if pair is None:
+            return None
+        asset_id = self._asset_ids.pop(pair)
+        self._by_asset_id.pop(asset_id, None)
+        self._by_symbol.pop(pair_symbol(pair), None)
+        logger.info("Pair %s removed", pair)
+        self._changed()
+        return pair
+
+# --- END OF FILE pair_registry.py ---
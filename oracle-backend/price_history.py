@@ -0,0 +1,127 @@
+# --- START OF FILE price_history.py ---
+
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+# Результат PriceRing.append: тик отброшен (0, ложно), добавлен, перезаписал последний (тот же timestamp)
+REJECTED = 0
+APPENDED = 1
+OVERWRITTEN = 2
+
+
+class PriceRing:
+    """Кольцевой буфер (timestamp, price) фиксированной ёмкости на массивах array."""
+
+    __slots__ = ("capacity", "_ts", "_px", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("PriceRing capacity must be positive")
+        self.capacity = capacity
+        self._ts = array("q", bytes(8 * capacity))  # int64 unix-секунды
+        self._px = array("d", bytes(8 * capacity))  # float64 цены
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _pos(self, i: int) -> int:
+        """Логический индекс (0 — самый старый тик) → позиция в массиве."""
+        return (self._start + i) % self.capacity
+
+    def append(self, ts: int, price: float) -> int:
+        """
+        Добавляет тик. Тик с тем же timestamp перезаписывает последний, более старый отбрасывается.
+        Возвращает APPENDED, OVERWRITTEN или REJECTED.
+        """
+        if self._size:
+            last = self._pos(self._size - 1)
+            last_ts = self._ts[last]
+            if ts == last_ts:
+                self._px[last] = price
+                return OVERWRITTEN
+            if ts < last_ts:
+                return REJECTED
+        if self._size < self.capacity:
+            pos = self._pos(self._size)
+            self._size += 1
+        else:  # буфер полон — затираем самый старый тик
+            pos = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._ts[pos] = ts
+        self._px[pos] = price
+        return APPENDED
+
+    def latest(self) -> Optional[Tuple[int, float]]:
+        if not self._size:
+            return None
+        pos = self._pos(self._size - 1)
+        return self._ts[pos], self._px[pos]
+
+    def _bisect_left(self, ts: int) -> int:
+        """Первый логический индекс с timestamp >= ts (O(log n))."""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ts[self._pos(mid)] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def nearest(self, ts: int) -> Optional[Tuple[int, float]]:
+        """Тик, ближайший по времени к ts."""
+        if not self._size:
+            return None
+        i = self._bisect_left(ts)
+        candidates = [j for j in (i - 1, i) if 0 <= j < self._size]
+        best = min(candidates, key=lambda j: abs(self._ts[self._pos(j)] - ts))
+        pos = self._pos(best)
+        return self._ts[pos], self._px[pos]
+
+    def items(self, since: Optional[int] = None) -> Iterator[Tuple[int, float]]:
+        """Тики в хронологическом порядке (начиная с since, если задан)."""
+        start = self._bisect_left(since) if since is not None else 0
+        for i in range(start, self._size):
+            pos = self._pos(i)
+            yield self._ts[pos], self._px[pos]
+
+
+class PriceHistory:
+    """История цен по парам: один PriceRing на пару, память ограничена capacity."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._rings: Dict[str, PriceRing] = {}
+
+    def record(self, pair: str, ts: int, price: float) -> int:
+        ring = self._rings.get(pair)
+        if ring is None:
+            ring = self._rings[pair] = PriceRing(self.capacity)
+        return ring.append(ts, price)
+
+    def latest(self, pair: str) -> Optional[dict]:
+        ring = self._rings.get(pair)
+        tick = ring.latest() if ring else None
+        return {"price": tick[1], "timestamp": tick[0]} if tick else None
+
+    def nearest(self, pair: str, ts: int, max_diff: Optional[int] = None) -> Optional[dict]:
+        """Цена, ближайшая к ts; None, если истории нет или ближайший тик дальше max_diff."""
+        ring = self._rings.get(pair)
+        tick = ring.nearest(ts) if ring else None
+        if tick is None or (max_diff is not None and abs(tick[0] - ts) > max_diff):
+            return None
+        return {"price": tick[1], "timestamp": tick[0]}
+
+    def drop(self, pair: str) -> None:
+        self._rings.pop(pair, None)
+
+    def ticks(self, pair: str, since: Optional[int] = None) -> Iterator[Tuple[int, float]]:
+        ring = self._rings.get(pair)
+        return ring.items(since) if ring else iter(())
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self._rings.values())
+
+# --- END OF FILE price_history.py ---
@@ -0,0 +1,264 @@
+# --- START OF FILE price_sources.py ---
+
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from binance import AsyncClient
+from binance.exceptions import BinanceAPIException
+
+from pair_registry import pair_symbol
+
+logger = logging.getLogger("price_sources")
+
+# Котировка источника: (цена, объём за 24 ч в базовой валюте или nan, если площадка его не даёт)
+Quote = Tuple[float, float]
+
+
+class PriceSource:
+    """Адаптер одной площадки. fetch получает котировки всех запрошенных пар, которые там торгуются."""
+
+    name = ""
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class BinanceSource(PriceSource):
+    """
+    Binance через python-binance: одним запросом ticker/price на пачку символов, либо поштучно.
+    with_volume — ticker/24hr вместо ticker/price (тяжелее по весу запроса, но с объёмом для VWAP).
+    """
+
+    name = "binance"
+
+    def __init__(self, batch: bool, max_symbols: int, with_volume: bool = False):
+        self._batch = batch
+        self._max_symbols = max(1, max_symbols)
+        self._with_volume = with_volume
+        self._client: Optional[AsyncClient] = None
+
+    async def _get_client(self) -> AsyncClient:
+        if self._client is None:
+            self._client = await AsyncClient.create()
+        return self._client
+
+    def _quote(self, ticker: dict) -> Quote:
+        if self._with_volume:
+            return float(ticker["lastPrice"]), float(ticker["volume"])
+        return float(ticker["price"]), math.nan
+
+    async def _ticker(self, **params):
+        client = await self._get_client()
+        if self._with_volume:
+            return await client.get_ticker(**params)
+        return await client.get_symbol_ticker(**params)
+
+    async def _fetch_one(self, pair: str) -> Optional[Quote]:
+        try:
+            return self._quote(await self._ticker(symbol=pair_symbol(pair)))
+        except BinanceAPIException as e:
+            logger.warning("Binance error for %s: %s", pair, e)
+            return None
+
+    async def _fetch_chunk(self, pairs: List[str]) -> Dict[str, Quote]:
+        """Одним запросом получает цены для пачки пар."""
+        by_symbol = {pair_symbol(p): p for p in pairs}
+        symbols = json.dumps(list(by_symbol), separators=(",", ":"))
+        try:
+            tickers = await self._ticker(symbols=symbols)
+        except BinanceAPIException as e:
+            # Одна невалидная пара (-1121 Invalid symbol) валит весь запрос — добираем поштучно
+            logger.warning("Batched ticker request failed (%s), falling back to per-symbol requests", e)
+            quotes = await asyncio.gather(*[self._fetch_one(p) for p in pairs])
+            return {p: quote for p, quote in zip(pairs, quotes) if quote is not None}
+        return {by_symbol[t["symbol"]]: self._quote(t) for t in tickers if t.get("symbol") in by_symbol}
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        if not self._batch:
+            quotes = await asyncio.gather(*[self._fetch_one(p) for p in pairs])
+            return {p: quote for p, quote in zip(pairs, quotes) if quote is not None}
+        chunks = [pairs[i:i + self._max_symbols] for i in range(0, len(pairs), self._max_symbols)]
+        quotes: Dict[str, Quote] = {}
+        for chunk_quotes in await asyncio.gather(*[self._fetch_chunk(c) for c in chunks]):
+            quotes.update(chunk_quotes)
+        return quotes
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close_connection()
+            self._client = None
+
+
+class _RestSource(PriceSource):
+    """Общее для площадок с публичным REST API: одна aiohttp-сессия на адаптер."""
+
+    def __init__(self, timeout: float):
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_json(self, url: str, params: Optional[dict] = None):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self._timeout, headers={"User-Agent": "simple-oracle"})
+        async with self._session.get(url, params=params) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class OkxSource(_RestSource):
+    """OKX: все спотовые тикеры одним запросом, инструменты вида BTC-USDT."""
+
+    name = "okx"
+    URL = "https://www.okx.com/api/v5/market/tickers"
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        wanted = {pair.replace("/", "-"): pair for pair in pairs}
+        body = await self._get_json(self.URL, {"instType": "SPOT"})
+        return {
+            wanted[t["instId"]]: (float(t["last"]), float(t["vol24h"]))
+            for t in body.get("data", ())
+            if t.get("instId") in wanted and t.get("last")
+        }
+
+
+class BybitSource(_RestSource):
+    """Bybit: все спотовые тикеры одним запросом, символы как у Binance (BTCUSDT)."""
+
+    name = "bybit"
+    URL = "https://api.bybit.com/v5/market/tickers"
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        wanted = {pair_symbol(pair): pair for pair in pairs}
+        body = await self._get_json(self.URL, {"category": "spot"})
+        return {
+            wanted[t["symbol"]]: (float(t["lastPrice"]), float(t["volume24h"]))
+            for t in body.get("result", {}).get("list", ())
+            if t.get("symbol") in wanted and t.get("lastPrice")
+        }
+
+
+class CoinbaseSource(_RestSource):
+    """Coinbase Exchange: тикер на продукт (BTC-USDT), запросы по парам идут параллельно."""
+
+    name = "coinbase"
+    URL = "https://api.exchange.coinbase.com/products/{}/ticker"
+
+    async def _fetch_one(self, pair: str) -> Optional[Quote]:
+        try:
+            t = await self._get_json(self.URL.format(pair.replace("/", "-")))
+        except aiohttp.ClientResponseError as e:
+            if e.status != 404:  # 404 — пара на площадке не торгуется
+                logger.warning("Coinbase error for %s: %s", pair, e)
+            return None
+        return float(t["price"]), float(t["volume"])
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        quotes = await asyncio.gather(*[self._fetch_one(p) for p in pairs])
+        return {p: quote for p, quote in zip(pairs, quotes) if quote is not None}
+
+
+class SimulatedMarket:
+    """
+    Общая "истинная" цена для офлайн-заглушек: случайное блуждание от anchor(pair)
+    (последней известной цены) или start_price, один шаг в секунду.
+    """
+
+    def __init__(self, anchor: Callable[[str], Optional[float]], start_price: float = 100.0,
+                 volatility: float = 0.001, seed: Optional[int] = None):
+        self._anchor = anchor
+        self._start_price = start_price
+        self._volatility = volatility
+        self._rng = random.Random(seed)
+        self._prices: Dict[str, Tuple[int, float]] = {}  # pair → (секунда, цена)
+
+    def price(self, pair: str) -> float:
+        now = int(time.time())
+        last = self._prices.get(pair)
+        if last is not None and last[0] == now:
+            return last[1]
+        price = last[1] if last is not None else (self._anchor(pair) or self._start_price)
+        price *= math.exp(self._rng.gauss(0.0, self._volatility))
+        self._prices[pair] = (now, price)
+        return price
+
+
+class SimulatedSource(PriceSource):
+    """
+    Офлайн-заглушка площадки: цена SimulatedMarket с собственным шумом. С заданной
+    вероятностью выдаёт "шпильку" (выброс) или не отвечает, чтобы проверять агрегацию
+    и отбраковку без сети.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        market: SimulatedMarket,
+        noise: float = 0.0005,
+        wick_probability: float = 0.0,
+        outage_probability: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self._market = market
+        self._noise = noise
+        self._wick_probability = wick_probability
+        self._outage_probability = outage_probability
+        self._rng = random.Random(seed)
+
+    async def fetch(self, pairs: List[str]) -> Dict[str, Quote]:
+        if self._rng.random() < self._outage_probability:
+            raise ConnectionError(f"{self.name}: simulated outage")
+        quotes = {}
+        for pair in pairs:
+            price = self._market.price(pair) * (1 + self._rng.gauss(0.0, self._noise))
+            if self._rng.random() < self._wick_probability:
+                price *= self._rng.choice((0.8, 1.25))
+            quotes[pair] = (price, self._rng.uniform(10.0, 1000.0))
+        return quotes
+
+
+def build_sources(
+    names: List[str],
+    timeout: float,
+    binance_batch: bool,
+    binance_max_symbols: int,
+    with_volume: bool,
+    anchor: Callable[[str], Optional[float]],
+    sim_wick_probability: float = 0.0,
+    sim_outage_probability: float = 0.0,
+) -> List[PriceSource]:
+    """Адаптеры по именам из PRICE_SOURCES. Имена sim* — офлайн-заглушки."""
+    sources: List[PriceSource] = []
+    market: Optional[SimulatedMarket] = None
+    for name in names:
+        if name == "binance":
+            sources.append(BinanceSource(binance_batch, binance_max_symbols, with_volume))
+        elif name == "okx":
+            sources.append(OkxSource(timeout))
+        elif name == "bybit":
+            sources.append(BybitSource(timeout))
+        elif name == "coinbase":
+            sources.append(CoinbaseSource(timeout))
+        elif name.startswith("sim"):
+            market = market or SimulatedMarket(anchor)
+            sources.append(SimulatedSource(
+                name, market, wick_probability=sim_wick_probability, outage_probability=sim_outage_probability
+            ))
+        else:
+            raise ValueError(f"Unknown price source '{name}'")
+    return sources
+
+# --- END OF FILE price_sources.py ---
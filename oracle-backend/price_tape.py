@@ -0,0 +1,178 @@
+# --- START OF FILE price_tape.py ---
+
+import logging
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("price_tape")
+
+# Сегмент: заголовок (magic + число записей) и массив записей фиксированного размера
+_MAGIC = b"PTAPE1\0\0"
+_HEADER = struct.Struct("<8sQ")
+_RECORD = struct.Struct("<qd")  # timestamp int64, price float64
+_SUFFIX = ".tape"
+
+
+def _pair_dir_name(pair: str) -> str:
+    return pair.replace("/", "-")
+
+
+class _Segment:
+    """Один предвыделенный файл сегмента, отображённый в память."""
+
+    def __init__(self, path: str, capacity: int, create: bool):
+        size = _HEADER.size + capacity * _RECORD.size
+        self.path = path
+        self.capacity = capacity
+        self._file = open(path, "w+b" if create else "r+b")
+        if create:
+            self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        if create:
+            _HEADER.pack_into(self._mm, 0, _MAGIC, 0)
+            self.count = 0
+        else:
+            magic, self.count = _HEADER.unpack_from(self._mm, 0)
+            if magic != _MAGIC:
+                self.close()
+                raise ValueError(f"Not a price tape segment: {path}")
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def append(self, ts: int, price: float) -> None:
+        _RECORD.pack_into(self._mm, _HEADER.size + self.count * _RECORD.size, ts, price)
+        self.count += 1
+        # Счётчик обновляется после записи, поэтому оборванная запись не будет прочитана
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self.count)
+
+    def overwrite_last(self, ts: int, price: float) -> bool:
+        """Перезаписывает цену последней записи, если у неё тот же timestamp."""
+        if not self.count:
+            return False
+        offset = _HEADER.size + (self.count - 1) * _RECORD.size
+        if _RECORD.unpack_from(self._mm, offset)[0] != ts:
+            return False
+        _RECORD.pack_into(self._mm, offset, ts, price)
+        return True
+
+    def close(self) -> None:
+        if not self._mm.closed:
+            self._mm.flush()
+            self._mm.close()
+        self._file.close()
+
+
+def _read_segment(path: str) -> List[Tuple[int, float]]:
+    """Читает все записи сегмента через mmap (только чтение)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, count = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC:
+                logger.warning("Skipping corrupt price tape segment %s", path)
+                return []
+            count = min(count, (len(mm) - _HEADER.size) // _RECORD.size)
+            end = _HEADER.size + count * _RECORD.size
+            return list(_RECORD.iter_unpack(mm[_HEADER.size:end]))
+
+
+class PriceTape:
+    """
+    Append-only лента тиков на диске: по каталогу на пару, сегменты фиксированного
+    размера с ротацией и удалением старых сегментов сверх max_segments.
+    """
+
+    def __init__(self, directory: str, segment_records: int, max_segments: int):
+        self.directory = directory
+        self.segment_records = max(1, segment_records)
+        self.max_segments = max(1, max_segments)
+        self._writers: Dict[str, _Segment] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _pair_dir(self, pair: str) -> str:
+        return os.path.join(self.directory, _pair_dir_name(pair))
+
+    def _segments(self, pair: str) -> List[str]:
+        """Пути сегментов пары от старого к новому."""
+        pair_dir = self._pair_dir(pair)
+        if not os.path.isdir(pair_dir):
+            return []
+        names = sorted(n for n in os.listdir(pair_dir) if n.endswith(_SUFFIX))
+        return [os.path.join(pair_dir, n) for n in names]
+
+    def _current(self, pair: str) -> Optional[_Segment]:
+        """Открытый сегмент пары; после рестарта — последний сегмент на диске (даже заполненный)."""
+        seg = self._writers.get(pair)
+        if seg is not None:
+            return seg
+        segments = self._segments(pair)
+        if not segments:
+            return None
+        try:
+            seg = _Segment(segments[-1], self.segment_records, create=False)
+        except (OSError, ValueError) as e:
+            logger.warning("Cannot reopen price tape segment %s: %s", segments[-1], e)
+            return None
+        self._writers[pair] = seg
+        return seg
+
+    def _writer(self, pair: str) -> _Segment:
+        seg = self._current(pair)
+        if seg is not None and not seg.full:
+            return seg
+        if seg is not None:
+            seg.close()
+        # Ротация ленивая: заполненный сегмент остаётся открытым до следующей записи,
+        # чтобы тик той же секунды мог заменить его последнюю запись
+        segments = self._segments(pair)
+        os.makedirs(self._pair_dir(pair), exist_ok=True)
+        seq = int(os.path.basename(segments[-1])[:-len(_SUFFIX)]) + 1 if segments else 1
+        path = os.path.join(self._pair_dir(pair), f"{seq:012d}{_SUFFIX}")
+        seg = self._writers[pair] = _Segment(path, self.segment_records, create=True)
+        self._enforce_retention(pair)
+        return seg
+
+    def _enforce_retention(self, pair: str) -> None:
+        segments = self._segments(pair)
+        for path in segments[:-self.max_segments]:
+            try:
+                os.remove(path)
+                logger.info("Price tape retention: removed %s", path)
+            except OSError as e:
+                logger.warning("Cannot remove old price tape segment %s: %s", path, e)
+
+    def append(self, pair: str, ts: int, price: float, overwrite: bool = False) -> None:
+        """overwrite — тик с тем же timestamp, что и последний: заменяет его запись, а не добавляет новую."""
+        seg = self._current(pair) if overwrite else None
+        if seg is not None and seg.overwrite_last(ts, price):
+            return
+        self._writer(pair).append(ts, price)
+
+    def load(self, pair: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Последние limit тиков пары в хронологическом порядке."""
+        chunks: List[List[Tuple[int, float]]] = []
+        total = 0
+        for path in reversed(self._segments(pair)):
+            try:
+                records = _read_segment(path)
+            except (OSError, ValueError) as e:
+                logger.warning("Cannot read price tape segment %s: %s", path, e)
+                continue
+            chunks.append(records)
+            total += len(records)
+            if limit is not None and total >= limit:
+                break
+        ticks = [tick for chunk in reversed(chunks) for tick in chunk]
+        return ticks[-limit:] if limit is not None and limit > 0 else ticks
+
+    def close(self) -> None:
+        for seg in self._writers.values():
+            seg.close()
+        self._writers.clear()
+
+# --- END OF FILE price_tape.py ---
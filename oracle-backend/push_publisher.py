@@ -0,0 +1,124 @@
+# --- START OF FILE push_publisher.py ---
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("push_publisher")
+
+
+class PushPublisher:
+    """
+    Проактивная публикация цен в контракт. Каждый новый тик сравнивается с последней
+    опубликованной ончейн ценой пары; пара публикуется, только если цена ушла дальше
+    deviation (доля) или с публикации прошло heartbeat секунд. Все сработавшие пары
+    уходят одной транзакцией (до max_batch элементов), так что расход газа растёт
+    с волатильностью, а не со временем, а устаревание ончейн цены ограничено heartbeat.
+
+    prepare(pair, price, ts) подписывает элемент пакета, submit_batch отправляет пакет
+    и возвращает future квитанции. Пока транзакция пары в полёте, новые тики пары ждут.
+    """
+
+    def __init__(
+        self,
+        prepare: Callable[[str, float, int], Awaitable[tuple]],
+        submit_batch: Callable[[List[tuple]], Awaitable[asyncio.Future]],
+        deviation: float,
+        heartbeat: int,
+        max_batch: int,
+        on_published: Optional[Callable[[str, str], None]] = None,
+    ):
+        self._prepare = prepare
+        self._submit_batch = submit_batch
+        self._deviation = deviation
+        self._heartbeat = heartbeat
+        self._max_batch = max(1, max_batch)
+        self._on_published = on_published  # (pair, причина) — для метрик
+        self._published: Dict[str, Tuple[float, int]] = {}  # pair → (цена, timestamp) в контракте
+        self._pending: Dict[str, Tuple[float, int, str]] = {}  # сработавшие пары до отправки
+        self._in_flight: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def published(self) -> Dict[str, Tuple[float, int]]:
+        return dict(self._published)
+
+    def seed(self, pair: str, price: float, ts: int) -> None:
+        """Учитывает цену, уже опубликованную в контракте (например, из логов при старте)."""
+        current = self._published.get(pair)
+        if current is None or ts > current[1]:
+            self._published[pair] = (price, ts)
+
+    def forget(self, pair: str) -> None:
+        self._published.pop(pair, None)
+        self._pending.pop(pair, None)
+
+    def _trigger(self, pair: str, price: float, ts: int) -> Optional[str]:
+        last = self._published.get(pair)
+        if last is None:
+            return "initial"
+        last_price, last_ts = last
+        if ts <= last_ts:
+            return None
+        if abs(price - last_price) >= self._deviation * last_price:
+            return "deviation"
+        if ts - last_ts >= self._heartbeat:
+            return "heartbeat"
+        return None
+
+    def on_ticks(self, ticks: List[tuple]) -> None:
+        """Проверяет тики (pair, price, ts); сработавшие пары отправляются пачкой на следующей итерации цикла."""
+        for pair, price, ts in ticks:
+            if pair in self._in_flight:
+                continue
+            reason = self._trigger(pair, price, ts)
+            if reason is not None:
+                self._pending[pair] = (price, ts, reason)
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        # Тики, пришедшие пока отправлялась пачка, уходят следующей пачкой, а не ждут нового тика
+        while self._pending:
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        batch, self._pending = self._pending, {}
+        self._in_flight.update(batch)
+        pairs = list(batch)
+        for i in range(0, len(pairs), self._max_batch):
+            chunk = {pair: batch[pair] for pair in pairs[i:i + self._max_batch]}
+            try:
+                items = await asyncio.gather(*[self._prepare(pair, price, ts) for pair, (price, ts, _) in chunk.items()])
+                receipt_future = await self._submit_batch(list(items))
+            except Exception as e:
+                logger.error("Push update of %s failed: %s", ", ".join(chunk), e, exc_info=True)
+                self._in_flight.difference_update(chunk)
+                continue
+            logger.info("Push update of %d pairs sent: %s", len(chunk), ", ".join(
+                f"{pair} ({reason})" for pair, (_, _, reason) in chunk.items()
+            ))
+            receipt_future.add_done_callback(lambda fut, chunk=chunk: self._settle(chunk, fut))
+
+    def _settle(self, chunk: Dict[str, Tuple[float, int, str]], fut: asyncio.Future) -> None:
+        self._in_flight.difference_update(chunk)
+        if fut.cancelled():
+            return
+        if fut.exception() is not None or fut.result().get("status") != 1:
+            # Цена не попала в контракт — следующий тик пары сработает снова
+            logger.error("Push update of %s did not land: %s", ", ".join(chunk), fut.exception() or "reverted")
+            return
+        for pair, (price, ts, reason) in chunk.items():
+            self.seed(pair, price, ts)
+            if self._on_published is not None:
+                self._on_published(pair, reason)
+
+    async def stop(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+# --- END OF FILE push_publisher.py ---
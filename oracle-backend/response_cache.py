@@ -0,0 +1,64 @@
+# --- START OF FILE response_cache.py ---
+
+import hashlib
+from typing import Optional
+
+import orjson
+
+try:  # msgpack необязателен: без него клиенты с Accept: application/msgpack получают JSON
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def dumps(data) -> bytes:
+    """Компактный JSON (orjson): в разы быстрее json.dumps и сразу отдаёт bytes."""
+    return orjson.dumps(data)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Клиент просит msgpack и библиотека установлена."""
+    return msgpack is not None and bool(accept) and (MSGPACK_MEDIA_TYPE in accept or "application/x-msgpack" in accept)
+
+
+class CachedBody:
+    """
+    Готовый ответ для одного тика: данные, их JSON-байты и ETag. Собирается один раз на тик
+    и отдаётся всем запросам до следующего тика; msgpack-вариант сериализуется при первом запросе.
+    """
+
+    __slots__ = ("data", "json", "etag", "_msgpack")
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.json = dumps(data)
+        self.etag = '"%s"' % hashlib.blake2b(self.json, digest_size=8).hexdigest()
+        self._msgpack: Optional[bytes] = None
+
+    @property
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(self.data)
+        return self._msgpack
+
+    def render(self, accept: Optional[str]) -> tuple:
+        """(тело, media type, ETag) в формате, который просит клиент."""
+        if wants_msgpack(accept):
+            return self.msgpack, MSGPACK_MEDIA_TYPE, self.etag[:-1] + '-mp"'
+        return self.json, JSON_MEDIA_TYPE, self.etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match совпадает с ETag (слабое сравнение, как требует RFC 9110 для GET)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+# --- END OF FILE response_cache.py ---
@@ -0,0 +1,260 @@
+# --- START OF FILE rpc_pool.py ---
+
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+from web3 import AsyncHTTPProvider
+from web3.providers.async_base import AsyncBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+import metrics
+
+logger = logging.getLogger("rpc_pool")
+
+# Запись и чтение nonce идут на один закреплённый узел: разные узлы по-разному видят мемпул,
+# и "pending" nonce с одного может не учитывать транзакцию, отправленную через другой
+PINNED_METHODS = frozenset({"eth_sendRawTransaction", "eth_sendTransaction", "eth_getTransactionCount"})
+# Коды JSON-RPC, означающие проблему узла, а не запроса (лимит запросов у провайдера)
+TRANSIENT_ERROR_CODES = frozenset({-32005, 429})
+
+
+class EndpointError(Exception):
+    """Узел не ответил по существу: сетевая ошибка, таймаут или лимит провайдера."""
+
+
+class RpcEndpoint:
+    """Один узел пула и его статистика: EWMA латентности, ошибки подряд, высота head."""
+
+    def __init__(self, index: int, url: str, timeout: float):
+        self.url = url
+        self.label = f"{index}:{urlparse(url).hostname or url}"  # без пути: в нём бывает API-ключ
+        self.provider = AsyncHTTPProvider(url, request_kwargs={"timeout": timeout}, exception_retry_configuration=None)
+        self.latency = 0.0  # EWMA, секунды
+        self.errors = 0  # ошибок подряд
+        self.down_until = 0.0  # до этого момента (monotonic) узел не получает запросов
+        self.backoff = 0.0
+        self.head: Optional[int] = None
+        self.requests = 0
+        self.failures = 0
+
+    def up(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def record_success(self, elapsed: float) -> None:
+        self.latency = elapsed if not self.requests else 0.8 * self.latency + 0.2 * elapsed
+        self.requests += 1
+        self.errors = 0
+        self.backoff = 0.0
+        self.down_until = 0.0
+        metrics.RPC_ENDPOINT_SECONDS.observe(elapsed, self.label)
+
+    def record_failure(self, max_errors: int, max_backoff: float) -> bool:
+        """Учитывает ошибку; True, если узел только что выведен из ротации."""
+        self.requests += 1
+        self.failures += 1
+        self.errors += 1
+        metrics.RPC_ENDPOINT_ERRORS.inc(self.label)
+        if self.errors < max_errors:
+            return False
+        was_up = self.up(time.monotonic())
+        self.backoff = min(max_backoff, self.backoff * 2 if self.backoff else 1.0)
+        self.down_until = time.monotonic() + self.backoff
+        return was_up
+
+    def snapshot(self, now: float, best_head: Optional[int]) -> dict:
+        return {
+            "endpoint": self.label,
+            "up": self.up(now),
+            "latency_ms": round(self.latency * 1000, 3),
+            "consecutive_errors": self.errors,
+            "requests": self.requests,
+            "failures": self.failures,
+            "head_block": self.head,
+            "lag_blocks": best_head - self.head if best_head is not None and self.head is not None else None,
+        }
+
+
+class RpcPoolProvider(AsyncBaseProvider):
+    """
+    Провайдер web3 поверх нескольких HTTP-узлов. Узлы ранжируются по здоровью: выведенные из
+    ротации (max_errors ошибок подряд) и отстающие по head больше max_lag блоков — в конце,
+    остальные — по EWMA латентности.
+
+    Чтения хеджируются: запрос уходит на лучший узел, и если тот не ответил за hedge_after
+    секунд (или ответил ошибкой), тот же запрос уходит на следующий; берётся первый ответ.
+    Так хвост латентности ограничен hedge_after плюс латентностью второго узла, а не
+    таймаутом медленного провайдера. Записи (и pending nonce) закреплены за одним узлом,
+    пока он здоров. Фоновая задача раз в health_interval опрашивает eth_blockNumber
+    у всех узлов: так считается отставание и возвращаются в ротацию упавшие узлы.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        timeout: float = 10.0,
+        hedge_after: float = 0.75,
+        max_hedges: int = 1,
+        max_errors: int = 3,
+        max_backoff: float = 60.0,
+        max_lag: int = 3,
+        health_interval: float = 15.0,
+    ):
+        super().__init__()
+        if not urls:
+            raise ValueError("RpcPoolProvider needs at least one endpoint")
+        self.endpoints = [RpcEndpoint(i, url, timeout) for i, url in enumerate(urls)]
+        self._hedge_after = hedge_after
+        self._max_hedges = max(0, max_hedges)
+        self._max_errors = max(1, max_errors)
+        self._max_backoff = max_backoff
+        self._max_lag = max_lag
+        self._health_interval = health_interval
+        self._pinned: Optional[RpcEndpoint] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    def __str__(self) -> str:
+        return f"RPC pool of {len(self.endpoints)} endpoints"
+
+    @property
+    def best_head(self) -> Optional[int]:
+        heads = [e.head for e in self.endpoints if e.head is not None]
+        return max(heads) if heads else None
+
+    def _ranked(self) -> List[RpcEndpoint]:
+        now = time.monotonic()
+        best_head = self.best_head
+
+        def key(endpoint: RpcEndpoint):
+            lagging = best_head is not None and endpoint.head is not None and best_head - endpoint.head > self._max_lag
+            return (not endpoint.up(now), lagging, endpoint.latency)
+
+        return sorted(self.endpoints, key=key)
+
+    async def _call(self, endpoint: RpcEndpoint, method: RPCEndpoint, params: Any) -> RPCResponse:
+        started = time.perf_counter()
+        try:
+            response = await endpoint.provider.make_request(method, params)
+        except asyncio.CancelledError:
+            raise  # проигравший хедж — не ошибка узла
+        except Exception as e:
+            self._failed(endpoint, e)
+            raise EndpointError(f"{endpoint.label}: {type(e).__name__}: {e}") from e
+        error = response.get("error") if isinstance(response, dict) else None
+        if isinstance(error, dict) and error.get("code") in TRANSIENT_ERROR_CODES:
+            self._failed(endpoint, error.get("message"))
+            raise EndpointError(f"{endpoint.label}: {error.get('message')}")
+        endpoint.record_success(time.perf_counter() - started)
+        return response
+
+    def _failed(self, endpoint: RpcEndpoint, reason: Any) -> None:
+        if endpoint.record_failure(self._max_errors, self._max_backoff):
+            logger.warning("RPC endpoint %s taken out of rotation for %.0fs: %s", endpoint.label, endpoint.backoff, reason)
+        if endpoint is self._pinned and not endpoint.up(time.monotonic()):
+            self._pinned = None
+
+    async def _hedged(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        candidates = self._ranked()
+        pending = {asyncio.ensure_future(self._call(candidates[0], method, params))}
+        launched, hedges = 1, 0
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                can_hedge = launched < len(candidates) and hedges < self._max_hedges
+                done, pending = await asyncio.wait(
+                    pending, timeout=self._hedge_after if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not pending or (not done and can_hedge):
+                    if launched >= len(candidates):
+                        break
+                    if done:  # ошибка — это отказоустойчивость, а не хедж: лимит не расходуется
+                        logger.debug("RPC %s failed over to %s", method, candidates[launched].label)
+                    else:
+                        hedges += 1
+                        metrics.RPC_HEDGES.inc(method)
+                    pending.add(asyncio.ensure_future(self._call(candidates[launched], method, params)))
+                    launched += 1
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error or EndpointError(f"{method}: no RPC endpoint answered")
+
+    async def _pinned_call(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self._pinned is None:
+            self._pinned = self._ranked()[0]
+            logger.info("RPC writes pinned to %s", self._pinned.label)
+        return await self._call(self._pinned, method, params)
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method in PINNED_METHODS:
+            return await self._pinned_call(method, params)
+        return await self._hedged(method, params)
+
+    async def make_batch_request(self, requests):
+        # Пакет целиком уходит на лучший узел (web3 собирает пакеты только в явном batch_requests)
+        return await self._ranked()[0].provider.make_batch_request(requests)
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        await self.check_health()
+        now = time.monotonic()
+        return any(e.up(now) for e in self.endpoints)
+
+    async def _probe(self, endpoint: RpcEndpoint) -> None:
+        try:
+            response = await self._call(endpoint, RPCEndpoint("eth_blockNumber"), [])
+            endpoint.head = int(response["result"], 16)
+        except (EndpointError, KeyError, TypeError, ValueError) as e:
+            logger.debug("RPC health probe of %s failed: %s", endpoint.label, e)
+
+    async def check_health(self) -> None:
+        """Опрашивает head всех узлов; упавшие узлы, чей бэкофф истёк, получают шанс вернуться."""
+        now = time.monotonic()
+        await asyncio.gather(*[self._probe(e) for e in self.endpoints if e.up(now)])
+        pinned = self._pinned
+        best_head = self.best_head
+        if pinned is not None and best_head is not None and pinned.head is not None and best_head - pinned.head > self._max_lag:
+            logger.warning("Pinned RPC endpoint %s lags %d blocks, re-pinning", pinned.label, best_head - pinned.head)
+            self._pinned = None
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error("RPC health check failed: %s", e, exc_info=True)
+
+    def start(self) -> None:
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for endpoint in self.endpoints:
+            try:
+                await endpoint.provider.disconnect()
+            except Exception:
+                pass
+
+    def snapshot(self) -> List[dict]:
+        """Состояние узлов для /status, в порядке, в котором пул их сейчас выбирает."""
+        now = time.monotonic()
+        best_head = self.best_head
+        return [
+            {**e.snapshot(now, best_head), "pinned": e is self._pinned}
+            for e in self._ranked()
+        ]
+
+# --- END OF FILE rpc_pool.py ---
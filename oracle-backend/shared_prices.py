@@ -0,0 +1,223 @@
+# --- START OF FILE shared_prices.py ---
+
+import asyncio
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Таблица цен в разделяемой памяти (файл в /dev/shm) для режима "один ingest-процесс, N API-воркеров".
+# Пишет только ingest-процесс; воркеры читают без блокировок по протоколу seqlock:
+# писатель делает seq нечётным, пишет данные и снова делает seq чётным; читатель повторяет
+# чтение, если seq нечётный или изменился за время чтения.
+#
+# Заголовок: magic, version, capacity (слотов), status_capacity (байт), layout_gen (растёт при
+# занятии/освобождении слотов), chain_id. Дальше слоты цен, в конце — регион со снимком /status.
+
+MAGIC = b"ORPT"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIQQ")  # magic, version, capacity, status_capacity, layout_gen, chain_id
+_HEADER_SIZE = 64
+_LAYOUT_GEN_OFFSET = 16
+_CHAIN_ID_OFFSET = 24
+_SLOT = struct.Struct("<32sqd65sB")  # pair, timestamp, price, signature, has_signature (после 8 байт seq)
+_SLOT_SIZE = 128  # 8 байт seq + _SLOT, с выравниванием
+_STATUS_HEADER_SIZE = 16  # seq (8 байт) и длина тела (4 байта)
+_SEQ = struct.Struct("<Q")
+_MAX_RETRIES = 1000
+
+
+class SharedPriceTable:
+    """Последние цены пар (с готовой подписью) и снимок /status в разделяемой памяти."""
+
+    def __init__(self, path: str, mm: mmap.mmap, capacity: int, status_capacity: int, writer: bool):
+        self.path = path
+        self._mm = mm
+        self.capacity = capacity
+        self.status_capacity = status_capacity
+        self.writer = writer
+        self._status_offset = _HEADER_SIZE + capacity * _SLOT_SIZE
+        self._slots: Dict[str, int] = {}  # pair → индекс слота
+        self._layout_gen = -1
+        self._inode = os.stat(path).st_ino if os.path.exists(path) else None
+
+    @classmethod
+    def create(cls, path: str, capacity: int, status_capacity: int) -> "SharedPriceTable":
+        """Создаёт (пересоздаёт) таблицу. Вызывается единственным ingest-процессом."""
+        size = _HEADER_SIZE + capacity * _SLOT_SIZE + _STATUS_HEADER_SIZE + status_capacity
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+        with open(tmp, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), size)
+        _HEADER.pack_into(mm, 0, MAGIC, VERSION, capacity, status_capacity, 0, 0)
+        os.replace(tmp, path)  # читатели видят либо старую таблицу, либо полностью размеченную новую
+        table = cls(path, mm, capacity, status_capacity, writer=True)
+        table._layout_gen = 0
+        return table
+
+    def stale(self) -> bool:
+        """Читатель: ingest-процесс перезапустился и создал новую таблицу — нужно открыть заново."""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return False
+
+    @classmethod
+    def open(cls, path: str) -> "SharedPriceTable":
+        """Открывает таблицу только для чтения (API-воркер)."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity, status_capacity, _, _ = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            raise ValueError(f"{path} is not a shared price table (v{VERSION})")
+        return cls(path, mm, capacity, status_capacity, writer=False)
+
+    def close(self) -> None:
+        self._mm.close()
+
+    # --- seqlock ---
+
+    def _read_consistent(self, seq_offset: int, read):
+        for _ in range(_MAX_RETRIES):
+            seq = _SEQ.unpack_from(self._mm, seq_offset)[0]
+            if seq & 1:
+                time.sleep(0)  # запись в процессе — уступаем процессор писателю
+                continue
+            value = read()
+            if _SEQ.unpack_from(self._mm, seq_offset)[0] == seq:
+                return value
+        raise TimeoutError("Shared price table is being rewritten too often")
+
+    def _write_locked(self, seq_offset: int, write) -> None:
+        seq = _SEQ.unpack_from(self._mm, seq_offset)[0]
+        _SEQ.pack_into(self._mm, seq_offset, seq + 1)
+        write()
+        _SEQ.pack_into(self._mm, seq_offset, seq + 2)
+
+    # --- разметка слотов ---
+
+    @property
+    def layout_gen(self) -> int:
+        return _SEQ.unpack_from(self._mm, _LAYOUT_GEN_OFFSET)[0]
+
+    @property
+    def chain_id(self) -> Optional[int]:
+        return _SEQ.unpack_from(self._mm, _CHAIN_ID_OFFSET)[0] or None
+
+    def set_chain_id(self, chain_id: int) -> None:
+        _SEQ.pack_into(self._mm, _CHAIN_ID_OFFSET, chain_id)
+
+    def _slot_offset(self, index: int) -> int:
+        return _HEADER_SIZE + index * _SLOT_SIZE
+
+    def _read_slot(self, index: int) -> Tuple:
+        offset = self._slot_offset(index)
+        return self._read_consistent(offset, lambda: _SLOT.unpack_from(self._mm, offset + 8))
+
+    def _refresh_layout(self) -> None:
+        gen = self.layout_gen
+        if gen == self._layout_gen:
+            return
+        slots = {}
+        for index in range(self.capacity):
+            pair = self._read_slot(index)[0].rstrip(b"\0")
+            if pair:
+                slots[pair.decode()] = index
+        self._slots = slots
+        self._layout_gen = gen
+
+    def pairs(self) -> List[str]:
+        if not self.writer:
+            self._refresh_layout()
+        return list(self._slots)
+
+    def ensure_pairs(self, pairs: List[str]) -> None:
+        """Писатель: выделяет слоты под новые пары и освобождает слоты убранных."""
+        changed = False
+        for pair in [p for p in self._slots if p not in pairs]:
+            index = self._slots.pop(pair)
+            offset = self._slot_offset(index)
+            self._write_locked(offset, lambda: _SLOT.pack_into(self._mm, offset + 8, b"", 0, 0.0, b"", 0))
+            changed = True
+        for pair in pairs:
+            if pair in self._slots:
+                continue
+            encoded = pair.encode()
+            if len(encoded) > 32:
+                raise ValueError(f"Pair name '{pair}' is longer than 32 bytes")
+            used = set(self._slots.values())
+            free = next((i for i in range(self.capacity) if i not in used), None)
+            if free is None:
+                raise OverflowError(f"Shared price table is full ({self.capacity} pairs)")
+            offset = self._slot_offset(free)
+            self._write_locked(offset, lambda: _SLOT.pack_into(self._mm, offset + 8, encoded, 0, 0.0, b"", 0))
+            self._slots[pair] = free
+            changed = True
+        if changed:
+            self._layout_gen += 1
+            _SEQ.pack_into(self._mm, _LAYOUT_GEN_OFFSET, self._layout_gen)
+
+    # --- цены ---
+
+    def write(self, pair: str, ts: int, price: float, signature: Optional[bytes] = None) -> None:
+        """Писатель: последняя цена пары (и её подпись, когда она готова)."""
+        if pair not in self._slots:
+            self.ensure_pairs(list(self._slots) + [pair])
+        offset = self._slot_offset(self._slots[pair])
+        encoded = pair.encode()
+        self._write_locked(offset, lambda: _SLOT.pack_into(
+            self._mm, offset + 8, encoded, ts, price, signature or b"", 1 if signature else 0
+        ))
+
+    def read(self, pair: str) -> Optional[Tuple[int, float, Optional[bytes]]]:
+        """(timestamp, price, signature или None); None — пары нет или цены ещё не было."""
+        self._refresh_layout()
+        index = self._slots.get(pair)
+        if index is None:
+            return None
+        slot_pair, ts, price, signature, has_signature = self._read_slot(index)
+        if slot_pair.rstrip(b"\0").decode() != pair or ts == 0:
+            return None  # слот переразмечен между чтениями
+        return ts, price, signature if has_signature else None
+
+    # --- снимок /status ---
+
+    def write_status(self, body: bytes) -> None:
+        if len(body) > self.status_capacity:
+            raise ValueError(f"Status snapshot of {len(body)} bytes exceeds {self.status_capacity}")
+        offset = self._status_offset
+        data_offset = offset + _STATUS_HEADER_SIZE
+
+        def _write():
+            struct.pack_into("<I", self._mm, offset + 8, len(body))
+            self._mm[data_offset:data_offset + len(body)] = body
+
+        self._write_locked(offset, _write)
+
+    def read_status(self) -> Optional[bytes]:
+        offset = self._status_offset
+        data_offset = offset + _STATUS_HEADER_SIZE
+
+        def _read():
+            length = struct.unpack_from("<I", self._mm, offset + 8)[0]
+            return bytes(self._mm[data_offset:data_offset + length])
+
+        body = self._read_consistent(offset, _read)
+        return body or None
+
+
+async def wait_for_table(path: str, timeout: float) -> SharedPriceTable:
+    """API-воркер ждёт, пока ingest-процесс создаст таблицу."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return SharedPriceTable.open(path)
+        except (FileNotFoundError, ValueError):
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+# --- END OF FILE shared_prices.py ---
@@ -0,0 +1,178 @@
+# --- START OF FILE signing.py ---
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Optional
+
+from eth_abi import encode
+from eth_account import Account
+from eth_utils import keccak, to_bytes, to_checksum_address
+
+# Домен EIP-712 контракта SimpleOracle (см. EIP712("SimpleOracle", "1") в конструкторе)
+DOMAIN_NAME = "SimpleOracle"
+DOMAIN_VERSION = "1"
+PRICE_DECIMALS = 6
+
+EIP712_DOMAIN_TYPEHASH = keccak(
+    text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+PRICE_TYPEHASH = keccak(text="Price(string pair,uint256 price,uint256 timestamp)")
+# Тип, который проверяет SimpleOracle.fulfillPriceValidation
+PRICE_VALIDATION_TYPEHASH = keccak(text="PriceValidation(bytes32 assetId,uint256 timestamp,uint256 price)")
+PRICE_BUNDLE_TYPEHASH = keccak(text="PriceBundle(bytes32 root)")
+
+
+def price_to_uint(price: float) -> int:
+    """Цена в uint256 с PRICE_DECIMALS знаками (как в _eip712)."""
+    return int(price * 10**PRICE_DECIMALS)
+
+
+def domain_separator(chain_id: int, verifying_contract: str) -> bytes:
+    """hashStruct(EIP712Domain) — считается один раз на chain_id."""
+    return keccak(encode(
+        ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+        [
+            EIP712_DOMAIN_TYPEHASH,
+            keccak(text=DOMAIN_NAME),
+            keccak(text=DOMAIN_VERSION),
+            chain_id,
+            to_checksum_address(verifying_contract),
+        ],
+    ))
+
+
+@lru_cache(maxsize=4096)
+def _string_hash(value: str) -> bytes:
+    return keccak(text=value)
+
+
+def price_struct_hash(pair: str, price_uint: int, ts: int) -> bytes:
+    """hashStruct(Price{pair, price, timestamp})."""
+    return keccak(encode(
+        ["bytes32", "bytes32", "uint256", "uint256"],
+        [PRICE_TYPEHASH, _string_hash(pair), price_uint, ts],
+    ))
+
+
+def price_validation_struct_hash(asset_id: bytes, ts: int, price_uint: int) -> bytes:
+    """hashStruct(PriceValidation{assetId, timestamp, price}) для ончейн-фулфилмента."""
+    return keccak(encode(
+        ["bytes32", "bytes32", "uint256", "uint256"],
+        [PRICE_VALIDATION_TYPEHASH, asset_id, ts, price_uint],
+    ))
+
+
+def bundle_struct_hash(root: bytes) -> bytes:
+    """hashStruct(PriceBundle{root}) — корень дерева Меркла всех цен тика."""
+    return keccak(encode(["bytes32", "bytes32"], [PRICE_BUNDLE_TYPEHASH, root]))
+
+
+def typed_data_digest(domain_sep: bytes, struct_hash: bytes) -> bytes:
+    """keccak256("\\x19\\x01" ‖ domainSeparator ‖ structHash) — то, что подписывается."""
+    return keccak(b"\x19\x01" + domain_sep + struct_hash)
+
+
+def sign_digest(private_key, digest: bytes) -> bytes:
+    """Подписывает готовый EIP-712 digest, возвращает 65-байтную подпись (r, s, v)."""
+    return bytes(Account.unsafe_sign_hash(to_bytes(digest), private_key).signature)
+
+
+# --- Пул процессов для подписи ---
+
+_worker_key = None  # приватный ключ внутри процесса-воркера
+
+
+def _init_worker(private_key: bytes) -> None:
+    global _worker_key
+    _worker_key = private_key
+
+
+def _sign_digests_job(digests: List[bytes]) -> List[bytes]:
+    return [sign_digest(_worker_key, d) for d in digests]
+
+
+def _sign_transaction_job(tx: dict) -> bytes:
+    return bytes(Account.sign_transaction(tx, _worker_key).raw_transaction)
+
+
+class SigningService:
+    """
+    Выполняет ECDSA-подписи в пуле процессов, чтобы не блокировать event loop.
+    Запросы sign_digest, пришедшие в одной итерации цикла, уходят в пул одной пачкой.
+    При processes=0 подписывает прямо в event loop.
+    """
+
+    def __init__(self, private_key: bytes, processes: int, max_batch: int):
+        self._key = bytes(private_key)
+        self._max_batch = max(1, max_batch)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if processes > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._key,),
+            )
+        self._pending: list = []  # [(digest, future)]
+        self._dispatch_scheduled = False
+
+    async def sign_digest(self, digest: bytes) -> bytes:
+        if self._executor is None:
+            return sign_digest(self._key, digest)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((digest, fut))
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch, loop)
+        return await fut
+
+    async def sign_digests(self, digests: List[bytes]) -> List[bytes]:
+        return list(await asyncio.gather(*[self.sign_digest(d) for d in digests]))
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._dispatch_scheduled = False
+        pending, self._pending = self._pending, []
+        for i in range(0, len(pending), self._max_batch):
+            chunk = pending[i:i + self._max_batch]
+            try:
+                job = loop.run_in_executor(self._executor, _sign_digests_job, [d for d, _ in chunk])
+            except Exception as e:  # пул остановлен или сломан
+                self._fail(chunk, e)
+                continue
+            job.add_done_callback(partial(self._resolve, chunk))
+
+    @staticmethod
+    def _fail(chunk: list, exc: BaseException) -> None:
+        for _, fut in chunk:
+            if not fut.done():
+                fut.set_exception(exc)
+
+    @classmethod
+    def _resolve(cls, chunk: list, job: asyncio.Future) -> None:
+        if job.cancelled():
+            for _, fut in chunk:
+                fut.cancel()
+            return
+        if job.exception() is not None:
+            cls._fail(chunk, job.exception())
+            return
+        for (_, fut), signature in zip(chunk, job.result()):
+            if not fut.done():
+                fut.set_result(signature)
+
+    async def sign_transaction(self, tx: dict) -> bytes:
+        """Подписывает транзакцию, возвращает raw_transaction для send_raw_transaction."""
+        if self._executor is None:
+            return bytes(Account.sign_transaction(tx, self._key).raw_transaction)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _sign_transaction_job, tx)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# --- END OF FILE signing.py ---
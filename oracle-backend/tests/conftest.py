@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули бэкенда импортируются плоско (import metrics), как при запуске из oracle-backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from aggregation import PriceAggregator, aggregate
+
+nan = np.nan
+
+
+def test_median_per_pair():
+    prices = np.array([[100.0, 10.0], [101.0, 11.0], [102.0, nan]])
+    result = aggregate(prices, None, "median", max_deviation=0.5)
+    assert result.prices.tolist() == [101.0, 10.5]
+    assert result.sources.tolist() == [3, 2]
+
+
+def test_outlier_rejected_before_median():
+    prices = np.array([[100.0], [100.2], [99.8], [150.0]])
+    result = aggregate(prices, None, "median", max_deviation=0.02)
+    assert result.rejected[:, 0].tolist() == [False, False, False, True]
+    assert result.prices[0] == pytest.approx(100.0)
+    assert result.sources[0] == 3
+
+
+def test_two_diverging_quotes_both_rejected():
+    result = aggregate(np.array([[100.0], [120.0]]), None, "median", max_deviation=0.02)
+    assert result.rejected[:, 0].all()
+    assert np.isnan(result.prices[0])
+
+
+def test_non_positive_quotes_ignored():
+    result = aggregate(np.array([[0.0], [-1.0], [50.0]]), None, "median")
+    assert result.prices[0] == 50.0
+    assert result.sources[0] == 1
+    assert not result.rejected.any()
+
+
+def test_min_sources():
+    prices = np.array([[100.0, 10.0], [100.0, nan]])
+    result = aggregate(prices, None, "median", min_sources=2)
+    assert result.prices[0] == 100.0
+    assert np.isnan(result.prices[1])
+
+
+def test_trimmed_mean_drops_extremes():
+    prices = np.array([[100.0], [101.0], [102.0], [103.0], [110.0]])
+    result = aggregate(prices, None, "trimmed_mean", max_deviation=0.5, trim=0.2)
+    assert result.prices[0] == pytest.approx(102.0)
+
+
+def test_vwap_weights_by_volume_and_falls_back_to_median():
+    prices = np.array([[100.0, 10.0], [102.0, 12.0]])
+    volumes = np.array([[3.0, nan], [1.0, nan]])
+    result = aggregate(prices, volumes, "vwap", max_deviation=0.5)
+    assert result.prices[0] == pytest.approx(100.5)
+    assert result.prices[1] == pytest.approx(11.0)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        aggregate(np.array([[1.0]]), None, "mode")
+    with pytest.raises(ValueError):
+        PriceAggregator("mode", 0.02, 1, 0.2)
+
+
+def test_combine_skips_silent_sources_and_missing_pairs():
+    aggregator = PriceAggregator("median", 0.02, 1, 0.2)
+    quotes = [
+        {"BTCUSDT": (100.0, 1.0), "ETHUSDT": (10.0, 1.0)},
+        None,
+        {"BTCUSDT": (100.4, 1.0)},
+    ]
+    prices, result = aggregator.combine(quotes, ["BTCUSDT", "ETHUSDT", "SOLUSDT"])
+    assert prices == {"BTCUSDT": pytest.approx(100.2), "ETHUSDT": 10.0}
+    assert result.sources.tolist() == [2, 1, 0]
@@ -0,0 +1,79 @@
+import pytest
+
+from candles import CandleSeries, CandleStore
+
+
+def _series(ticks, resolution=60, capacity=100):
+    series = CandleSeries(resolution, capacity)
+    for ts, price in ticks:
+        assert series.add(ts, price)
+    return series
+
+
+def test_ohlc_within_candle():
+    series = _series([(120, 10.0), (130, 12.0), (150, 9.0), (170, 11.0)])
+    (candle,) = series.candles(None, 10, now=180)
+    assert candle["start"] == 120
+    assert (candle["open"], candle["high"], candle["low"], candle["close"]) == (10.0, 12.0, 9.0, 11.0)
+    assert candle["ticks"] == 4
+
+
+def test_gap_candles_repeat_last_price():
+    series = _series([(0, 10.0), (200, 20.0)])
+    candles = series.candles(None, 10, now=200)
+    assert [c["start"] for c in candles] == [0, 60, 120, 180]
+    assert [c["close"] for c in candles] == [10.0, 10.0, 10.0, 20.0]
+    assert [c["ticks"] for c in candles] == [1, 0, 0, 1]
+
+
+def test_out_of_order_tick_rejected():
+    series = _series([(100, 10.0)])
+    assert not series.add(99, 11.0)
+    assert series.twap(40, 100) == (60, 100, 10.0)
+
+
+def test_twap_is_time_weighted():
+    # 10 действует 60 секунд, 20 — 120 секунд
+    series = _series([(0, 10.0), (60, 20.0)])
+    start, end, price = series.twap(180, 180)
+    assert (start, end) == (0, 180)
+    assert price == pytest.approx((10.0 * 60 + 20.0 * 120) / 180)
+
+
+def test_twap_in_past_aligns_end_to_candle():
+    series = _series([(0, 10.0), (60, 20.0), (120, 30.0)])
+    assert series.twap(60, 100) == (0, 60, 10.0)
+
+
+@pytest.mark.parametrize("window,end", [(300, 2000), (60, 5000), (120, 1500)])
+def test_twap_of_stale_series_holds_last_price(window, end):
+    # Последний тик старше окна: TWAP — последняя цена, а не мусор из кольцевого буфера
+    series = _series([(ts, 101.0 + (ts % 20) / 100) for ts in range(1000, 1200, 10)])
+    start, stop, price = series.twap(window, end)
+    assert stop == end
+    assert start > 1190
+    assert price == pytest.approx(101.1)
+
+
+def test_twap_of_stale_series_after_ring_wrapped():
+    series = _series([(ts, 50.0 + ts) for ts in range(0, 600, 60)], capacity=4)
+    start, end, price = series.twap(120, 10_000)
+    assert (start, end) == (9_840, 10_000)
+    assert price == pytest.approx(590.0)
+
+
+def test_twap_window_clamped_to_oldest_candle():
+    series = _series([(ts, 1.0) for ts in range(0, 600, 60)], capacity=4)
+    start, end, price = series.twap(10_000, 600)
+    assert (start, end) == (360, 600)
+    assert price == pytest.approx(1.0)
+
+
+def test_store_picks_resolution_covering_window():
+    store = CandleStore([60, 3600], capacity=10)
+    for ts in range(0, 7200, 60):
+        store.record("BTCUSDT", ts, 100.0)
+    start, end, _ = store.twap("BTCUSDT", 3000, 7200)
+    # 10 минутных свечей покрывают только 600s, поэтому окно считается по часовым
+    assert (start, end) == (3600, 7200)
+    assert store.twap("ETHUSDT", 60, 7200) is None
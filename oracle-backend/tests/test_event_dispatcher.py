@@ -0,0 +1,130 @@
+import asyncio
+
+from event_dispatcher import EventDispatcher
+
+
+def _event(asset, ts, block):
+    return {"args": {"assetId": asset, "timestamp": ts}, "blockNumber": block}
+
+
+def _key(ev):
+    args = ev["args"]
+    return args["assetId"], args["timestamp"]
+
+
+class _Handler:
+    """handler диспетчера: возвращает future квитанции, которую тест завершает сам."""
+
+    def __init__(self):
+        self.calls = []
+        self.receipts = []
+        self.started = asyncio.Event()
+        self.release = None  # asyncio.Event — handler ждёт его перед отправкой
+
+    async def __call__(self, ev):
+        self.calls.append(_key(ev))
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        receipt = asyncio.get_running_loop().create_future()
+        self.receipts.append(receipt)
+        return receipt
+
+
+def _dispatcher(handler, workers=2):
+    return EventDispatcher(handler, _key, workers=workers, queue_size=10, fulfilled_size=100)
+
+
+def test_single_flight_and_fulfilled_keys():
+    async def scenario():
+        handler = _Handler()
+        dispatcher = _dispatcher(handler)
+        dispatcher.start()
+        assert await dispatcher.submit(_event(b"A", 1, 10))
+        assert not await dispatcher.submit(_event(b"A", 1, 11))  # дубликат в полёте
+        await dispatcher.join()
+        handler.receipts[0].set_result({"status": 1})
+        await asyncio.sleep(0)
+        assert not await dispatcher.submit(_event(b"A", 1, 12))  # уже исполнен
+        assert await dispatcher.submit(_event(b"A", 2, 12))
+        await dispatcher.join()
+        await dispatcher.stop()
+        return handler.calls
+
+    assert asyncio.run(scenario()) == [(b"A", 1), (b"A", 2)]
+
+
+def test_reverted_request_can_be_retried():
+    async def scenario():
+        handler = _Handler()
+        dispatcher = _dispatcher(handler)
+        dispatcher.start()
+        await dispatcher.submit(_event(b"A", 1, 10))
+        await dispatcher.join()
+        handler.receipts[0].set_result({"status": 0})
+        await asyncio.sleep(0)
+        assert await dispatcher.submit(_event(b"A", 1, 10))
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_checkpoint_held_at_unsettled_block():
+    async def scenario():
+        handler = _Handler()
+        dispatcher = _dispatcher(handler)
+        dispatcher.start()
+        await dispatcher.submit(_event(b"A", 1, 10))
+        await dispatcher.submit(_event(b"B", 1, 12))
+        await dispatcher.join()
+        assert dispatcher.checkpoint(20) == 9
+        handler.receipts[0].set_result({"status": 1})
+        await asyncio.sleep(0)
+        assert dispatcher.checkpoint(20) == 11
+        handler.receipts[1].set_result({"status": 1})
+        await asyncio.sleep(0)
+        assert dispatcher.checkpoint(20) == 20
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_checkpoint_held_at_failed_block():
+    async def scenario():
+        async def failing(ev):
+            raise RuntimeError("rpc down")
+
+        dispatcher = EventDispatcher(failing, _key, workers=1, queue_size=10, fulfilled_size=100)
+        dispatcher.start()
+        await dispatcher.submit(_event(b"A", 1, 5))
+        await dispatcher.join()
+        await asyncio.sleep(0)
+        assert dispatcher.checkpoint(20) == 4
+        assert dispatcher.in_flight == 0
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_restart_keeps_in_flight_and_requeues_interrupted_event():
+    async def scenario():
+        handler = _Handler()
+        handler.release = asyncio.Event()
+        dispatcher = _dispatcher(handler, workers=1)
+        dispatcher.start()
+        await dispatcher.submit(_event(b"A", 1, 10))
+        await handler.started.wait()
+        await dispatcher.stop()  # переподключение посреди обработки
+        assert not await dispatcher.submit(_event(b"A", 1, 10))  # догрузка с чекпоинта — дубликат
+        assert dispatcher.checkpoint(20) == 9
+
+        handler.release.set()
+        dispatcher.start()
+        await dispatcher.join()
+        handler.receipts[-1].set_result({"status": 1})
+        await asyncio.sleep(0)
+        assert dispatcher.checkpoint(20) == 20
+        await dispatcher.stop()
+        return handler.calls
+
+    assert asyncio.run(scenario()) == [(b"A", 1), (b"A", 1)]
@@ -0,0 +1,117 @@
+import asyncio
+
+import event_source
+
+_ABI = {"type": "event", "name": "PriceValidationRequested", "anonymous": False, "inputs": []}
+
+
+class _Event:
+    """contract.events[name]: класс для get_logs, экземпляр — для abi и process_log."""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.abi = _ABI
+
+    def __call__(self):
+        return self
+
+    def process_log(self, log):
+        return {"blockNumber": log["blockNumber"], "args": {}}
+
+    async def get_logs(self, from_block, to_block):
+        return [log for log in self.chain.logs if from_block <= log["blockNumber"] <= to_block]
+
+
+class _Contract:
+    address = "0x0000000000000000000000000000000000000001"
+
+    def __init__(self, chain):
+        self.events = {"PriceValidationRequested": _Event(chain)}
+
+
+class _Chain:
+    """Узел: head, логи в цепи и поток уведомлений подписки (доставляются тестом)."""
+
+    def __init__(self, head):
+        self.head = head
+        self.logs = []
+        self.notifications: asyncio.Queue = asyncio.Queue()
+        self.eth = self
+        self.socket = self
+
+    @property
+    async def block_number(self):
+        return self.head
+
+    async def subscribe(self, kind, params):
+        return "0xsub"
+
+    async def unsubscribe(self, sub_id):
+        return True
+
+    async def process_subscriptions(self):
+        while True:
+            yield await self.notifications.get()
+
+    def deliver(self, log):
+        self.notifications.put_nowait({"subscription": "0xsub", "result": log})
+
+
+def _marks(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_idle_mark_waits_for_logs_still_in_transit():
+    async def scenario():
+        chain = _Chain(head=100)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_subscribed():
+            return 100
+
+        task = asyncio.create_task(event_source.subscribe_logs(
+            chain, _Contract(chain), "PriceValidationRequested", queue,
+            on_subscribed=on_subscribed, checkpoint_interval=0.01, checkpoint_lag=2,
+        ))
+        # Запрос в блоке 103 уже в цепи, но уведомление подписки о нём ещё не пришло
+        log = {"blockNumber": 103, "removed": False}
+        chain.logs.append(log)
+        chain.head = 110
+        await asyncio.sleep(0.05)
+        held = _marks(queue)
+        assert held == []
+
+        chain.deliver(log)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return _marks(queue)
+
+    items = asyncio.run(scenario())
+    assert items[0] == 102
+    assert items[1]["blockNumber"] == 103
+    assert items[2] == 108
+
+
+def test_idle_mark_advances_over_empty_blocks():
+    async def scenario():
+        chain = _Chain(head=50)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_subscribed():
+            return 50
+
+        task = asyncio.create_task(event_source.subscribe_logs(
+            chain, _Contract(chain), "PriceValidationRequested", queue,
+            on_subscribed=on_subscribed, checkpoint_interval=0.01, checkpoint_lag=3,
+        ))
+        chain.head = 60
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return _marks(queue)
+
+    assert asyncio.run(scenario()) == [57]
@@ -0,0 +1,59 @@
+import pytest
+from eth_abi import encode
+from eth_utils import keccak
+
+import merkle
+
+
+def _oz_process_proof(proof, leaf):
+    # MerkleProof.processProof + Hashes.commutativeKeccak256 из OpenZeppelin, без кода merkle.py
+    computed = leaf
+    for node in proof:
+        a, b = sorted((computed, node))
+        computed = keccak(a + b)
+    return computed
+
+
+def _leaves(count):
+    return [merkle.leaf_hash(keccak(text=f"PAIR{i}"), 1_700_000_000 + i, 10**8 * (i + 1)) for i in range(count)]
+
+
+def test_root_matches_openzeppelin_vector():
+    # Пример из README @openzeppelin/merkle-tree: leaf = keccak256(keccak256(abi.encode(address, uint256)))
+    leaves = [
+        keccak(keccak(encode(["address", "uint256"], [address, amount])))
+        for address, amount in [
+            ("0x1111111111111111111111111111111111111111", 5000000000000000000),
+            ("0x2222222222222222222222222222222222222222", 2500000000000000000),
+        ]
+    ]
+    root = merkle.MerkleTree(leaves).root
+    assert root.hex() == "d4dee0beab2d53f2cc83e567171bd2820e49898130a22622b10ead383e90bd77"
+
+
+def test_leaf_hash_matches_contract_encoding():
+    asset_id = keccak(text="BTC/USD")
+    inner = keccak(encode(["bytes32", "uint256", "uint256"], [asset_id, 1700000000, 6500000000000]))
+    assert merkle.leaf_hash(asset_id, 1700000000, 6500000000000) == keccak(inner)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13])
+def test_every_proof_verifies_like_openzeppelin(count):
+    leaves = _leaves(count)
+    tree = merkle.MerkleTree(leaves)
+    for index, leaf in enumerate(leaves):
+        proof = tree.proof(index)
+        assert _oz_process_proof(proof, leaf) == tree.root
+        assert merkle.verify(proof, tree.root, leaf)
+
+
+def test_proof_rejects_other_leaf():
+    leaves = _leaves(5)
+    tree = merkle.MerkleTree(leaves)
+    assert not merkle.verify(tree.proof(0), tree.root, leaves[1])
+    assert not merkle.verify(tree.proof(0), tree.root, merkle.leaf_hash(keccak(text="PAIR0"), 1_700_000_000, 1))
+
+
+def test_empty_tree_rejected():
+    with pytest.raises(ValueError):
+        merkle.MerkleTree([])
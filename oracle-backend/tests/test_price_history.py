@@ -0,0 +1,55 @@
+import pytest
+
+from price_history import APPENDED, OVERWRITTEN, REJECTED, PriceHistory, PriceRing
+
+
+def test_append_overwrite_reject():
+    ring = PriceRing(4)
+    assert ring.append(100, 1.0) == APPENDED
+    assert ring.append(100, 2.0) == OVERWRITTEN
+    assert ring.append(99, 3.0) == REJECTED
+    assert ring.append(101, 4.0) == APPENDED
+    assert list(ring.items()) == [(100, 2.0), (101, 4.0)]
+    assert not REJECTED
+
+
+def test_ring_evicts_oldest():
+    ring = PriceRing(3)
+    for ts in range(10):
+        ring.append(ts, float(ts))
+    assert len(ring) == 3
+    assert list(ring.items()) == [(7, 7.0), (8, 8.0), (9, 9.0)]
+    assert ring.latest() == (9, 9.0)
+
+
+def test_nearest_and_since_after_wrap():
+    ring = PriceRing(4)
+    for ts in (10, 20, 30, 40, 50, 60):
+        ring.append(ts, ts / 10)
+    assert ring.nearest(0) == (30, 3.0)
+    assert ring.nearest(44) == (40, 4.0)
+    assert ring.nearest(46) == (50, 5.0)
+    assert ring.nearest(1000) == (60, 6.0)
+    assert list(ring.items(since=45)) == [(50, 5.0), (60, 6.0)]
+
+
+def test_empty_ring():
+    ring = PriceRing(2)
+    assert ring.latest() is None
+    assert ring.nearest(5) is None
+    with pytest.raises(ValueError):
+        PriceRing(0)
+
+
+def test_history_per_pair():
+    history = PriceHistory(8)
+    assert history.record("BTCUSDT", 100, 65000.0) == APPENDED
+    assert history.record("ETHUSDT", 100, 3000.0) == APPENDED
+    assert history.record("BTCUSDT", 90, 64000.0) == REJECTED
+    assert history.latest("BTCUSDT") == {"price": 65000.0, "timestamp": 100}
+    assert history.nearest("BTCUSDT", 104, max_diff=5) == {"price": 65000.0, "timestamp": 100}
+    assert history.nearest("BTCUSDT", 106, max_diff=5) is None
+    assert history.latest("SOLUSDT") is None
+    assert len(history) == 2
+    history.drop("ETHUSDT")
+    assert list(history.ticks("ETHUSDT")) == []
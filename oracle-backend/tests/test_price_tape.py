@@ -0,0 +1,66 @@
+from price_tape import PriceTape
+
+
+def test_append_and_load(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    for ts in range(10):
+        tape.append("BTC/USDT", ts, float(ts))
+    assert tape.load("BTC/USDT") == [(ts, float(ts)) for ts in range(10)]
+    assert tape.load("BTC/USDT", limit=3) == [(7, 7.0), (8, 8.0), (9, 9.0)]
+    assert tape.load("ETH/USDT") == []
+    tape.close()
+
+
+def test_retention_drops_oldest_segments(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=2, max_segments=2)
+    for ts in range(7):
+        tape.append("BTC/USDT", ts, float(ts))
+    tape.close()
+    assert tape.load("BTC/USDT") == [(4, 4.0), (5, 5.0), (6, 6.0)]
+
+
+def test_same_second_overwrites_last_record(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    tape.append("BTC/USDT", 100, 1.0)
+    tape.append("BTC/USDT", 100, 2.0, overwrite=True)
+    tape.append("BTC/USDT", 101, 3.0)
+    tape.append("BTC/USDT", 101, 4.0, overwrite=True)
+    tape.close()
+    assert tape.load("BTC/USDT") == [(100, 2.0), (101, 4.0)]
+
+
+def test_overwrite_after_restart(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    tape.append("BTC/USDT", 100, 1.0)
+    tape.close()
+
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    tape.append("BTC/USDT", 100, 2.0, overwrite=True)
+    tape.append("BTC/USDT", 101, 3.0)
+    tape.close()
+    assert tape.load("BTC/USDT") == [(100, 2.0), (101, 3.0)]
+
+
+def test_overwrite_after_restart_with_full_segment(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=2, max_segments=10)
+    tape.append("BTC/USDT", 100, 1.0)
+    tape.append("BTC/USDT", 101, 2.0)
+    tape.close()
+
+    tape = PriceTape(str(tmp_path), segment_records=2, max_segments=10)
+    tape.append("BTC/USDT", 101, 5.0, overwrite=True)
+    tape.append("BTC/USDT", 102, 6.0)
+    tape.close()
+    assert tape.load("BTC/USDT") == [(100, 1.0), (101, 5.0), (102, 6.0)]
+    assert len(list((tmp_path / "BTC-USDT").iterdir())) == 2
+
+
+def test_overwrite_of_other_second_appends(tmp_path):
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    tape.append("BTC/USDT", 100, 1.0)
+    tape.close()
+
+    tape = PriceTape(str(tmp_path), segment_records=4, max_segments=10)
+    tape.append("BTC/USDT", 101, 2.0, overwrite=True)
+    tape.close()
+    assert tape.load("BTC/USDT") == [(100, 1.0), (101, 2.0)]
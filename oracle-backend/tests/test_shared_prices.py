@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from shared_prices import _SEQ, SharedPriceTable
+
+
+@pytest.fixture
+def tables(tmp_path):
+    path = str(tmp_path / "prices.shm")
+    writer = SharedPriceTable.create(path, capacity=4, status_capacity=256)
+    reader = SharedPriceTable.open(path)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_write_then_read(tables):
+    writer, reader = tables
+    writer.write("BTCUSDT", 100, 65000.5)
+    assert reader.read("BTCUSDT") == (100, 65000.5, None)
+    writer.write("BTCUSDT", 100, 65000.5, b"\x01" * 65)
+    assert reader.read("BTCUSDT") == (100, 65000.5, b"\x01" * 65)
+    assert reader.read("ETHUSDT") is None
+    writer.set_chain_id(11155111)
+    assert reader.chain_id == 11155111
+
+
+def test_reader_follows_relayout(tables):
+    writer, reader = tables
+    writer.ensure_pairs(["BTCUSDT", "ETHUSDT"])
+    writer.write("ETHUSDT", 100, 3000.0)
+    assert sorted(reader.pairs()) == ["BTCUSDT", "ETHUSDT"]
+    writer.ensure_pairs(["ETHUSDT", "SOLUSDT"])
+    assert sorted(reader.pairs()) == ["ETHUSDT", "SOLUSDT"]
+    assert reader.read("BTCUSDT") is None
+    assert reader.read("ETHUSDT") == (100, 3000.0, None)
+
+
+def test_capacity_and_name_limits(tables):
+    writer, _ = tables
+    with pytest.raises(ValueError):
+        writer.ensure_pairs(["X" * 33])
+    with pytest.raises(OverflowError):
+        writer.ensure_pairs(["A", "B", "C", "D", "E"])
+
+
+def test_status_snapshot(tables):
+    writer, reader = tables
+    assert reader.read_status() is None
+    writer.write_status(b'{"status":"ok"}')
+    assert reader.read_status() == b'{"status":"ok"}'
+    with pytest.raises(ValueError):
+        writer.write_status(b"x" * 257)
+
+
+def test_reader_retries_while_seq_is_odd(tables):
+    writer, reader = tables
+    writer.write("BTCUSDT", 100, 1.0)
+    offset = writer._slot_offset(writer._slots["BTCUSDT"])
+    seq = _SEQ.unpack_from(writer._mm, offset)[0]
+    _SEQ.pack_into(writer._mm, offset, seq + 1)  # писатель "завис" посреди записи
+    with pytest.raises(TimeoutError):
+        reader.read("BTCUSDT")
+    _SEQ.pack_into(writer._mm, offset, seq + 2)
+    assert reader.read("BTCUSDT") == (100, 1.0, None)
+
+
+def test_reader_discards_read_overlapping_write(tables):
+    writer, reader = tables
+    writer.write("BTCUSDT", 100, 1.0)
+    offset = writer._slot_offset(writer._slots["BTCUSDT"])
+    reads = []
+
+    def _read():
+        reads.append(len(reads))
+        if len(reads) == 1:
+            writer.write("BTCUSDT", 101, 2.0)  # запись между двумя проверками seq
+        return len(reads)
+
+    assert reader._read_consistent(offset, _read) == 2
+
+
+def test_concurrent_reads_are_never_torn(tables):
+    writer, reader = tables
+    writer.write("BTCUSDT", 1, 1.0)
+    stop = threading.Event()
+
+    def _write():
+        ts = 1
+        while not stop.is_set():
+            ts += 1
+            writer.write("BTCUSDT", ts, float(ts))
+
+    thread = threading.Thread(target=_write)
+    thread.start()
+    try:
+        for _ in range(20000):
+            ts, price, _ = reader.read("BTCUSDT")
+            assert price == float(ts)
+    finally:
+        stop.set()
+        thread.join()
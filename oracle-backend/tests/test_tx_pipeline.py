@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+from web3.exceptions import TransactionNotFound
+
+from tx_pipeline import TxPipeline
+
+
+class _Eth:
+    """Узел: pending/latest nonce, мемпул по хэшам и намайненные квитанции."""
+
+    def __init__(self, pending_nonce=0):
+        self.pending_nonce = pending_nonce
+        self.latest_nonce = 0
+        self.sent = []
+        self.receipts = {}
+
+    async def get_transaction_count(self, address, block):
+        return self.pending_nonce if block == "pending" else self.latest_nonce
+
+    @property
+    async def gas_price(self):
+        return 100
+
+    async def send_raw_transaction(self, raw):
+        self.sent.append(raw)
+        return raw
+
+    async def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise TransactionNotFound(tx_hash)
+        return self.receipts[tx_hash]
+
+
+class _W3:
+    def __init__(self, eth):
+        self.eth = eth
+
+
+class _Signer:
+    async def sign_transaction(self, tx):
+        # "Хэш" транзакции — nonce и цена газа: замена с тем же nonce даёт другой хэш
+        return f"{tx['nonce']}:{tx['maxFeePerGas']}".encode()
+
+
+class _Call:
+    async def build_transaction(self, params):
+        return dict(params)
+
+
+def _receipt(tx_hash, status=1):
+    return {"status": status, "transactionHash": tx_hash, "blockNumber": 1}
+
+
+def _pipeline(eth, **kwargs):
+    options = dict(
+        chain_id=1, max_in_flight=4, receipt_poll_seconds=0.01, stuck_after_seconds=60,
+        fee_bump_percent=10, max_bumps=1, fee_refresh_seconds=60,
+    )
+    options.update(kwargs)
+    return TxPipeline(_W3(eth), "0xOracle", _Signer(), **options)
+
+
+def test_local_nonce_and_receipt():
+    async def scenario():
+        eth = _Eth(pending_nonce=7)
+        pipeline = _pipeline(eth)
+        await pipeline.start()
+        first = await pipeline.submit(_Call(), 100_000)
+        second = await pipeline.submit(_Call(), 100_000)
+        assert eth.sent == [b"7:100", b"8:100"]
+        eth.receipts[b"7:100"] = _receipt(b"7:100")
+        eth.receipts[b"8:100"] = _receipt(b"8:100", status=0)
+        results = await asyncio.wait_for(asyncio.gather(first, second), timeout=1)
+        assert [r["status"] for r in results] == [1, 0]
+        assert pipeline.in_flight == 0
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+
+
+def test_resync_never_moves_nonce_below_in_flight():
+    async def scenario():
+        eth = _Eth(pending_nonce=5)
+        pipeline = _pipeline(eth)
+        await pipeline.resync_nonce()
+        await pipeline.submit(_Call(), 100_000)
+        await pipeline.submit(_Call(), 100_000)
+        eth.pending_nonce = 3  # новый узел не видит наш мемпул
+        await pipeline.resync_nonce()
+        assert pipeline._nonce == 7
+        eth.pending_nonce = 9
+        await pipeline.resync_nonce()
+        assert pipeline._nonce == 9
+
+    asyncio.run(scenario())
+
+
+def test_submit_refuses_nonce_in_flight():
+    async def scenario():
+        eth = _Eth()
+        pipeline = _pipeline(eth)
+        await pipeline.resync_nonce()
+        await pipeline.submit(_Call(), 100_000)
+        pipeline._nonce = 0
+        with pytest.raises(RuntimeError):
+            await pipeline.submit(_Call(), 100_000)
+        assert pipeline._nonce == 1  # после ошибки nonce пересверен с учётом транзакций в полёте
+        assert eth.sent == [b"0:100"]
+
+    asyncio.run(scenario())
+
+
+class _MinedDuringBump(_Eth):
+    async def send_raw_transaction(self, raw):
+        if self.sent:  # замена: исходная транзакция уже попала в блок
+            self.receipts[self.sent[0]] = _receipt(self.sent[0])
+            raise ValueError("nonce too low")
+        return await super().send_raw_transaction(raw)
+
+
+def test_nonce_too_low_on_bump_settles_with_own_receipt():
+    async def scenario():
+        eth = _MinedDuringBump()
+        pipeline = _pipeline(eth, stuck_after_seconds=0)
+        await pipeline.start()
+        future = await pipeline.submit(_Call(), 100_000)
+        receipt = await asyncio.wait_for(future, timeout=1)
+        assert receipt["transactionHash"] == b"0:100"
+        assert pipeline.in_flight == 0
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+
+
+def test_exhausted_bumps_rebroadcast_when_nonce_unused():
+    async def scenario():
+        eth = _Eth()
+        pipeline = _pipeline(eth, stuck_after_seconds=0, max_bumps=1)
+        await pipeline.start()
+        future = await pipeline.submit(_Call(), 100_000)
+        while len(eth.sent) < 3:
+            await asyncio.sleep(0.01)
+        assert eth.sent[:3] == [b"0:100", b"0:110", b"0:110"]  # замена, затем повтор последней версии
+        assert not future.done()
+        eth.receipts[b"0:110"] = _receipt(b"0:110")
+        assert (await asyncio.wait_for(future, timeout=1))["status"] == 1
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+
+
+def test_exhausted_bumps_drop_tx_when_nonce_taken_by_other():
+    async def scenario():
+        eth = _Eth()
+        pipeline = _pipeline(eth, stuck_after_seconds=0, max_bumps=0)
+        await pipeline.start()
+        future = await pipeline.submit(_Call(), 100_000)
+        eth.latest_nonce = eth.pending_nonce = 1  # nonce 0 занят транзакцией не из конвейера
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(future, timeout=1)
+        assert pipeline.in_flight == 0
+        assert pipeline._nonce == 1
+        await pipeline.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,255 @@
+# --- START OF FILE tx_pipeline.py ---
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from web3.exceptions import TransactionNotFound
+
+import metrics
+
+logger = logging.getLogger("tx_pipeline")
+
+
+class _InFlightTx:
+    """Отправленная транзакция, ожидающая квитанцию (с историей хэшей замен)."""
+
+    __slots__ = ("tx", "hashes", "first_sent_at", "sent_at", "bumps", "future")
+
+    def __init__(self, tx: dict, tx_hash: bytes, future: asyncio.Future):
+        self.tx = tx
+        self.hashes: List[bytes] = [tx_hash]
+        self.first_sent_at = time.monotonic()  # для времени подтверждения: замены его не сбрасывают
+        self.sent_at = self.first_sent_at
+        self.bumps = 0
+        self.future = future
+
+
+class TxPipeline:
+    """
+    Конвейер отправки транзакций: локальный nonce (без get_transaction_count на каждую
+    транзакцию), до max_in_flight транзакций одновременно, квитанции отслеживаются
+    фоновой задачей, зависшие транзакции переотправляются с тем же nonce и повышенной ценой газа.
+    """
+
+    def __init__(
+        self,
+        w3,
+        address: str,
+        signing_service,
+        chain_id: int,
+        max_in_flight: int,
+        receipt_poll_seconds: float,
+        stuck_after_seconds: float,
+        fee_bump_percent: int,
+        max_bumps: int,
+        fee_refresh_seconds: float,
+    ):
+        self.w3 = w3
+        self.address = address
+        self.chain_id = chain_id
+        self._signer = signing_service
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._receipt_poll_seconds = receipt_poll_seconds
+        self._stuck_after_seconds = stuck_after_seconds
+        self._fee_bump_percent = fee_bump_percent
+        self._max_bumps = max_bumps
+        self._fee_refresh_seconds = fee_refresh_seconds
+        self._nonce: Optional[int] = None
+        self._nonce_lock = asyncio.Lock()
+        self._gas_price: Optional[int] = None
+        self._gas_price_at = 0.0
+        self._in_flight: Dict[int, _InFlightTx] = {}  # nonce → транзакция
+        self._tracker_task: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def rebind(self, w3, chain_id: int) -> None:
+        """Переключает конвейер на новое подключение (после реконнекта), не теряя транзакций в полёте."""
+        self.w3 = w3
+        self.chain_id = chain_id
+
+    async def start(self) -> None:
+        await self.resync_nonce()
+        if self._tracker_task is None or self._tracker_task.done():
+            self._tracker_task = asyncio.create_task(self._track_receipts())
+
+    async def stop(self) -> None:
+        if self._tracker_task and not self._tracker_task.done():
+            self._tracker_task.cancel()
+            try:
+                await self._tracker_task
+            except asyncio.CancelledError:
+                pass
+        for item in self._in_flight.values():
+            if not item.future.done():
+                item.future.cancel()
+        self._in_flight.clear()
+
+    async def resync_nonce(self) -> None:
+        """
+        Берёт nonce из сети (включая pending). Вызывается при старте (и после реконнекта) и после
+        ошибок отправки. Новый или другой узел может не видеть наших транзакций в мемпуле,
+        поэтому nonce не опускается ниже следующего за транзакциями в полёте.
+        """
+        async with metrics.rpc_call("eth_getTransactionCount"):
+            network_nonce = await self.w3.eth.get_transaction_count(self.address, "pending")
+        self._nonce = max(network_nonce, max(self._in_flight) + 1) if self._in_flight else network_nonce
+        logger.info("Nonce synced for %s: %s (network pending: %s)", self.address, self._nonce, network_nonce)
+
+    async def _current_gas_price(self) -> int:
+        """Цена газа кэшируется на fee_refresh_seconds вместо RPC-запроса на каждую транзакцию."""
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self._fee_refresh_seconds:
+            async with metrics.rpc_call("eth_gasPrice"):
+                self._gas_price = await self.w3.eth.gas_price
+            self._gas_price_at = now
+        return self._gas_price
+
+    async def submit(self, func, gas: int) -> asyncio.Future:
+        """
+        Строит, подписывает и отправляет вызов контракта. Возвращает future с квитанцией,
+        не дожидаясь включения в блок. Ждёт, если в полёте уже max_in_flight транзакций.
+        """
+        await self._slots.acquire()
+        try:
+            async with self._nonce_lock:
+                try:
+                    if self._nonce is None:
+                        await self.resync_nonce()
+                    if self._nonce in self._in_flight:
+                        # Иначе затёрли бы транзакцию в полёте: её future не разрешится, слот не освободится
+                        raise RuntimeError(f"Nonce {self._nonce} is already in flight")
+                    gas_price = await self._current_gas_price()
+                    tx = await func.build_transaction({
+                        "from": self.address,
+                        "nonce": self._nonce,
+                        "gas": gas,
+                        "chainId": self.chain_id,
+                        "maxFeePerGas": gas_price,
+                        "maxPriorityFeePerGas": gas_price,
+                    })
+                    tx_hash = await self._sign_and_send(tx)
+                    self._nonce += 1
+                except Exception:
+                    metrics.TXS.inc("send_failed")
+                    # Неизвестно, занял ли узел этот nonce ("nonce too low", "already known", обрыв) — сверяемся с сетью
+                    try:
+                        await self.resync_nonce()
+                    except Exception as sync_e:
+                        logger.error("Nonce resync failed: %s", sync_e)
+                        self._nonce = None
+                    raise
+        except Exception:
+            self._slots.release()
+            raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[tx["nonce"]] = _InFlightTx(tx, tx_hash, future)
+        metrics.TXS.inc("sent")
+        logger.info("Tx sent %s (nonce %s, in flight: %d)", tx_hash.hex(), tx["nonce"], len(self._in_flight))
+        return future
+
+    async def _sign_and_send(self, tx: dict) -> bytes:
+        raw_tx = await self._signer.sign_transaction(tx)
+        async with metrics.rpc_call("eth_sendRawTransaction"):
+            return bytes(await self.w3.eth.send_raw_transaction(raw_tx))
+
+    async def _track_receipts(self) -> None:
+        """Фоновая задача: опрашивает квитанции транзакций в полёте и переотправляет зависшие."""
+        while True:
+            await asyncio.sleep(self._receipt_poll_seconds)
+            for nonce, item in list(self._in_flight.items()):
+                try:
+                    receipt = await self._find_receipt(item)
+                    if receipt is not None:
+                        self._complete(nonce, item, receipt)
+                    elif time.monotonic() - item.sent_at > self._stuck_after_seconds:
+                        await self._bump(nonce, item)
+                except Exception as e:
+                    if "nonce too low" in str(e).lower():
+                        # Чаще всего между _find_receipt и заменой в блок попала наша же транзакция (исходная или прошлая замена)
+                        await self._settle_used_nonce(nonce, item, e)
+                    else:
+                        logger.warning("Receipt tracking error for nonce %s: %s", nonce, e)
+
+    async def _find_receipt(self, item: _InFlightTx):
+        for tx_hash in reversed(item.hashes):
+            try:
+                async with metrics.rpc_call("eth_getTransactionReceipt", expected=(TransactionNotFound,)):
+                    return await self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def _complete(self, nonce: int, item: _InFlightTx, receipt) -> None:
+        self._in_flight.pop(nonce, None)
+        self._slots.release()
+        status = receipt.get("status")
+        metrics.TX_CONFIRMATION_SECONDS.observe(time.monotonic() - item.first_sent_at)
+        metrics.TXS.inc("confirmed" if status == 1 else "reverted")
+        logger.info("Tx %s mined in block %s (status %s)", receipt["transactionHash"].hex(), receipt.get("blockNumber"), status)
+        if not item.future.done():
+            item.future.set_result(receipt)
+
+    def _drop(self, nonce: int, item: _InFlightTx, exc: Exception) -> None:
+        self._in_flight.pop(nonce, None)
+        self._slots.release()
+        metrics.TXS.inc("dropped")
+        logger.error("Tx with nonce %s dropped: %s", nonce, exc)
+        if not item.future.done():
+            item.future.set_exception(exc)
+
+    async def _settle_used_nonce(self, nonce: int, item: _InFlightTx, exc: Exception) -> None:
+        """
+        Nonce транзакции уже использован в сети. Если в блок попал один из её хэшей (исходный
+        или замена) — транзакция исполнена; иначе nonce занят чужой транзакцией и эта отброшена.
+        """
+        receipt = await self._find_receipt(item)
+        if receipt is not None:
+            self._complete(nonce, item, receipt)
+            return
+        self._drop(nonce, item, exc)
+        await self.resync_nonce()
+
+    async def _rebroadcast(self, nonce: int, item: _InFlightTx) -> None:
+        """
+        Замены исчерпаны. Если nonce всё ещё свободен, транзакция могла выпасть из мемпула — тогда все
+        следующие nonce стоят за дырой, поэтому последняя версия отправляется заново.
+        """
+        async with metrics.rpc_call("eth_getTransactionCount"):
+            mined_nonce = await self.w3.eth.get_transaction_count(self.address, "latest")
+        if mined_nonce > nonce:
+            await self._settle_used_nonce(nonce, item, RuntimeError(f"nonce {nonce} used without our receipt"))
+            return
+        item.sent_at = time.monotonic()
+        try:
+            await self._sign_and_send(item.tx)
+        except Exception as e:
+            if "already known" not in str(e).lower():
+                raise
+            return  # узел всё ещё держит её в мемпуле
+        metrics.TXS.inc("rebroadcast")
+        logger.warning("Tx with nonce %s rebroadcast after %d bumps", nonce, item.bumps)
+
+    async def _bump(self, nonce: int, item: _InFlightTx) -> None:
+        """Переотправляет зависшую транзакцию с тем же nonce и ценой газа выше на fee_bump_percent."""
+        if item.bumps >= self._max_bumps:
+            await self._rebroadcast(nonce, item)
+            return
+        tx = dict(item.tx)
+        factor = 100 + self._fee_bump_percent
+        tx["maxFeePerGas"] = max(tx["maxFeePerGas"] * factor // 100, await self._current_gas_price())
+        tx["maxPriorityFeePerGas"] = tx["maxPriorityFeePerGas"] * factor // 100
+        tx_hash = await self._sign_and_send(tx)
+        item.tx = tx
+        item.hashes.append(tx_hash)
+        item.bumps += 1
+        item.sent_at = time.monotonic()
+        metrics.TXS.inc("replaced")
+        logger.warning("Tx with nonce %s stuck, replaced by %s (bump %d)", tx["nonce"], tx_hash.hex(), item.bumps)
+
+# --- END OF FILE tx_pipeline.py ---